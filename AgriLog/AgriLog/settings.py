@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import sys
 from pathlib import Path
 from decouple import config
 
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "rest_framework",
 ]
 
 MIDDLEWARE = [
@@ -48,6 +50,9 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "crops.profiling.ProfilerMiddleware",
+    "crops.audit.AuditMiddleware",
+    "crops.replica.ReplicaMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -82,6 +87,19 @@ DATABASES = {
     }
 }
 
+# Opcjonalna kopia tylko do odczytu dla raportów i historii, odświeżana
+# komendą refresh_replica; bez REPLICA_DB_NAME wszystko idzie do "default"
+REPLICA_DB_NAME = config("REPLICA_DB_NAME", default="")
+if REPLICA_DB_NAME:
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / REPLICA_DB_NAME,
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["crops.replica.ReplicaRouter"]
+# Starsza kopia jest pomijana, a czytamy z bazy głównej
+REPLICA_MAX_LAG_SECONDS = config("REPLICA_MAX_LAG_SECONDS", default=60, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -122,6 +140,55 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# Zamknięte sezony starsze niż tyle lat są przenoszone do tabel archiwalnych
+ARCHIVE_HORIZON_YEARS = config("ARCHIVE_HORIZON_YEARS", default=5, cast=int)
+
+# Jak długo trzymamy ślady usuniętych wierszy dla synchronizacji tabletów;
+# starszy token wymusza pełne pobranie danych
+SYNC_TOMBSTONE_RETENTION_DAYS = config(
+    "SYNC_TOMBSTONE_RETENTION_DAYS", default=90, cast=int
+)
+
+# Zdjęcia (załączniki) zapisywane na dysku według skrótu SHA-256
+MEDIA_ROOT = BASE_DIR / config("MEDIA_DIR", default="media")
+ATTACHMENT_MAX_BYTES = config(
+    "ATTACHMENT_MAX_BYTES", default=20 * 1024 * 1024, cast=int
+)
+# Procesy generujące miniatury; 0 = tylko komenda render_attachments
+ATTACHMENT_WORKERS = config("ATTACHMENT_WORKERS", default=2, cast=int)
+
+# Profiler próbkujący: na życzenie (nagłówek X-Profile z tokenem lub konto
+# personelu) albo dla takiej części żądań, zapisywanych gdy trwały dłużej
+# niż PROFILER_SLOW_MS; 0 wyłącza próbkowanie losowe
+PROFILER_SAMPLE_RATE = config("PROFILER_SAMPLE_RATE", default=0.0, cast=float)
+PROFILER_SLOW_MS = config("PROFILER_SLOW_MS", default=1000, cast=int)
+PROFILER_INTERVAL_MS = config("PROFILER_INTERVAL_MS", default=5, cast=int)
+PROFILER_TOKEN = config("PROFILER_TOKEN", default="")
+PROFILES_DIR = BASE_DIR / config("PROFILES_DIR", default="profiles")
+# Starsze profile (pliki i wpisy) są usuwane
+PROFILER_KEEP = config("PROFILER_KEEP", default=200, cast=int)
+
+# Kopie zapasowe bazy (komenda backup_database): kopiowanie po BACKUP_PAGES
+# stron z przerwą BACKUP_PAUSE_MS, by nie blokować zapisów; co
+# BACKUP_FULL_EVERY kopii przyrostowych pełna, trzymamy BACKUP_KEEP_FULL łańcuchów
+BACKUPS_DIR = BASE_DIR / config("BACKUPS_DIR", default="backups")
+BACKUP_PAGES = config("BACKUP_PAGES", default=256, cast=int)
+BACKUP_PAUSE_MS = config("BACKUP_PAUSE_MS", default=10, cast=int)
+BACKUP_FULL_EVERY = config("BACKUP_FULL_EVERY", default=23, cast=int)
+BACKUP_KEEP_FULL = config("BACKUP_KEEP_FULL", default=7, cast=int)
+
+# Cache wspólny dla wszystkich procesów serwera: znacznik wersji słownika
+# roślin i pulpity unieważnione w jednym workerze muszą zniknąć we wszystkich
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / config("CACHE_DIR", default="cache"),
+    }
+}
+# Testy czyszczą cache; nie mogą przy tym kasować cache'u programisty
+if "test" in sys.argv[1:2]:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
 LOGIN_REDIRECT_URL = "/"
 LOGIN_URL = "/accounts/login/"
 # settings.py
@@ -1,3 +1,76 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.test import Client
+from django.urls import reverse
 
-# Create your tests here.
+from crops.tests import QueryBudgetTestCase
+
+from .models import Profile
+
+
+class AccountQueriesTest(QueryBudgetTestCase):
+    def assertAnonymousBudget(self, budget, request):
+        """``request(client, label)`` wykonuje żądanie bez zalogowania."""
+
+        def run(label):
+            client = Client()
+
+            def call():
+                response = request(client, label)
+                self.assertLess(response.status_code, 400, response)
+                if response.context and "form" in response.context:
+                    self.assertFalse(response.context["form"].errors)
+
+            return call
+
+        self.assertQueryBudget(budget, run("small"), run("large"))
+
+    def test_login_page(self):
+        self.assertAnonymousBudget(0, lambda c, label: c.get(reverse("login")))
+
+    def test_login(self):
+        self.assertAnonymousBudget(
+            9,
+            lambda c, label: c.post(
+                reverse("login"),
+                {"username": self.users[label].username, "password": "x"},
+            ),
+        )
+
+    def test_logout(self):
+        self.assertViewBudget(4, lambda c, farm: c.post(reverse("logout")))
+
+    def test_register_page(self):
+        self.assertAnonymousBudget(0, lambda c, label: c.get(reverse("register")))
+
+    def test_register(self):
+        self.assertAnonymousBudget(
+            2,
+            lambda c, label: c.post(
+                reverse("register"),
+                {
+                    "email": f"nowy-{label}@example.com",
+                    "password1": "Trudne-haslo-123",
+                    "password2": "Trudne-haslo-123",
+                },
+            ),
+        )
+
+    def test_profile(self):
+        self.assertViewBudget(6, lambda c, farm: c.get(reverse("profile")))
+
+    def test_create_user(self):
+        def create(label):
+            return lambda: User.objects.create_user(f"nowy-{label}@example.com")
+
+        self.assertQueryBudget(2, create("small"), create("large"))
+        self.assertEqual(
+            Profile.objects.filter(user__username__startswith="nowy").count(), 2
+        )
+
+    def test_user_save_keeps_profile(self):
+        def save(label):
+            user = User.objects.get(pk=self.users[label].pk)
+            user.first_name = "Jan"
+            return user.save
+
+        self.assertQueryBudget(1, save("small"), save("large"))
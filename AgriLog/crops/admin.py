@@ -1,6 +1,131 @@
-from django.contrib import admin
+import os
 
-from .models import Field, CropType, Cultivation, Treatment
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from django.utils.functional import cached_property
+
+from . import audit, events, replica
+from .dashboard import invalidate_dashboard
+from .models import (
+    ArchivedCultivation,
+    ArchivedTreatment,
+    ArchivedTreatmentInput,
+    Attachment,
+    AuditEntry,
+    Blob,
+    CropType,
+    Cultivation,
+    Field,
+    InputRollup,
+    PlannedTreatment,
+    RequestProfile,
+    RotationStep,
+    RotationTemplate,
+    SensorChunk,
+    Treatment,
+    TreatmentInput,
+    TreatmentSchedule,
+)
+
+
+class EstimatedCountPaginator(Paginator):
+    # Na dużych tabelach COUNT(*) kosztuje tyle co skan całej tabeli.
+    # Bez filtrów bierzemy liczbę wierszy ze statystyk ANALYZE (a bez
+    # statystyk liczymy dokładnie, by każda strona była osiągalna), a przy
+    # filtrach liczymy najwyżej do limitu.
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self._estimate(queryset)
+            if estimate is not None:
+                return estimate
+            return queryset.order_by().count()
+        return queryset.order_by()[: self.count_limit].count()
+
+    def _estimate(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != "sqlite":
+            return None
+        with connection.cursor() as cursor:
+            try:
+                # Pierwsza liczba w "stat" to liczba wierszy tabeli (dla
+                # indeksu częściowego mniej), więc bierzemy największą
+                cursor.execute(
+                    "SELECT stat FROM sqlite_stat1 WHERE tbl = %s",
+                    [queryset.model._meta.db_table],
+                )
+            except Exception:
+                return None
+            rows = cursor.fetchall()
+        counts = [int(stat.split()[0]) for stat, in rows if stat]
+        return max(counts) if counts else None
+
+
+class NameSearchFilter(admin.SimpleListFilter):
+    # Pole tekstowe zamiast listy wszystkich rekordów powiązanych w panelu
+    template = "admin/crops/input_filter.html"
+    related_model = None
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        yield {
+            "value": self.value() or "",
+            "hidden": [
+                (key, value)
+                for key, values in changelist.get_filters_params().items()
+                if key != self.parameter_name
+                for value in (values if isinstance(values, list) else [values])
+            ],
+        }
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        ids = self.related_model.objects.filter(
+            name__icontains=self.value()
+        ).values_list("pk", flat=True)[:500]
+        return queryset.filter(**{f"{self.parameter_name}__in": list(ids)})
+
+
+class FieldNameFilter(NameSearchFilter):
+    title = "pole"
+    parameter_name = "field"
+    related_model = Field
+
+
+class CropTypeNameFilter(NameSearchFilter):
+    title = "roślina"
+    parameter_name = "crop_type"
+    related_model = CropType
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+    def changelist_view(self, request, extra_context=None):
+        # Listy (GET) mogą czytać z kopii bazy; akcje (POST) idą do głównej
+        with replica.reading_for(request):
+            response = super().changelist_view(request, extra_context)
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+        return response
 
 
 @admin.register(CropType)
@@ -14,16 +139,222 @@ class CropTypeAdmin(admin.ModelAdmin):
 class FieldAdmin(admin.ModelAdmin):
     list_display = ["name", "area_size", "owner", "created", "updated"]
     list_display_links = ["name"]
+    list_select_related = ["owner"]
     list_filter = ["owner"]
     search_fields = ["name"]
 
 
+def _set_status(modeladmin, request, queryset, status):
+    # Jedno UPDATE zamiast save() dla każdego wiersza; sygnały nie idą,
+    # więc dziennik zmian, pulpity i strony pól uzupełniamy ręcznie
+    with transaction.atomic():
+        changed = list(
+            queryset.exclude(status=status).only("id", "owner_id", "field_id", "status")
+        )
+        Cultivation.objects.filter(pk__in=[c.pk for c in changed]).update(
+            status=status, updated=timezone.now()
+        )
+        for cultivation in changed:
+            cultivation.status = status
+            audit.record(cultivation, AuditEntry.Action.UPDATE, cultivation.owner_id)
+    invalidate_dashboard(*{c.owner_id for c in changed})
+    events.field_changed({c.field_id for c in changed}, "cultivation", "updated")
+    modeladmin.message_user(
+        request, f"Zmieniono status {len(changed)} upraw.", messages.SUCCESS
+    )
+
+
+@admin.action(description="Oznacz jako zakończone (zebrane)")
+def mark_completed(modeladmin, request, queryset):
+    _set_status(modeladmin, request, queryset, Cultivation.Status.COMPLETED)
+
+
+@admin.action(description="Oznacz jako w trakcie")
+def mark_in_progress(modeladmin, request, queryset):
+    _set_status(modeladmin, request, queryset, Cultivation.Status.PROGRESS)
+
+
+@admin.action(description="Oznacz jako anulowane")
+def mark_cancelled(modeladmin, request, queryset):
+    _set_status(modeladmin, request, queryset, Cultivation.Status.CANCELLED)
+
+
 @admin.register(Cultivation)
-class CultivationAdmin(admin.ModelAdmin):
+class CultivationAdmin(LargeTableAdmin):
     list_display = ["field", "crop_type", "status", "year", "created", "updated"]
-    list_filter = ["status", "year", "field", "crop_type"]
+    list_select_related = ["field", "crop_type"]
+    list_filter = ["status", "year", FieldNameFilter, CropTypeNameFilter]
+    autocomplete_fields = ["field", "crop_type", "owner"]
+    actions = [mark_completed, mark_in_progress, mark_cancelled]
+
+
+class TreatmentInputInline(admin.TabularInline):
+    model = TreatmentInput
+    extra = 0
 
 
 @admin.register(Treatment)
-class TreatmentAdmin(admin.ModelAdmin):
+class TreatmentAdmin(LargeTableAdmin):
     list_display = ["date", "treatment_type", "field", "crop_type", "created"]
+    list_select_related = ["field", "crop_type"]
+    list_filter = ["treatment_type", FieldNameFilter, CropTypeNameFilter]
+    date_hierarchy = "date"
+    autocomplete_fields = ["field", "crop_type"]
+    inlines = [TreatmentInputInline]
+
+
+@admin.register(InputRollup)
+class InputRollupAdmin(LargeTableAdmin):
+    list_display = ["field", "season", "kind", "component", "total_amount", "unit"]
+    list_select_related = ["field"]
+    list_filter = ["kind", "season"]
+    search_fields = ["component"]
+
+
+@admin.register(ArchivedCultivation)
+class ArchivedCultivationAdmin(LargeTableAdmin):
+    list_display = ["field", "crop_type", "status", "year"]
+    list_select_related = ["field", "crop_type"]
+    list_filter = ["status", "year"]
+
+
+class ArchivedTreatmentInputInline(admin.TabularInline):
+    model = ArchivedTreatmentInput
+    extra = 0
+
+
+@admin.register(ArchivedTreatment)
+class ArchivedTreatmentAdmin(LargeTableAdmin):
+    list_display = ["date", "treatment_type", "field", "crop_type"]
+    list_select_related = ["field", "crop_type"]
+    inlines = [ArchivedTreatmentInputInline]
+
+
+@admin.register(SensorChunk)
+class SensorChunkAdmin(LargeTableAdmin):
+    list_display = ["field", "metric", "day", "count", "value_min", "value_max"]
+    list_select_related = ["field"]
+    list_filter = ["metric"]
+    exclude = ["timestamps", "values", "hourly"]
+
+
+@admin.register(AuditEntry)
+class AuditEntryAdmin(LargeTableAdmin):
+    list_display = ["created", "model", "object_id", "action", "user"]
+    list_select_related = ["user"]
+    list_filter = ["model", "action"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class RotationStepInline(admin.TabularInline):
+    model = RotationStep
+    extra = 0
+    autocomplete_fields = ["crop_type"]
+
+
+@admin.register(RotationTemplate)
+class RotationTemplateAdmin(admin.ModelAdmin):
+    list_display = ["name", "owner", "created"]
+    list_select_related = ["owner"]
+    search_fields = ["name"]
+    inlines = [RotationStepInline]
+
+
+@admin.register(TreatmentSchedule)
+class TreatmentScheduleAdmin(admin.ModelAdmin):
+    list_display = [
+        "name",
+        "owner",
+        "treatment_type",
+        "crop_type",
+        "interval_months",
+        "days_after_sowing",
+        "active",
+    ]
+    list_select_related = ["owner", "crop_type"]
+    list_filter = ["treatment_type", "active"]
+    filter_horizontal = ["fields"]
+    autocomplete_fields = ["crop_type"]
+
+
+@admin.register(PlannedTreatment)
+class PlannedTreatmentAdmin(LargeTableAdmin):
+    list_display = ["due_date", "treatment_type", "field", "status", "schedule"]
+    list_select_related = ["field", "schedule"]
+    list_filter = ["status", "treatment_type"]
+    date_hierarchy = "due_date"
+    raw_id_fields = ["field", "treatment"]
+
+
+@admin.register(Attachment)
+class AttachmentAdmin(LargeTableAdmin):
+    list_display = ["created", "name", "field", "treatment", "owner"]
+    list_select_related = ["field", "treatment", "owner"]
+    raw_id_fields = ["field", "treatment", "blob"]
+
+
+@admin.register(Blob)
+class BlobAdmin(LargeTableAdmin):
+    list_display = ["digest", "size", "content_type", "renditions_ready", "created"]
+    list_filter = ["renditions_ready"]
+    search_fields = ["digest"]
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = [
+        "created",
+        "view_name",
+        "method",
+        "path",
+        "status_code",
+        "duration_ms",
+        "sql_ms",
+        "sql_count",
+        "template_ms",
+        "python_ms",
+        "trigger",
+        "download",
+    ]
+    list_filter = ["trigger", "view_name", "method"]
+    search_fields = ["path", "view_name"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:pk>/folded/",
+                self.admin_site.admin_view(self.folded_view),
+                name="crops_requestprofile_folded",
+            ),
+        ] + super().get_urls()
+
+    @admin.display(description="Próbki")
+    def download(self, obj):
+        url = reverse("admin:crops_requestprofile_folded", args=[obj.pk])
+        return format_html('<a href="{}">{}</a>', url, obj.file_name)
+
+    def folded_view(self, request, pk):
+        if not self.has_view_permission(request):
+            raise Http404
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        try:
+            handle = open(os.path.join(settings.PROFILES_DIR, profile.file_name), "rb")
+        except FileNotFoundError:
+            raise Http404
+        return FileResponse(
+            handle,
+            as_attachment=True,
+            filename=profile.file_name,
+            content_type="text/plain",
+        )
@@ -0,0 +1,279 @@
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from . import forecast, refdata
+from .models import Cultivation, Field
+from .rollover import Proposal, next_crop
+
+# Kara za każdy hektar odchylenia od docelowej powierzchni rośliny; wyraźnie
+# większa niż różnice plonu, więc najpierw liczą się powierzchnie
+AREA_PENALTY = 10.0
+# Premia (na ha) za roślinę wynikającą z płodozmianu
+ROTATION_BONUS = 0.5
+# Ta sama roślina może wrócić na pole najwcześniej po tylu latach przerwy
+DEFAULT_GAP = 1
+TIME_LIMIT = 5.0
+# Liczba losowanych par pól w jednej rundzie łańcuchów i liczba rund bez poprawy
+CHAIN_SAMPLE = 20000
+CHAIN_PATIENCE = 3
+EPSILON = 1e-9
+
+
+@dataclass
+class Allocation:
+    year: int
+    proposals: list
+    targets: dict
+    areas: dict
+    objective: float
+    moves: int
+    chains: int
+    seconds: float
+
+    @property
+    def ready_count(self):
+        return sum(p.ready for p in self.proposals)
+
+    def summary(self):
+        # (roślina, cel w ha, przydzielone ha) dla szablonu i komendy
+        return [
+            (refdata.crop_type(crop_id), target, self.areas[crop_id])
+            for crop_id, target in self.targets.items()
+        ]
+
+
+def solve(
+    cost, allowed, area, targets, penalty=AREA_PENALTY, time_limit=TIME_LIMIT, seed=0
+):
+    """Przydział opcji (kolumn ``cost``) do pól (wierszy) minimalizujący koszt
+    pól plus ``penalty`` za każdy ha odchylenia od ``targets``.
+
+    Ostatnia kolumna to "bez uprawy": bez kosztu i bez celu powierzchni.
+    Start zachłanny (najpierw pola z jedną dozwoloną opcją, potem od
+    największych), dalej przeszukiwanie lokalne: najlepsze przeniesienie
+    pola liczone naraz dla całej macierzy, a gdy go brak - najlepszy z
+    losowej próbki łańcuchów przeniesień dwóch pól.
+    """
+    fields, options = cost.shape
+    goal = np.append(np.asarray(targets, dtype=np.float64), 0.0)
+    weight = np.append(np.full(options - 1, penalty), 0.0)
+    cost = np.where(allowed, cost, np.inf)
+    rows = np.arange(fields)
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+
+    def deviation(totals):
+        return weight * np.abs(totals - goal)
+
+    totals = np.zeros(options)
+    assignment = np.full(fields, options - 1)
+    single = allowed.sum(axis=1) == 1
+    for f in np.lexsort((-area, ~single)):
+        change = deviation(totals + area[f]) - deviation(totals)
+        choice = int(np.argmin(cost[f] + change))
+        assignment[f] = choice
+        totals[choice] += area[f]
+
+    moves = chains = misses = 0
+    deadline = started + time_limit
+    while fields and time.perf_counter() < deadline:
+        current = cost[rows, assignment]
+        own = totals[assignment]
+        removed = weight[assignment] * (
+            np.abs(own - area - goal[assignment]) - np.abs(own - goal[assignment])
+        )
+        added = deviation(totals + area[:, None]) - deviation(totals)
+        delta = cost - current[:, None] + removed[:, None] + added
+        delta[rows, assignment] = np.inf
+        f, option = divmod(int(np.argmin(delta)), options)
+        if delta[f, option] < -EPSILON:
+            totals[assignment[f]] -= area[f]
+            totals[option] += area[f]
+            assignment[f] = option
+            moves += 1
+            continue
+
+        # Łańcuch: pole f przejmuje roślinę pola g, a g przechodzi na
+        # najlepszą inną opcję (także roślinę f, czyli zwykła zamiana)
+        first = rng.integers(fields, size=CHAIN_SAMPLE)
+        second = rng.integers(fields, size=CHAIN_SAMPLE)
+        a, c = assignment[first], assignment[second]
+        sample = np.arange(CHAIN_SAMPLE)
+        shifted = np.tile(totals, (CHAIN_SAMPLE, 1))
+        shifted[sample, a] -= area[first]
+        shifted[sample, c] += area[first] - area[second]
+        base = deviation(shifted).sum(axis=1) - deviation(totals).sum()
+        added = deviation(shifted + area[second][:, None]) - deviation(shifted)
+        delta = (
+            (cost[first, c] - cost[first, a] - cost[second, c] + base)[:, None]
+            + cost[second]
+            + added
+        )
+        delta[sample, c] = np.inf
+        delta[a == c] = np.inf
+        m, option = divmod(int(np.argmin(delta)), options)
+        if delta[m, option] >= -EPSILON:
+            misses += 1
+            if misses >= CHAIN_PATIENCE:
+                break
+            continue
+        misses = 0
+        f, g = first[m], second[m]
+        totals[a[m]] -= area[f]
+        totals[c[m]] += area[f] - area[g]
+        totals[option] += area[g]
+        assignment[f], assignment[g] = c[m], option
+        chains += 1
+
+    objective = float(cost[rows, assignment].sum() + deviation(totals).sum())
+    stats = {
+        "moves": moves,
+        "chains": chains,
+        "objective": objective,
+        "seconds": time.perf_counter() - started,
+    }
+    return assignment, totals[:-1], stats
+
+
+def _load(user, year, horizon):
+    fields = list(
+        Field.objects.for_owner(user)
+        .order_by("name", "pk")
+        .values_list("pk", "name", "area_size", "soil_class")
+    )
+    # Cała historia potrzebna do ograniczeń płodozmianu jednym zapytaniem
+    history = list(
+        Cultivation.objects.for_owner(user)
+        .filter(year__gte=year - horizon, year__lte=year, crop_type__isnull=False)
+        .order_by("year", "sowing_date", "pk")
+        .values_list("field_id", "crop_type_id", "year")
+    )
+    return fields, history
+
+
+def _relative_yield(field_ids, areas, soils, crop_ids, year):
+    """Przewidywany plon z ha względem średniej danej rośliny (1 = średnio)."""
+    pairs = len(field_ids) * len(crop_ids)
+    targets = {
+        "id": np.arange(pairs),
+        "field": np.repeat(field_ids, len(crop_ids)),
+        "crop": np.tile(np.asarray(crop_ids, dtype=np.int64), len(field_ids)),
+        "area": np.repeat(areas, len(crop_ids)),
+        "soil": np.repeat(forecast._soil_index(soils), len(crop_ids)),
+        "year": np.full(pairs, year, dtype=np.float64),
+    }
+    per_ha, _, _, _ = forecast.predict(forecast.load_history(), targets)
+    per_ha = per_ha.reshape(len(field_ids), len(crop_ids))
+    mean = np.full(len(crop_ids), np.nan)
+    known = ~np.isnan(per_ha).all(axis=0)
+    mean[known] = np.nanmean(per_ha[:, known], axis=0)
+    relative = per_ha / np.where(mean > 0, mean, np.nan)
+    return np.nan_to_num(relative, nan=1.0)
+
+
+def allocate(
+    user,
+    year,
+    targets=None,
+    rotation=None,
+    gaps=None,
+    time_limit=TIME_LIMIT,
+    seed=0,
+):
+    """Plan roślin na rok ``year`` dla wszystkich pól użytkownika.
+
+    ``targets`` to docelowa powierzchnia (ha) każdej rośliny; domyślnie
+    powierzchnie z roku poprzedniego. Roślina nie wraca na pole przez
+    ``gaps[crop_id]`` lat (domyślnie DEFAULT_GAP); płodozmian ``rotation``
+    jest preferowany, a w jego ramach wybieramy pola o lepszym
+    przewidywanym plonie. Pola z uprawą w roku ``year`` zostają bez zmian.
+    """
+    gaps = gaps or {}
+    horizon = max([DEFAULT_GAP, *gaps.values()])
+    fields, history = _load(user, year, horizon)
+    sequence = rotation.crop_ids() if rotation is not None else None
+
+    field_ids = np.asarray([row[0] for row in fields], dtype=np.int64)
+    areas = np.asarray([row[2] for row in fields], dtype=np.float64)
+    row_of = {pk: index for index, pk in enumerate(field_ids.tolist())}
+
+    if targets is None:
+        targets = {}
+        for field_id, crop_id, crop_year in history:
+            if crop_year == year - 1 and field_id in row_of:
+                area = areas[row_of[field_id]]
+                targets[crop_id] = targets.get(crop_id, 0.0) + area
+    crop_ids = sorted(targets)
+    column_of = {crop_id: index for index, crop_id in enumerate(crop_ids)}
+    none = len(crop_ids)
+
+    allowed = np.ones((len(fields), none + 1), dtype=bool)
+    source = np.full(len(fields), -1, dtype=np.int64)
+    fixed = {}
+    for field_id, crop_id, crop_year in history:
+        row = row_of.get(field_id)
+        if row is None:
+            continue
+        column = column_of.get(crop_id)
+        if crop_year == year:
+            fixed[row] = crop_id
+            allowed[row] = False
+            allowed[row, none if column is None else column] = True
+            continue
+        if crop_year == year - 1:
+            source[row] = crop_id
+        if column is not None and year - crop_year <= gaps.get(crop_id, DEFAULT_GAP):
+            allowed[row, column] = False
+
+    cost = np.zeros((len(fields), none + 1))
+    if crop_ids and fields:
+        soils = [row[3] for row in fields]
+        gain = _relative_yield(field_ids, areas, soils, crop_ids, year)
+        if sequence:
+            follows = np.asarray(
+                [next_crop(sequence, crop if crop >= 0 else None) for crop in source]
+            )
+            gain = gain + ROTATION_BONUS * (
+                follows[:, None] == np.asarray(crop_ids)[None, :]
+            )
+        cost[:, :none] = -gain * areas[:, None]
+
+    assignment, totals, stats = solve(
+        cost,
+        allowed,
+        areas,
+        [targets[crop_id] for crop_id in crop_ids],
+        time_limit=time_limit,
+        seed=seed,
+    )
+
+    proposals = [
+        Proposal(
+            field_id=pk,
+            field_name=name,
+            area_size=area_size,
+            source_crop_id=int(source[row]) if source[row] >= 0 else None,
+            crop_id=(
+                fixed[row]
+                if row in fixed
+                else crop_ids[assignment[row]] if assignment[row] < none else None
+            ),
+            planned=row in fixed,
+        )
+        for row, (pk, name, area_size, _) in enumerate(fields)
+    ]
+    return Allocation(
+        year=year,
+        proposals=proposals,
+        targets={crop_id: round(float(targets[crop_id]), 2) for crop_id in crop_ids},
+        areas={
+            crop_id: round(float(totals[index]), 2)
+            for index, crop_id in enumerate(crop_ids)
+        },
+        objective=stats["objective"],
+        moves=stats["moves"],
+        chains=stats["chains"],
+        seconds=stats["seconds"],
+    )
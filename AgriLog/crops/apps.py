@@ -2,4 +2,4 @@ from django.apps import AppConfig
 
 
 class CropsConfig(AppConfig):
-    name = 'crops'
+    name = "crops"
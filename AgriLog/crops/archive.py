@@ -0,0 +1,138 @@
+import datetime
+import time
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import reconcile
+from .models import (
+    ArchivedCultivation,
+    ArchivedTreatment,
+    ArchivedTreatmentInput,
+    Cultivation,
+    Treatment,
+    TreatmentInput,
+)
+
+
+def archive_cutoff_year(horizon=None):
+    # Sezony starsze niż horyzont (w latach) trafiają do archiwum
+    if horizon is None:
+        horizon = settings.ARCHIVE_HORIZON_YEARS
+    return timezone.now().year - horizon
+
+
+def _copy_rows(source, target_model):
+    names = [f.attname for f in target_model._meta.concrete_fields]
+    return [
+        target_model(**{name: getattr(row, name) for name in names}) for row in source
+    ]
+
+
+def _archive_batch(queryset, target_model, batch_size, children=()):
+    with transaction.atomic(), reconcile.paused():
+        rows = list(queryset.order_by("pk")[:batch_size])
+        if not rows:
+            return 0
+        pks = [row.pk for row in rows]
+        target_model.objects.bulk_create(_copy_rows(rows, target_model))
+        # Wiersze zależne kopiujemy w tej samej paczce, zanim kaskada
+        # usunie je razem z rodzicem
+        for child_model, child_target, parent in children:
+            child_rows = child_model.objects.filter(**{f"{parent}__in": pks})
+            child_target.objects.bulk_create(_copy_rows(child_rows, child_target))
+        queryset.model.objects.filter(pk__in=pks).delete()
+    return len(rows)
+
+
+def archive_seasons(horizon=None, batch_size=1000, pause=0.0, stdout=None):
+    """Przenosi zamknięte sezony do tabel archiwalnych krótkimi paczkami.
+
+    Każda paczka to osobna, krótka transakcja, więc zapisy zabiegów
+    w trakcie archiwizacji czekają najwyżej na jedną paczkę.
+    """
+    cutoff = archive_cutoff_year(horizon)
+    moved = {"cultivations": 0, "treatments": 0}
+    jobs = [
+        (
+            "cultivations",
+            Cultivation.objects.filter(year__lt=cutoff),
+            ArchivedCultivation,
+            (),
+        ),
+        (
+            "treatments",
+            Treatment.objects.filter(date__lt=datetime.date(cutoff, 1, 1)),
+            ArchivedTreatment,
+            [(TreatmentInput, ArchivedTreatmentInput, "treatment")],
+        ),
+    ]
+
+    for label, queryset, target_model, children in jobs:
+        while True:
+            count = _archive_batch(queryset, target_model, batch_size, children)
+            if not count:
+                break
+            moved[label] += count
+            if stdout is not None:
+                stdout.write(f"{label}: {moved[label]}")
+            if pause:
+                time.sleep(pause)
+
+    return moved
+
+
+class SeasonChain(Sequence):
+    """Bieżące i zarchiwizowane uprawy jako jedna lista do paginacji.
+
+    Archiwum zawiera tylko starsze lata, więc sklejenie obu zapytań
+    (oba sortowane malejąco po roku) zachowuje kolejność.
+    """
+
+    def __init__(self, hot, archived):
+        self.hot = hot
+        self.archived = archived
+        self._hot_count = None
+
+    def hot_count(self):
+        if self._hot_count is None:
+            self._hot_count = self.hot.count()
+        return self._hot_count
+
+    def __len__(self):
+        return self.hot_count() + self.archived.count()
+
+    def count(self):
+        return len(self)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index : index + 1][0]
+
+        start, stop = index.start or 0, index.stop
+        hot_count = self.hot_count()
+        items = list(self.hot[start:stop]) if start < hot_count else []
+        if stop is None or stop > hot_count:
+            archived_start = max(start - hot_count, 0)
+            archived_stop = None if stop is None else stop - hot_count
+            items.extend(self.archived[archived_start:archived_stop])
+        return items
+
+
+def cultivations_for(user, include_archived=False):
+    # Pełna historia upraw pokazuje też początek notatek
+    hot = (
+        Cultivation.objects.for_owner(user)
+        .for_list("notes")
+        .order_by("-year", "-created")
+    )
+    if not include_archived:
+        return hot
+    archived = (
+        ArchivedCultivation.objects.for_owner(user)
+        .for_list("notes")
+        .order_by("-year", "-created")
+    )
+    return SeasonChain(hot, archived)
@@ -0,0 +1,229 @@
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+
+from .models import Attachment, Blob
+
+RENDITIONS = {"thumb": 320, "web": 1600}
+JPEG_QUALITY = 82
+# Najwyżej tyle zadań czeka w puli; nadmiar dokańcza render_attachments
+QUEUE_LIMIT = 64
+# Przyjmowane formaty (wg Pillow) i typ, z jakim oddajemy oryginał
+IMAGE_TYPES = {
+    "JPEG": "image/jpeg",
+    "MPO": "image/jpeg",
+    "PNG": "image/png",
+    "GIF": "image/gif",
+    "WEBP": "image/webp",
+    "TIFF": "image/tiff",
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(QUEUE_LIMIT)
+
+
+class AttachmentError(ValueError):
+    pass
+
+
+def storage_root():
+    return os.path.join(settings.MEDIA_ROOT, "attachments")
+
+
+def blob_path(digest, rendition=None):
+    name = digest if rendition is None else f"{digest}.{rendition}.jpg"
+    return os.path.join(storage_root(), digest[:2], digest[2:4], name)
+
+
+def _write_temporary(upload):
+    # Plik zapisujemy strumieniowo, licząc skrót w locie
+    directory = os.path.join(storage_root(), "tmp")
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    handle, path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(handle, "wb") as destination:
+            for chunk in upload.chunks():
+                size += len(chunk)
+                if size > settings.ATTACHMENT_MAX_BYTES:
+                    raise AttachmentError(f"Plik {upload.name} jest za duży")
+                digest.update(chunk)
+                destination.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, digest.hexdigest(), size
+
+
+def detect_content_type(path, name):
+    """Typ zdjęcia rozpoznany przez Pillow z treści pliku.
+
+    Nagłówek Content-Type wysłany przez klienta nie ma znaczenia.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            image_format = image.format
+            image.verify()
+    except Exception as error:
+        raise AttachmentError(f"Plik {name} nie jest zdjęciem") from error
+    if image_format not in IMAGE_TYPES:
+        raise AttachmentError(f"Nieobsługiwany format zdjęcia {name}")
+    return IMAGE_TYPES[image_format]
+
+
+def _prepare(upload):
+    # Zapis do pliku tymczasowego i weryfikacja; niczego jeszcze nie utrwala
+    path, digest, size = _write_temporary(upload)
+    try:
+        content_type = detect_content_type(path, upload.name)
+    except AttachmentError:
+        os.unlink(path)
+        raise
+    return path, digest, size, content_type
+
+
+def _store_prepared(path, digest, size, content_type):
+    blob = Blob.objects.filter(digest=digest).first()
+    if blob is not None:
+        os.unlink(path)
+        return blob
+
+    target = blob_path(digest)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(path, target)
+    try:
+        with transaction.atomic():
+            blob = Blob.objects.create(
+                digest=digest, size=size, content_type=content_type
+            )
+    except IntegrityError:
+        # Ten sam plik wgrany równolegle przez inne żądanie
+        return Blob.objects.get(digest=digest)
+    transaction.on_commit(lambda: schedule(blob))
+    return blob
+
+
+def store(upload):
+    """Zapisuje plik pod ścieżką wyznaczoną skrótem i zwraca Blob."""
+    return _store_prepared(*_prepare(upload))
+
+
+def attach(user, field, uploads, treatment=None, caption=""):
+    """Dołącza zdjęcia do pola; błędny plik odrzuca całe wysłanie.
+
+    Najpierw sprawdzamy wszystkie pliki, a dopiero potem zapisujemy Bloby,
+    by odrzucone wysłanie nie zostawiło plików bez załącznika.
+    """
+    prepared = []
+    try:
+        for upload in uploads:
+            prepared.append((upload, _prepare(upload)))
+    except BaseException:
+        for _, stored in prepared:
+            os.unlink(stored[0])
+        raise
+
+    attachments = [
+        Attachment(
+            owner=user,
+            field=field,
+            treatment=treatment,
+            blob=_store_prepared(*stored),
+            name=os.path.basename(upload.name)[:255],
+            caption=caption,
+        )
+        for upload, stored in prepared
+    ]
+    return Attachment.objects.bulk_create(attachments)
+
+
+def render(digest, source):
+    """Tworzy miniaturę i wersję do przeglądarki; działa w procesie puli."""
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        width, height = image.size
+        image = image.convert("RGB")
+        for rendition, size in RENDITIONS.items():
+            copy = image.copy()
+            copy.thumbnail((size, size))
+            target = blob_path(digest, rendition)
+            temporary = f"{target}.tmp"
+            copy.save(temporary, "JPEG", quality=JPEG_QUALITY, optimize=True)
+            os.replace(temporary, target)
+    return digest, width, height
+
+
+def _mark_ready(digest, width=None, height=None):
+    Blob.objects.filter(digest=digest).update(
+        renditions_ready=True, width=width, height=height
+    )
+
+
+def _finished(future):
+    _slots.release()
+    try:
+        digest, width, height = future.result()
+    except Exception:
+        # Uszkodzony plik zostaje bez miniatur; komenda spróbuje ponownie
+        return
+    try:
+        _mark_ready(digest, width, height)
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=settings.ATTACHMENT_WORKERS)
+        return _executor
+
+
+def schedule(blob):
+    # Poza ścieżką żądania; przy pełnej kolejce plik czeka na komendę
+    if settings.ATTACHMENT_WORKERS < 1 or not _slots.acquire(blocking=False):
+        return False
+    try:
+        future = _get_executor().submit(render, blob.digest, blob_path(blob.digest))
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(_finished)
+    return True
+
+
+def render_pending(limit=None, stdout=None):
+    """Synchronicznie dokańcza miniatury, których pula nie zrobiła."""
+    pending = Blob.objects.filter(renditions_ready=False).order_by("created")
+    if limit:
+        pending = pending[:limit]
+    done = failed = 0
+    for digest in pending.values_list("digest", flat=True):
+        try:
+            _, width, height = render(digest, blob_path(digest))
+        except Exception as error:
+            failed += 1
+            if stdout is not None:
+                stdout.write(f"{digest}: {error}")
+            continue
+        _mark_ready(digest, width, height)
+        done += 1
+    return done, failed
+
+
+def rendition_path(blob, rendition):
+    if rendition == "original" or not blob.renditions_ready:
+        return blob_path(blob.digest)
+    return blob_path(blob.digest, rendition)
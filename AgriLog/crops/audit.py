@@ -0,0 +1,150 @@
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AuditEntry
+
+_buffer = ContextVar("audit_buffer", default=None)
+
+LABELS = {
+    "name": "Nazwa",
+    "area_size": "Powierzchnia (ha)",
+    "soil_class": "Klasa gleby",
+    "notes": "Opis",
+    "crop_type": "Roślina",
+    "status": "Status",
+    "sowing_date": "Data siewu",
+    "yield_amount": "Plon (kg)",
+    "field": "Pole",
+    "treatment_type": "Rodzaj zabiegu",
+    "date": "Data",
+    "description": "Opis",
+}
+
+
+class AuditBuffer:
+    def __init__(self, user=None):
+        self.user = user
+        self.entries = []
+
+    def user_id(self):
+        # request.user jest leniwy; odczytujemy go dopiero przy pierwszym wpisie
+        if self.user is not None and self.user.is_authenticated:
+            return self.user.pk
+        return None
+
+    def flush(self):
+        # Jeden INSERT na żądanie, niezależnie od liczby zapisanych obiektów
+        if self.entries:
+            AuditEntry.objects.bulk_create(self.entries)
+            self.entries = []
+
+
+@contextmanager
+def buffered(user=None):
+    buffer = AuditBuffer(user)
+    token = _buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _buffer.reset(token)
+        buffer.flush()
+
+
+def snapshot(instance):
+    # Tylko pola faktycznie wczytane; odroczone pominięte, by nie robić zapytań
+    loaded = instance.__dict__
+    return {
+        name: loaded[attname]
+        for name, attname in _tracked(instance)
+        if attname in loaded
+    }
+
+
+def _tracked(instance):
+    meta = instance._meta
+    return [(name, meta.get_field(name).attname) for name in instance.audit_fields]
+
+
+def encode(changes):
+    return json.dumps(changes, cls=DjangoJSONEncoder, separators=(",", ":"))
+
+
+def diff(before, after):
+    return {
+        name: [before.get(name), value]
+        for name, value in after.items()
+        if name in before and before[name] != value
+    }
+
+
+def record(instance, action, owner_id):
+    after = snapshot(instance)
+    if action == AuditEntry.Action.CREATE:
+        changes = {name: [None, value] for name, value in after.items() if value}
+    elif action == AuditEntry.Action.DELETE:
+        changes = {name: [value, None] for name, value in after.items() if value}
+    else:
+        changes = diff(getattr(instance, "_audit_snapshot", {}), after)
+        if not changes:
+            return
+    instance._audit_snapshot = after
+
+    buffer = _buffer.get()
+    entry = AuditEntry(
+        model=instance._meta.model_name,
+        object_id=instance.pk,
+        action=action,
+        owner_id=owner_id,
+        user_id=buffer.user_id() if buffer else None,
+        changes=encode(changes),
+        created=timezone.now(),
+    )
+    if buffer is None:
+        # Poza żądaniem (komendy, powłoka) zapis trafia do bazy po zatwierdzeniu
+        transaction.on_commit(entry.save)
+    else:
+        # Wycofana transakcja nie zostawia wpisów w buforze
+        transaction.on_commit(lambda: buffer.entries.append(entry))
+
+
+def history(model, object_id, owner):
+    return (
+        AuditEntry.objects.filter(model=model, object_id=object_id, owner=owner)
+        .select_related("user")
+        .order_by("-created", "-id")
+    )
+
+
+class AuditMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Pod ASGI łańcuch zostaje asynchroniczny; bez tego Django
+        # przełączałby każde żądanie do wątku synchronicznego
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with buffered(getattr(request, "user", None)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        buffer = AuditBuffer(getattr(request, "user", None))
+        token = _buffer.set(buffer)
+        try:
+            return await self.get_response(request)
+        finally:
+            _buffer.reset(token)
+            # Do wątku przechodzimy tylko wtedy, gdy jest co zapisać
+            if buffer.entries:
+                await sync_to_async(buffer.flush)()
@@ -0,0 +1,350 @@
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+
+from django.conf import settings
+from django.db import connections
+
+FULL = "full"
+INCREMENTAL = "incremental"
+# Rozszerzenia plików jednej kopii: dane, opis z sumami kontrolnymi i skróty
+# stron potrzebne do wyliczenia następnej kopii przyrostowej
+EXTENSIONS = {FULL: ".sqlite3", INCREMENTAL: ".delta"}
+MANIFEST = ".json"
+DIGESTS = ".pages"
+DIGEST_SIZE = 8
+# Po tylu restartach (zapis w bazie w trakcie kopiowania) kopiujemy bez przerw
+MAX_RESTARTS = 3
+_PAGE_HEADER = struct.Struct(">I")
+_CHUNK = 1024 * 1024
+
+
+class BackupError(Exception):
+    pass
+
+
+@dataclass
+class Snapshot:
+    name: str
+    kind: str
+    created: float
+    page_size: int
+    page_count: int
+    pages_written: int
+    data_sha256: str
+    image_sha256: str
+    parent: str | None = None
+    stats: dict = field(default_factory=dict)
+    directory: str = field(default="", repr=False, compare=False)
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, self.name + EXTENSIONS[self.kind])
+
+    @property
+    def files(self):
+        return [
+            self.path,
+            os.path.join(self.directory, self.name + MANIFEST),
+            os.path.join(self.directory, self.name + DIGESTS),
+        ]
+
+    def save(self):
+        data = asdict(self)
+        del data["directory"]
+        manifest = os.path.join(self.directory, self.name + MANIFEST)
+        with open(f"{manifest}.tmp", "w", encoding="utf-8") as output:
+            json.dump(data, output, indent=2)
+        # Opis zapisujemy na końcu: kopia bez opisu nie istnieje dla list_snapshots
+        os.replace(f"{manifest}.tmp", manifest)
+
+    def read_digests(self):
+        with open(os.path.join(self.directory, self.name + DIGESTS), "rb") as stream:
+            data = stream.read()
+        return [
+            data[offset : offset + DIGEST_SIZE]
+            for offset in range(0, len(data), DIGEST_SIZE)
+        ]
+
+
+def _backups_dir(directory):
+    return str(directory or settings.BACKUPS_DIR)
+
+
+def _database_path(database):
+    return str(database or connections["default"].settings_dict["NAME"])
+
+
+def list_snapshots(directory=None):
+    directory = _backups_dir(directory)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    snapshots = []
+    for name in names:
+        if not name.endswith(MANIFEST):
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8") as stream:
+            snapshots.append(Snapshot(**json.load(stream), directory=directory))
+    return sorted(snapshots, key=lambda snapshot: (snapshot.created, snapshot.name))
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as stream:
+        while chunk := stream.read(_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _pages(path, page_size):
+    with open(path, "rb") as stream:
+        while page := stream.read(page_size):
+            yield page
+
+
+def online_copy(source_path, target_path, pages=None, pause=None):
+    """Kopiuje bazę przez SQLite backup API po ``pages`` stron na krok.
+
+    Między krokami źródło nie jest zablokowane, a przerwa ``pause`` (sekundy)
+    daje czas oczekującym zapisom. Zapis innego połączenia w trakcie
+    kopiowania zaczyna ją od nowa; po MAX_RESTARTS kopiujemy bez przerw.
+    """
+    pages = settings.BACKUP_PAGES if pages is None else pages
+    pause = settings.BACKUP_PAUSE_MS / 1000 if pause is None else pause
+    stats = {"steps": 0, "restarts": 0}
+    remaining_before = None
+
+    def progress(status, remaining, total):
+        nonlocal remaining_before
+        stats["steps"] += 1
+        if remaining_before is not None and remaining > remaining_before:
+            stats["restarts"] += 1
+        remaining_before = remaining
+        if remaining and pause and stats["restarts"] < MAX_RESTARTS:
+            time.sleep(pause)
+
+    started = time.perf_counter()
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target, pages=pages, progress=progress, sleep=pause or 0.25)
+        page_size = target.execute("PRAGMA page_size").fetchone()[0]
+        page_count = target.execute("PRAGMA page_count").fetchone()[0]
+        check = target.execute("PRAGMA quick_check").fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+    if check != "ok":
+        raise BackupError(f"Kopia nie przeszła quick_check: {check}")
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return page_size, page_count, stats
+
+
+def create(directory=None, database=None, incremental=False, pages=None, pause=None):
+    """Tworzy kopię bazy; przyrostowa zapisuje tylko strony zmienione od
+    poprzedniej kopii.
+
+    Zwraca None, gdy kopia przyrostowa nie miałaby żadnych zmian.
+    """
+    directory = _backups_dir(directory)
+    os.makedirs(directory, exist_ok=True)
+    parent = None
+    if incremental:
+        existing = list_snapshots(directory)
+        parent = existing[-1] if existing else None
+
+    created = time.time()
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    image = os.path.join(directory, f"{name}.tmp")
+    try:
+        page_size, page_count, stats = online_copy(
+            _database_path(database), image, pages, pause
+        )
+        digests = [
+            hashlib.blake2b(page, digest_size=DIGEST_SIZE).digest()
+            for page in _pages(image, page_size)
+        ]
+        if parent is not None and parent.page_size != page_size:
+            # Po VACUUM ze zmianą rozmiaru strony różnice nie mają sensu
+            parent = None
+
+        kind = FULL if parent is None else INCREMENTAL
+        snapshot = Snapshot(
+            name=name,
+            kind=kind,
+            created=created,
+            page_size=page_size,
+            page_count=page_count,
+            pages_written=page_count,
+            data_sha256="",
+            image_sha256=_sha256(image),
+            parent=parent.name if parent else None,
+            stats=stats,
+            directory=directory,
+        )
+        if kind == FULL:
+            os.replace(image, snapshot.path)
+        else:
+            previous = parent.read_digests()
+            changed = [
+                number
+                for number, digest in enumerate(digests)
+                if number >= len(previous) or previous[number] != digest
+            ]
+            if not changed and page_count == parent.page_count:
+                return None
+            _write_delta(image, snapshot.path, page_size, changed)
+            snapshot.pages_written = len(changed)
+
+        with open(os.path.join(directory, name + DIGESTS), "wb") as output:
+            output.write(b"".join(digests))
+        snapshot.data_sha256 = _sha256(snapshot.path)
+        snapshot.save()
+        return snapshot
+    finally:
+        if os.path.exists(image):
+            os.unlink(image)
+
+
+def _write_delta(image, path, page_size, changed):
+    # Format: [numer strony (4 bajty)][strona] dla każdej zmienionej strony
+    with open(image, "rb") as source, open(path, "wb") as output:
+        for number in changed:
+            source.seek(number * page_size)
+            output.write(_PAGE_HEADER.pack(number))
+            output.write(source.read(page_size))
+
+
+def _apply_delta(snapshot, image):
+    record = _PAGE_HEADER.size + snapshot.page_size
+    with open(snapshot.path, "rb") as delta, open(image, "r+b") as output:
+        while chunk := delta.read(record):
+            if len(chunk) != record:
+                raise BackupError(f"Uszkodzony plik {snapshot.path}")
+            (number,) = _PAGE_HEADER.unpack_from(chunk)
+            output.seek(number * snapshot.page_size)
+            output.write(chunk[_PAGE_HEADER.size :])
+        output.truncate(snapshot.page_count * snapshot.page_size)
+
+
+def chain(name, directory=None):
+    """Kopia pełna i kolejne przyrostowe potrzebne do odtworzenia ``name``."""
+    snapshots = {snapshot.name: snapshot for snapshot in list_snapshots(directory)}
+    if name not in snapshots:
+        raise BackupError(f"Nie ma kopii {name}")
+    result = [snapshots[name]]
+    while result[-1].kind == INCREMENTAL:
+        parent = snapshots.get(result[-1].parent)
+        if parent is None:
+            raise BackupError(
+                f"Brak kopii {result[-1].parent}, od której zależy {name}"
+            )
+        result.append(parent)
+    return result[::-1]
+
+
+def verify(snapshot):
+    """Sprawdza sumę kontrolną pliku danych kopii."""
+    try:
+        return _sha256(snapshot.path) == snapshot.data_sha256
+    except FileNotFoundError:
+        return False
+
+
+def materialize(name, output, directory=None):
+    """Odtwarza obraz bazy z kopii ``name`` do pliku ``output``.
+
+    Sprawdza sumy kontrolne każdego pliku w łańcuchu oraz obrazu po
+    złożeniu; przy niezgodności plik ``output`` nie powstaje.
+    """
+    snapshots = chain(name, directory)
+    for snapshot in snapshots:
+        if not verify(snapshot):
+            raise BackupError(f"Niezgodna suma kontrolna kopii {snapshot.name}")
+
+    temporary = f"{output}.tmp"
+    try:
+        with open(snapshots[0].path, "rb") as source, open(temporary, "wb") as copy:
+            while chunk := source.read(_CHUNK):
+                copy.write(chunk)
+        for snapshot in snapshots[1:]:
+            _apply_delta(snapshot, temporary)
+        if _sha256(temporary) != snapshots[-1].image_sha256:
+            raise BackupError(f"Odtworzona baza różni się od kopii {name}")
+        os.replace(temporary, output)
+    finally:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+    return snapshots[-1]
+
+
+def restore(name, directory=None, database=None):
+    """Przywraca bazę z kopii ``name``.
+
+    Obraz jest składany i sprawdzany obok bazy, a do bazy trafia przez
+    backup API w jednej transakcji, więc inne połączenia widzą albo stan
+    sprzed przywrócenia, albo po nim.
+    """
+    target = _database_path(database)
+    image = f"{target}.restore"
+    snapshot = materialize(name, image, directory)
+    try:
+        source = sqlite3.connect(image)
+        destination = sqlite3.connect(target)
+        try:
+            source.backup(destination)
+        finally:
+            destination.close()
+            source.close()
+    finally:
+        os.unlink(image)
+    # Połączenia Django mogą trzymać w pamięci schemat sprzed przywrócenia
+    connections.close_all()
+    return snapshot
+
+
+def prune(keep_full=None, directory=None):
+    """Usuwa łańcuchy kopii starsze niż ``keep_full`` ostatnich kopii pełnych
+    oraz kopie przyrostowe, których podstawy już nie ma."""
+    keep_full = settings.BACKUP_KEEP_FULL if keep_full is None else keep_full
+    snapshots = list_snapshots(directory)
+    fulls = [snapshot for snapshot in snapshots if snapshot.kind == FULL]
+    kept = {snapshot.name for snapshot in fulls[-keep_full:]} if keep_full else set()
+
+    removed = []
+    for snapshot in snapshots:
+        # Lista jest posortowana, więc rodzic jest rozpatrzony przed dzieckiem
+        if snapshot.kind == INCREMENTAL and snapshot.parent in kept:
+            kept.add(snapshot.name)
+        if snapshot.name in kept:
+            continue
+        for path in snapshot.files:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        removed.append(snapshot)
+    return removed
+
+
+def scheduled(directory=None, database=None, full_every=None, pages=None, pause=None):
+    """Kopia wykonywana cyklicznie: przyrostowa, a co ``full_every`` kopii
+    przyrostowych pełna; następnie usuwa stare łańcuchy."""
+    full_every = settings.BACKUP_FULL_EVERY if full_every is None else full_every
+    snapshots = list_snapshots(directory)
+    depth = 0
+    for snapshot in reversed(snapshots):
+        if snapshot.kind == FULL:
+            break
+        depth += 1
+    incremental = bool(snapshots) and depth < full_every
+    snapshot = create(directory, database, incremental, pages, pause)
+    prune(directory=directory)
+    return snapshot
@@ -0,0 +1,80 @@
+import datetime
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import audit, events
+from .dashboard import invalidate_dashboard
+from .models import AuditEntry, Cultivation
+
+BATCH_SIZE = 500
+# Kolumny edytowane w tabeli historii upraw
+EDITABLE = ("status", "sowing_date", "yield_amount")
+
+
+def update_cultivations(user, rows, batch_size=BATCH_SIZE):
+    """Zapisuje zmiany z tabeli historii upraw w jednej transakcji.
+
+    ``rows`` to słowniki z ``id`` uprawy i nowymi wartościami kolumn
+    EDITABLE. Zamiast save() dla każdego wiersza: jedno zapytanie wczytuje
+    uprawy, a bulk_update zapisuje tylko kolumny, które się zmieniły.
+    Przy błędzie walidacji (ValidationError) nic nie jest zapisywane.
+    """
+    rows = {row["id"]: row for row in rows}
+    groups = defaultdict(list)
+    errors = {}
+    now = timezone.now()
+
+    with transaction.atomic():
+        cultivations = (
+            Cultivation.objects.for_owner(user)
+            .filter(pk__in=rows)
+            .only("id", "owner_id", "field_id", "year", *EDITABLE)
+        )
+        for cultivation in cultivations:
+            row = rows[cultivation.pk]
+            changed = [
+                name
+                for name in EDITABLE
+                if name in row and getattr(cultivation, name) != row[name]
+            ]
+            if not changed:
+                continue
+            for name in changed:
+                setattr(cultivation, name, row[name])
+            # To samo co w Cultivation.save()
+            if "sowing_date" in changed and not cultivation.sowing_date:
+                cultivation.sowing_date = datetime.date(cultivation.year, 9, 1)
+            try:
+                cultivation.clean()
+            except ValidationError as error:
+                errors[cultivation.pk] = error.messages
+                continue
+            cultivation.updated = now
+            # Wiersze z tym samym zestawem zmian zapisuje jedno zapytanie
+            groups[tuple(changed)].append(cultivation)
+
+        if errors:
+            raise ValidationError(
+                [
+                    f"Uprawa {pk}: {message}"
+                    for pk, messages in errors.items()
+                    for message in messages
+                ]
+            )
+
+        updated = []
+        for columns, group in groups.items():
+            Cultivation.objects.bulk_update(
+                group, [*columns, "updated"], batch_size=batch_size
+            )
+            updated += group
+        for cultivation in updated:
+            audit.record(cultivation, AuditEntry.Action.UPDATE, user.pk)
+
+    if updated:
+        invalidate_dashboard(user.pk)
+        events.field_changed({c.field_id for c in updated}, "cultivation", "updated")
+    return updated
@@ -0,0 +1,99 @@
+import hashlib
+import json
+from collections import defaultdict
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Cultivation, Field, Treatment
+
+FIELD_COLUMNS = ["id", "name", "area_size", "soil_class", "notes", "updated"]
+CULTIVATION_COLUMNS = [
+    "id",
+    "field_id",
+    "crop_type_id",
+    "crop_type__name",
+    "status",
+    "year",
+    "sowing_date",
+    "yield_amount",
+    "notes",
+]
+TREATMENT_COLUMNS = [
+    "id",
+    "field_id",
+    "treatment_type",
+    "date",
+    "crop_type_id",
+    "crop_type__name",
+    "description",
+]
+
+
+def bundle_etag(bundle):
+    content = json.dumps(bundle, cls=DjangoJSONEncoder, sort_keys=True)
+    return hashlib.md5(content.encode(), usedforsecurity=False).hexdigest()
+
+
+def _latest_treatments(field_ids, limit):
+    # Ostatnie N zabiegów każdego pola jednym zapytaniem (ROW_NUMBER w oknie)
+    return (
+        Treatment.objects.filter(field_id__in=field_ids)
+        .annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=F("field_id"),
+                order_by=[F("date").desc(), F("id").desc()],
+            )
+        )
+        .filter(position__lte=limit)
+        .order_by("field_id", "position")
+        .values(*TREATMENT_COLUMNS)
+    )
+
+
+def load_bundles(user, field_ids, treatments=10):
+    """Zwraca {id pola: paczka} dla pól użytkownika.
+
+    Niezależnie od liczby pól wykonywane są trzy zapytania: pola, uprawy
+    i ostatnie zabiegi.
+    """
+    fields = list(
+        Field.objects.for_owner(user)
+        .filter(pk__in=field_ids)
+        .order_by("pk")
+        .values(*FIELD_COLUMNS)
+    )
+    if not fields:
+        return {}
+    ids = [field["id"] for field in fields]
+
+    cultivations = defaultdict(list)
+    rows = (
+        Cultivation.objects.filter(field_id__in=ids)
+        .order_by("field_id", "-year", "-created")
+        .values(*CULTIVATION_COLUMNS)
+    )
+    for row in rows:
+        cultivations[row["field_id"]].append(row)
+
+    latest_treatments = defaultdict(list)
+    if treatments:
+        for row in _latest_treatments(ids, treatments):
+            latest_treatments[row["field_id"]].append(row)
+
+    bundles = {}
+    for field in fields:
+        history = cultivations[field["id"]]
+        latest_year = history[0]["year"] if history else None
+        bundle = {
+            "field": field,
+            "current_year": latest_year,
+            "latest_cultivations": [c for c in history if c["year"] == latest_year],
+            "cultivation_history": history,
+            "treatments": latest_treatments[field["id"]],
+        }
+        bundle["etag"] = bundle_etag(bundle)
+        bundles[field["id"]] = bundle
+    return bundles
@@ -0,0 +1,88 @@
+import datetime
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Cultivation, Field
+
+# Migawka i tak jest unieważniana przy zapisie, TTL tylko ogranicza
+# nieaktualność przy cache lokalnym dla procesu
+SNAPSHOT_TIMEOUT = 10 * 60
+RECENT_DAYS = 14
+
+
+def _cache_key(user_id):
+    return f"dashboard:{user_id}"
+
+
+def invalidate_dashboard(*user_ids):
+    cache.delete_many([_cache_key(pk) for pk in user_ids if pk is not None])
+
+
+def compute_dashboard(user, today=None):
+    today = today or timezone.localdate()
+    season_start = datetime.date(today.year, 1, 1)
+    season_end = datetime.date(today.year, 12, 31)
+    recent_start = today - datetime.timedelta(days=RECENT_DAYS)
+
+    statuses = {value: 0 for value in Cultivation.Status.values}
+    crop_area = {}
+    rows = (
+        Cultivation.objects.for_owner(user)
+        .filter(year=today.year)
+        .values("status", "crop_type__name")
+        .annotate(count=Count("id"), area=Sum("field__area_size"))
+        .order_by()
+    )
+    for row in rows:
+        statuses[row["status"]] += row["count"]
+        if row["status"] != Cultivation.Status.CANCELLED:
+            name = row["crop_type__name"] or "---"
+            crop_area[name] = crop_area.get(name, 0) + (row["area"] or 0)
+
+    fields = (
+        Field.objects.for_owner(user)
+        .annotate(
+            # Zabiegi z datą w przyszłości to plany, nie wykonane prace
+            recent=Count(
+                "treatments",
+                filter=Q(
+                    treatments__date__gte=recent_start, treatments__date__lte=today
+                ),
+            ),
+            season=Count(
+                "treatments",
+                filter=Q(
+                    treatments__date__gte=season_start,
+                    treatments__date__lte=season_end,
+                ),
+            ),
+        )
+        .values("id", "name", "area_size", "recent", "season")
+    )
+    fields = list(fields)
+
+    return {
+        "date": today,
+        "year": today.year,
+        "statuses": [
+            (value, label, statuses[value])
+            for value, label in Cultivation.Status.choices
+        ],
+        "crop_area": sorted(crop_area.items(), key=lambda item: -item[1]),
+        "sown_area": sum(crop_area.values()),
+        "field_count": len(fields),
+        "recent_days": RECENT_DAYS,
+        "recent_treatments": sum(field["recent"] for field in fields),
+        "untreated_fields": [field for field in fields if not field["season"]],
+    }
+
+
+def get_dashboard(user):
+    today = timezone.localdate()
+    snapshot = cache.get(_cache_key(user.pk))
+    if snapshot is None or snapshot["date"] != today:
+        snapshot = compute_dashboard(user, today)
+        cache.set(_cache_key(user.pk), snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
@@ -0,0 +1,143 @@
+import asyncio
+import itertools
+import json
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+
+# Fragmenty strony pola, które trzeba pobrać po zmianie danego modelu
+FRAGMENTS = {
+    "treatment": ("treatments",),
+    "cultivation": ("cultivations", "history"),
+}
+QUEUE_SIZE = 100
+# Komentarz co kilkadziesiąt sekund, by proxy nie zamykało bezczynnego połączenia
+HEARTBEAT_SECONDS = 25
+RETRY_MILLISECONDS = 5000
+
+
+class Subscription:
+    def __init__(self, channel, loop):
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Klient nie nadąża; zamiast pojedynczych zmian odświeży całą stronę
+            self.overflowed = True
+
+    def deliver(self, message):
+        # Publikacja przychodzi z wątku żądania, kolejka należy do pętli zdarzeń
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def drain(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.overflowed = False
+
+
+class LocalBroker:
+    """Kanały publikacji w pamięci procesu.
+
+    Wystarcza, gdy strumienie obsługuje jeden proces ASGI, a w testach
+    zastępuje brokera współdzielonego między procesami.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+        self._ids = itertools.count(1)
+
+    def subscribe(self, channel):
+        subscription = Subscription(channel, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.channel]
+
+    def subscribers(self, channel):
+        with self._lock:
+            return len(self._subscriptions.get(channel, ()))
+
+    def publish(self, channel, message):
+        message = {**message, "event_id": next(self._ids)}
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.deliver(message)
+            except RuntimeError:
+                # Pętla zdarzeń już zamknięta, a strumień nie zdążył się wypisać
+                self.unsubscribe(subscription)
+        return len(subscribers)
+
+
+broker = LocalBroker()
+
+
+def channel(field_id):
+    return f"field:{field_id}"
+
+
+def field_changed(field_ids, model, action, object_id=None):
+    """Po zatwierdzeniu transakcji powiadamia otwarte strony podanych pól."""
+    field_ids = {pk for pk in field_ids if pk is not None}
+    if not field_ids:
+        return
+    message = {
+        "model": model,
+        "action": action,
+        "id": object_id,
+        "fragments": list(FRAGMENTS[model]),
+    }
+
+    def send():
+        for field_id in field_ids:
+            broker.publish(channel(field_id), {**message, "field": field_id})
+
+    transaction.on_commit(send)
+
+
+def _event(name, data=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {name}")
+    lines.append(f"data: {json.dumps(data or {}, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream(subscription, heartbeat=HEARTBEAT_SECONDS):
+    """Generator odpowiedzi text/event-stream dla jednej subskrypcji."""
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        while True:
+            try:
+                message = await subscription.get(heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if subscription.overflowed:
+                subscription.drain()
+                yield _event("reset")
+                continue
+            # Ten sam słownik trafia do wszystkich subskrybentów, nie zmieniamy go
+            data = {k: v for k, v in message.items() if k != "event_id"}
+            yield _event("change", data, message.get("event_id"))
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,250 @@
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Cultivation, Field, YieldForecast
+
+# Minimalna liczba obserwacji, by ufać trendowi w danej grupie; mniejsze
+# grupy dziedziczą model z poziomu wyżej (roślina+klasa -> roślina -> całość)
+MIN_SAMPLES = 3
+# Siła ściągania poprawki pola do zera (liczba "wirtualnych" obserwacji)
+FIELD_SHRINKAGE = 2.0
+Z_95 = 1.96
+
+SOIL_CLASSES = list(Field.SoilClass.values)
+
+
+def load_history():
+    """Historyczna macierz plonów z jednego zapytania, jako tablice NumPy."""
+    rows = (
+        Cultivation.objects.filter(
+            status=Cultivation.Status.COMPLETED,
+            yield_amount__gt=0,
+            field__isnull=False,
+            crop_type__isnull=False,
+            field__area_size__gt=0,
+        )
+        .order_by()
+        .values_list(
+            "field_id",
+            "crop_type_id",
+            "year",
+            "yield_amount",
+            "field__area_size",
+            "field__soil_class",
+        )
+    )
+    return _to_arrays(rows)
+
+
+def load_targets(year):
+    rows = (
+        Cultivation.objects.filter(
+            year=year,
+            status=Cultivation.Status.PROGRESS,
+            field__isnull=False,
+            crop_type__isnull=False,
+        )
+        .order_by()
+        .values_list(
+            "id", "field_id", "crop_type_id", "field__area_size", "field__soil_class"
+        )
+    )
+    columns = list(zip(*rows)) or [(), (), (), (), ()]
+    ids, field_ids, crop_ids, areas, soils = columns
+    return {
+        "id": np.asarray(ids, dtype=np.int64),
+        "field": np.asarray(field_ids, dtype=np.int64),
+        "crop": np.asarray(crop_ids, dtype=np.int64),
+        "area": np.asarray(areas, dtype=np.float64),
+        "soil": _soil_index(soils),
+        "year": np.full(len(ids), year, dtype=np.float64),
+    }
+
+
+def _soil_index(soils):
+    lookup = {value: index for index, value in enumerate(SOIL_CLASSES)}
+    return np.asarray([lookup.get(soil, -1) for soil in soils], dtype=np.int64)
+
+
+def _to_arrays(rows):
+    columns = list(zip(*rows)) or [(), (), (), (), (), ()]
+    field_ids, crop_ids, years, yields, areas, soils = columns
+    area = np.asarray(areas, dtype=np.float64)
+    return {
+        "field": np.asarray(field_ids, dtype=np.int64),
+        "crop": np.asarray(crop_ids, dtype=np.int64),
+        "year": np.asarray(years, dtype=np.float64),
+        "per_ha": np.asarray(yields, dtype=np.float64) / np.where(area > 0, area, 1),
+        "soil": _soil_index(soils),
+    }
+
+
+class GroupTrend:
+    """Regresja liniowa plonu z ha względem roku, liczona naraz dla wszystkich grup.
+
+    Sumy potrzebne do wzorów zamkniętych liczymy przez np.bincount, więc
+    koszt jest liniowy względem liczby obserwacji, bez pętli po grupach.
+    """
+
+    def __init__(self, keys, x, y):
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        size = len(self.keys)
+        n = np.bincount(inverse, minlength=size).astype(np.float64)
+        sx = np.bincount(inverse, weights=x, minlength=size)
+        sy = np.bincount(inverse, weights=y, minlength=size)
+        self.n = n
+        self.mean_x = sx / np.maximum(n, 1)
+        mean_y = sy / np.maximum(n, 1)
+
+        dx = x - self.mean_x[inverse]
+        dy = y - mean_y[inverse]
+        self.sxx = np.bincount(inverse, weights=dx * dx, minlength=size)
+        sxy = np.bincount(inverse, weights=dx * dy, minlength=size)
+        safe_sxx = np.where(self.sxx > 0, self.sxx, 1)
+        self.slope = np.where(self.sxx > 0, sxy / safe_sxx, 0)
+        self.intercept = mean_y - self.slope * self.mean_x
+
+        residuals = y - (self.intercept[inverse] + self.slope[inverse] * x)
+        sse = np.bincount(inverse, weights=residuals**2, minlength=size)
+        dof = np.maximum(n - 2, 1)
+        self.sigma2 = sse / dof
+        self.residuals = residuals
+
+    def lookup(self, keys):
+        if not len(self.keys):
+            return np.zeros(len(keys), dtype=np.int64), np.zeros(len(keys), bool)
+        position = np.clip(np.searchsorted(self.keys, keys), 0, len(self.keys) - 1)
+        found = (self.keys[position] == keys) & (self.n[position] >= MIN_SAMPLES)
+        return position, found
+
+    def predict(self, position, x):
+        mean = self.intercept[position] + self.slope[position] * x
+        sxx = self.sxx[position]
+        leverage = np.where(
+            sxx > 0, (x - self.mean_x[position]) ** 2 / np.where(sxx > 0, sxx, 1), 0
+        )
+        spread = self.sigma2[position] * (
+            1 + 1 / np.maximum(self.n[position], 1) + leverage
+        )
+        return mean, np.sqrt(spread)
+
+
+def _pair_key(a, b, width):
+    return a * width + b
+
+
+def predict(history, targets):
+    """Zwraca (plon z ha, odchylenie, liczba obserwacji, poziom modelu)."""
+    count = len(targets["id"])
+    per_ha = np.full(count, np.nan)
+    sigma = np.full(count, np.nan)
+    samples = np.zeros(count, dtype=np.int64)
+    level = np.full(count, "", dtype=object)
+    if not len(history["per_ha"]) or not count:
+        return per_ha, sigma, samples, level
+
+    width = len(SOIL_CLASSES) + 1
+    history_x, target_x = history["year"], targets["year"]
+    models = [
+        (
+            "crop_soil",
+            GroupTrend(
+                _pair_key(history["crop"], history["soil"] + 1, width),
+                history_x,
+                history["per_ha"],
+            ),
+            _pair_key(targets["crop"], targets["soil"] + 1, width),
+        ),
+        (
+            "crop",
+            GroupTrend(history["crop"], history_x, history["per_ha"]),
+            targets["crop"],
+        ),
+        (
+            "global",
+            GroupTrend(np.zeros_like(history["crop"]), history_x, history["per_ha"]),
+            np.zeros_like(targets["crop"]),
+        ),
+    ]
+
+    pending = np.ones(count, dtype=bool)
+    for name, model, keys in models:
+        position, found = model.lookup(keys)
+        use = pending & (found | (name == "global"))
+        if not use.any():
+            continue
+        mean, spread = model.predict(position[use], target_x[use])
+        per_ha[use] = mean
+        sigma[use] = spread
+        samples[use] = model.n[position[use]]
+        level[use] = name
+        pending &= ~use
+
+    # Poprawka pola: średnia reszta pola dla tej rośliny względem trendu
+    # grupy roślina+klasa, ściągnięta do zera przy małej liczbie lat
+    crop_soil = models[0][1]
+    field_keys = _pair_key(history["field"], history["crop"], 1 << 32)
+    unique_keys, inverse = np.unique(field_keys, return_inverse=True)
+    n = np.bincount(inverse).astype(np.float64)
+    mean_residual = np.bincount(inverse, weights=crop_soil.residuals) / (
+        n + FIELD_SHRINKAGE
+    )
+    target_keys = _pair_key(targets["field"], targets["crop"], 1 << 32)
+    position = np.clip(
+        np.searchsorted(unique_keys, target_keys), 0, len(unique_keys) - 1
+    )
+    has_history = unique_keys[position] == target_keys
+    per_ha[has_history] += mean_residual[position[has_history]]
+
+    return np.maximum(per_ha, 0), sigma, samples, level
+
+
+def run_forecast(year=None, batch_size=2000):
+    year = year or timezone.localdate().year
+    history = load_history()
+    targets = load_targets(year)
+    per_ha, sigma, samples, level = predict(history, targets)
+
+    area = targets["area"]
+    expected = per_ha * area
+    lower = np.maximum(per_ha - Z_95 * sigma, 0) * area
+    upper = (per_ha + Z_95 * sigma) * area
+    now = timezone.now()
+
+    forecasts = [
+        YieldForecast(
+            cultivation_id=int(cultivation_id),
+            per_ha=round(float(per_ha[index]), 2),
+            expected=round(float(expected[index]), 2),
+            lower=round(float(lower[index]), 2),
+            upper=round(float(upper[index]), 2),
+            samples=int(samples[index]),
+            level=level[index],
+            computed=now,
+        )
+        for index, cultivation_id in enumerate(targets["id"])
+        if not np.isnan(per_ha[index])
+    ]
+
+    with transaction.atomic():
+        YieldForecast.objects.bulk_create(
+            forecasts,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["cultivation"],
+            update_fields=[
+                "per_ha",
+                "expected",
+                "lower",
+                "upper",
+                "samples",
+                "level",
+                "computed",
+            ],
+        )
+        YieldForecast.objects.filter(cultivation__year=year).exclude(
+            computed=now
+        ).delete()
+
+    return len(forecasts)
@@ -1,6 +1,48 @@
 from django import forms
+from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceIterator
 
-from .models import CropType, Cultivation, Field, Treatment
+from . import refdata
+from .models import (
+    CropType,
+    Cultivation,
+    Field,
+    RotationStep,
+    RotationTemplate,
+    Treatment,
+    TreatmentInput,
+)
+from .rollover import source_years
+
+
+class CropTypeChoiceIterator(ModelChoiceIterator):
+    # Opcje czytane leniwie ze słownika w pamięci procesu, bez zapytań do bazy
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        yield from refdata.crop_type_choices()
+
+    def __len__(self):
+        return len(refdata.crop_types()) + (self.field.empty_label is not None)
+
+
+class CropTypeChoiceField(forms.ModelChoiceField):
+    iterator = CropTypeChoiceIterator
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            crop = refdata.crop_type(int(value))
+        except (TypeError, ValueError):
+            crop = None
+        if crop is None:
+            raise ValidationError(
+                self.error_messages["invalid_choice"],
+                code="invalid_choice",
+                params={"value": value},
+            )
+        return crop
 
 
 class FieldNotesForm(forms.ModelForm):
@@ -33,6 +75,7 @@ class TreatmentAddForm(forms.ModelForm):
     class Meta:
         model = Treatment
         fields = ["treatment_type", "date", "crop_type", "description"]
+        field_classes = {"crop_type": CropTypeChoiceField}
         widgets = {
             "treatment_type": forms.Select(
                 attrs={"class": "form-select rounded-3", "id": "id_treatment_type"}
@@ -52,11 +95,47 @@ class TreatmentAddForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Opcjonalnie: możesz tu przefiltrować CropType, jeśli chcesz
-        self.fields["crop_type"].queryset = CropType.objects.all()
         self.fields["crop_type"].empty_label = "Wybierz roślinę (tylko dla siewu)"
 
 
+class TreatmentInputForm(forms.ModelForm):
+    class Meta:
+        model = TreatmentInput
+        fields = ["product", "kind", "component", "dose_per_ha", "unit", "total_amount"]
+        widgets = {
+            "product": forms.TextInput(
+                attrs={
+                    "class": "form-control form-control-sm",
+                    "placeholder": "Produkt",
+                }
+            ),
+            "kind": forms.Select(attrs={"class": "form-select form-select-sm"}),
+            "component": forms.TextInput(
+                attrs={"class": "form-control form-control-sm", "placeholder": "N"}
+            ),
+            "dose_per_ha": forms.NumberInput(
+                attrs={"class": "form-control form-control-sm", "step": "0.001"}
+            ),
+            "unit": forms.Select(attrs={"class": "form-select form-select-sm"}),
+            "total_amount": forms.NumberInput(
+                attrs={
+                    "class": "form-control form-control-sm",
+                    "step": "0.001",
+                    "placeholder": "auto",
+                }
+            ),
+        }
+
+
+TreatmentInputFormSet = forms.inlineformset_factory(
+    Treatment,
+    TreatmentInput,
+    form=TreatmentInputForm,
+    extra=3,
+    can_delete=False,
+)
+
+
 class CultivationEditForm(forms.ModelForm):
     class Meta:
         model = Cultivation
@@ -77,7 +156,140 @@ class CultivationEditForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
 
 
+class CultivationGridForm(forms.Form):
+    id = forms.IntegerField(widget=forms.HiddenInput)
+    status = forms.ChoiceField(
+        choices=Cultivation.Status.choices,
+        widget=forms.Select(attrs={"class": "form-select form-select-sm"}),
+    )
+    sowing_date = forms.DateField(
+        required=False,
+        widget=forms.DateInput(
+            attrs={"type": "date", "class": "form-control form-control-sm"}
+        ),
+    )
+    yield_amount = forms.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        min_value=0,
+        required=False,
+        widget=forms.NumberInput(
+            attrs={"class": "form-control form-control-sm", "step": "0.01"}
+        ),
+    )
+
+
+CultivationGridFormSet = forms.formset_factory(CultivationGridForm, extra=0)
+
+
 class CultivationNotesForm(forms.ModelForm):
     class Meta:
         model = Cultivation
         fields = ["notes"]
+
+
+class FieldListFilterForm(forms.Form):
+    ORDER_CHOICES = [
+        ("", "Nazwa"),
+        ("last", "Najdawniej wykonany zabieg"),
+        ("-last", "Ostatnio wykonany zabieg"),
+    ]
+
+    treatment_type = forms.ChoiceField(
+        choices=Treatment.TreatmentType.choices,
+        initial=Treatment.TreatmentType.LIMING,
+        label="Zabieg",
+        widget=forms.Select(attrs={"class": "form-select rounded-3"}),
+    )
+    order = forms.ChoiceField(
+        choices=ORDER_CHOICES,
+        required=False,
+        label="Sortuj według",
+        widget=forms.Select(attrs={"class": "form-select rounded-3"}),
+    )
+    not_since_years = forms.IntegerField(
+        min_value=1,
+        max_value=50,
+        required=False,
+        label="Bez zabiegu od (lat)",
+        widget=forms.NumberInput(attrs={"class": "form-control rounded-3"}),
+    )
+
+
+class SeasonRolloverForm(forms.Form):
+    source_year = forms.TypedChoiceField(
+        coerce=int,
+        label="Rok źródłowy",
+        widget=forms.Select(attrs={"class": "form-select rounded-3"}),
+    )
+    rotation = forms.ModelChoiceField(
+        queryset=RotationTemplate.objects.none(),
+        required=False,
+        label="Płodozmian",
+        empty_label="Ta sama roślina co w roku źródłowym",
+        widget=forms.Select(attrs={"class": "form-select rounded-3"}),
+    )
+    optimize = forms.BooleanField(
+        required=False,
+        label="Optymalizuj przydział",
+        help_text="Zachowaj powierzchnie roślin z roku źródłowego, bez tej samej "
+        "rośliny rok po roku, z lepszym przewidywanym plonem.",
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
+
+    def __init__(self, *args, **kwargs):
+        self.user = kwargs.pop("user")
+        super().__init__(*args, **kwargs)
+        self.fields["source_year"].choices = [
+            (year, year) for year in source_years(self.user)
+        ]
+        self.fields["rotation"].queryset = self.user.rotation_templates.all()
+
+
+class RotationTemplateForm(forms.ModelForm):
+    sequence = forms.CharField(
+        label="Kolejność roślin",
+        help_text="Nazwy roślin oddzielone przecinkami, np. Rzepak, Pszenica, Jęczmień",
+        widget=forms.TextInput(attrs={"class": "form-control rounded-3"}),
+    )
+
+    class Meta:
+        model = RotationTemplate
+        fields = ["name"]
+        widgets = {"name": forms.TextInput(attrs={"class": "form-control rounded-3"})}
+
+    def __init__(self, *args, **kwargs):
+        self.user = kwargs.pop("user")
+        super().__init__(*args, **kwargs)
+
+    def clean_name(self):
+        name = self.cleaned_data["name"]
+        if self.user.rotation_templates.filter(name=name).exists():
+            raise ValidationError(f"Płodozmian o nazwie {name} już istnieje")
+        return name
+
+    def clean_sequence(self):
+        by_name = {crop.name.lower(): crop for crop in refdata.crop_types()}
+        crops = []
+        for name in self.cleaned_data["sequence"].split(","):
+            name = name.strip()
+            if not name:
+                continue
+            crop = by_name.get(name.lower())
+            if crop is None:
+                raise ValidationError(f"Nieznana roślina: {name}")
+            crops.append(crop)
+        if len(crops) < 2:
+            raise ValidationError("Płodozmian musi mieć co najmniej dwie rośliny")
+        return crops
+
+    def save(self, commit=True):
+        template = super().save(commit=False)
+        template.owner = self.user
+        if commit:
+            template.save()
+            RotationStep.objects.bulk_create(
+                RotationStep(template=template, position=position, crop_type=crop)
+                for position, crop in enumerate(self.cleaned_data["sequence"])
+            )
+        return template
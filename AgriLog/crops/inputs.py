@@ -0,0 +1,151 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import ExtractYear
+
+from .models import Field, InputRollup, TreatmentInput
+
+PER_HA_STEP = Decimal("0.001")
+
+
+def _aggregate(inputs):
+    # Jedno zapytanie grupujące: pole, sezon, składnik -> suma i liczba zabiegów
+    rows = (
+        inputs.annotate(
+            field_id=F("treatment__field_id"),
+            season=ExtractYear("treatment__date"),
+            area=F("treatment__field__area_size"),
+        )
+        .values("field_id", "season", "area", "kind", "component", "unit")
+        .annotate(
+            total=Sum("total_amount"),
+            treatments=Count("treatment", distinct=True),
+        )
+        .order_by()
+    )
+    return [
+        InputRollup(
+            field_id=row["field_id"],
+            season=row["season"],
+            kind=row["kind"],
+            component=row["component"],
+            unit=row["unit"],
+            total_amount=row["total"] or 0,
+            per_ha=(
+                (row["total"] or 0) / row["area"] if row["area"] else Decimal(0)
+            ).quantize(PER_HA_STEP),
+            treatments=row["treatments"],
+        )
+        for row in rows
+    ]
+
+
+def _pairs_filter(pairs, field_lookup, season_lookup):
+    seasons = defaultdict(set)
+    for field_id, season in pairs:
+        seasons[field_id].add(season)
+    query = Q()
+    for field_id, years in seasons.items():
+        query |= Q(**{field_lookup: field_id, f"{season_lookup}__in": years})
+    return query
+
+
+def refresh_rollups(pairs):
+    """Przelicza zestawienia dla podanych par (pole, sezon).
+
+    Zestawienie pary jest zastępowane w całości, więc wynik nie zależy
+    od tego, co i ile razy zmieniono w zabiegach od ostatniego przeliczenia.
+    """
+    pairs = {pair for pair in pairs if pair[0] is not None}
+    if not pairs:
+        return 0
+
+    inputs = TreatmentInput.objects.filter(
+        _pairs_filter(pairs, "treatment__field_id", "treatment__date__year")
+    )
+    rollups = _aggregate(inputs)
+
+    with transaction.atomic():
+        InputRollup.objects.filter(_pairs_filter(pairs, "field_id", "season")).delete()
+        InputRollup.objects.bulk_create(rollups)
+    return len(rollups)
+
+
+def rebuild_rollups(field_ids=None, batch_size=500, min_season=None):
+    """Odbudowuje zestawienia od zera, paczkami pól.
+
+    Sezony starsze niż ``min_season`` zostają nietknięte: ich zabiegi mogły
+    już trafić do archiwum, a zestawienie jest wtedy jedynym śladem dawek.
+    """
+    fields = Field.objects.order_by("pk").values_list("pk", flat=True)
+    if field_ids is not None:
+        fields = fields.filter(pk__in=field_ids)
+
+    created = 0
+    last_pk = 0
+    while True:
+        batch = list(fields.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1]
+
+        inputs = TreatmentInput.objects.filter(treatment__field_id__in=batch)
+        stale = InputRollup.objects.filter(field_id__in=batch)
+        if min_season is not None:
+            inputs = inputs.filter(treatment__date__year__gte=min_season)
+            stale = stale.filter(season__gte=min_season)
+        rollups = _aggregate(inputs)
+
+        with transaction.atomic():
+            stale.delete()
+            InputRollup.objects.bulk_create(rollups)
+        created += len(rollups)
+
+    return created
+
+
+def season_report(user, season):
+    """Bilans składników i ewidencja środków ochrony z gotowych zestawień."""
+    rows = (
+        InputRollup.objects.filter(field__owner=user, season=season)
+        .select_related("field")
+        .only(
+            "field__name",
+            "field__area_size",
+            "kind",
+            "component",
+            "unit",
+            "total_amount",
+            "per_ha",
+            "treatments",
+        )
+        .order_by("field__name", "component")
+    )
+
+    nutrients, sprays = [], []
+    totals = defaultdict(Decimal)
+    for row in rows:
+        if row.kind == TreatmentInput.Kind.NUTRIENT:
+            nutrients.append(row)
+            totals[(row.component, row.unit)] += row.total_amount
+        else:
+            sprays.append(row)
+
+    return {
+        "nutrients": nutrients,
+        "sprays": sprays,
+        "nutrient_totals": sorted(
+            (component, unit, amount) for (component, unit), amount in totals.items()
+        ),
+    }
+
+
+def available_seasons(user):
+    return list(
+        InputRollup.objects.filter(field__owner=user)
+        .values_list("season", flat=True)
+        .distinct()
+        .order_by("-season")
+    )
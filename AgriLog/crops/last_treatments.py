@@ -0,0 +1,195 @@
+from django.db import transaction
+from django.db.models import F, FilteredRelation, Max, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .inputs import _pairs_filter
+from .models import ArchivedTreatment, Field, LastTreatment, Treatment
+
+# Zabiegi pokazywane na liście pól
+COLUMNS = (
+    Treatment.TreatmentType.LIMING,
+    Treatment.TreatmentType.PLOWING,
+    Treatment.TreatmentType.FERTILIZING,
+    Treatment.TreatmentType.PROTECTION,
+)
+
+
+def _collect(treatments, archived):
+    """Najnowszy zabieg w każdej parze (pole, typ) z bieżących i archiwum.
+
+    Dla bieżących zabiegów jedno zapytanie z funkcją okna zwraca od razu
+    wiersz zabiegu; z archiwum wystarczy data.
+    """
+    latest = {}
+    rows = (
+        archived.values("field_id", "treatment_type")
+        .annotate(last=Max("date"))
+        .values_list("field_id", "treatment_type", "last")
+        .order_by()
+    )
+    for field_id, treatment_type, date in rows:
+        latest[field_id, treatment_type] = LastTreatment(
+            field_id=field_id, treatment_type=treatment_type, date=date
+        )
+
+    rows = (
+        treatments.annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=[F("field_id"), F("treatment_type")],
+                order_by=[F("date").desc(), F("pk").desc()],
+            )
+        )
+        .filter(position=1)
+        .values_list("field_id", "treatment_type", "date", "pk")
+        .order_by()
+    )
+    for field_id, treatment_type, date, pk in rows:
+        current = latest.get((field_id, treatment_type))
+        if current is None or date >= current.date:
+            latest[field_id, treatment_type] = LastTreatment(
+                field_id=field_id,
+                treatment_type=treatment_type,
+                date=date,
+                treatment_id=pk,
+            )
+    return list(latest.values())
+
+
+def record_treatment(treatment):
+    """Nowy (lub przesunięty na później) zabieg bez przeliczania całej pary.
+
+    Aktualizacja dotyczy tylko wiersza z datą nie późniejszą niż zabieg,
+    więc zabieg wpisany z datą wsteczną niczego nie nadpisuje.
+    """
+    updated = LastTreatment.objects.filter(
+        field_id=treatment.field_id,
+        treatment_type=treatment.treatment_type,
+        date__lte=treatment.date,
+    ).update(date=treatment.date, treatment=treatment)
+    if not updated:
+        LastTreatment.objects.bulk_create(
+            [
+                LastTreatment(
+                    field_id=treatment.field_id,
+                    treatment_type=treatment.treatment_type,
+                    date=treatment.date,
+                    treatment=treatment,
+                )
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def forget_treatment(treatment):
+    # Usunięty zabieg mógł być ostatnim tylko, jeśli nie ma późniejszego
+    later = LastTreatment.objects.filter(
+        field_id=treatment.field_id,
+        treatment_type=treatment.treatment_type,
+        date__gt=treatment.date,
+    ).exists()
+    if not later:
+        refresh_last_treatments([(treatment.field_id, treatment.treatment_type)])
+
+
+def refresh_last_treatments(pairs):
+    """Przelicza ostatnie zabiegi dla podanych par (pole, typ zabiegu)."""
+    pairs = {pair for pair in pairs if pair[0] is not None}
+    if not pairs:
+        return 0
+
+    rows = _collect(
+        Treatment.objects.filter(_pairs_filter(pairs, "field_id", "treatment_type")),
+        ArchivedTreatment.objects.filter(
+            _pairs_filter(pairs, "field_id", "treatment_type")
+        ),
+    )
+    if any(row.treatment_id is None for row in rows):
+        # Samo archiwum zostaje chwilę dłużej przy usuwaniu całego pola
+        existing = set(
+            Field.objects.filter(pk__in={row.field_id for row in rows}).values_list(
+                "pk", flat=True
+            )
+        )
+        rows = [row for row in rows if row.field_id in existing]
+
+    with transaction.atomic():
+        LastTreatment.objects.filter(
+            _pairs_filter(pairs, "field_id", "treatment_type")
+        ).delete()
+        LastTreatment.objects.bulk_create(rows)
+    return len(rows)
+
+
+def rebuild_last_treatments(field_ids=None, batch_size=500):
+    """Odbudowuje tabelę ostatnich zabiegów od zera, paczkami pól."""
+    fields = Field.objects.order_by("pk").values_list("pk", flat=True)
+    if field_ids is not None:
+        fields = fields.filter(pk__in=field_ids)
+
+    created = 0
+    last_pk = 0
+    while True:
+        batch = list(fields.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1]
+
+        rows = _collect(
+            Treatment.objects.filter(field_id__in=batch),
+            ArchivedTreatment.objects.filter(field_id__in=batch),
+        )
+        with transaction.atomic():
+            LastTreatment.objects.filter(field_id__in=batch).delete()
+            LastTreatment.objects.bulk_create(rows)
+        created += len(rows)
+
+    return created
+
+
+def _years_ago(today, years):
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:
+        # 29 lutego w roku nieprzestępnym
+        return today.replace(year=today.year - years, day=28)
+
+
+def filter_fields(fields, treatment_type, order="", not_since_years=None, today=None):
+    """Sortowanie i filtrowanie pól po dacie ostatniego zabiegu danego typu.
+
+    Złączenie z jednym wierszem LastTreatment na pole (unikalny indeks
+    pole + typ) zamiast przeszukiwania historii zabiegów.
+    """
+    fields = fields.annotate(
+        last=FilteredRelation(
+            "last_treatments",
+            condition=Q(last_treatments__treatment_type=treatment_type),
+        ),
+        last_date=F("last__date"),
+    )
+    if not_since_years:
+        cutoff = _years_ago(today or timezone.localdate(), not_since_years)
+        fields = fields.filter(Q(last_date__lt=cutoff) | Q(last_date__isnull=True))
+    if order == "last":
+        # Nigdy niewykonany zabieg jest najbardziej zaległy
+        fields = fields.order_by(F("last_date").asc(nulls_first=True), "name")
+    elif order == "-last":
+        fields = fields.order_by(F("last_date").desc(nulls_last=True), "name")
+    return fields
+
+
+def columns_for(fields, treatment_type=None):
+    """Dla każdego pola lista (typ, data) w kolejności kolumn listy pól.
+
+    Wymaga pól z prefetch_related("last_treatments").
+    """
+    types = list(COLUMNS)
+    if treatment_type and treatment_type not in types:
+        types.append(treatment_type)
+    labels = dict(Treatment.TreatmentType.choices)
+    for field in fields:
+        dates = {row.treatment_type: row.date for row in field.last_treatments.all()}
+        field.last_done = [(labels[kind], dates.get(kind)) for kind in types]
+    return fields
@@ -0,0 +1,369 @@
+import datetime
+import http.cookiejar
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.signals import got_request_exception
+from django.db import OperationalError
+
+from . import backups
+from .models import CropType, Cultivation, Field
+
+USER_PREFIX = "loadtest-"
+USER_PASSWORD = "loadtest-pass"
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class ErrorCounter:
+    # Zlicza wyjątki widziane przez Django po stronie serwera, w tym
+    # "database is locked" z SQLite, których klient widzi tylko jako 500
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.errors = 0
+        self.locked = 0
+
+    def __call__(self, sender, request=None, **kwargs):
+        error = sys.exc_info()[1]
+        with self.lock:
+            self.errors += 1
+            if isinstance(error, OperationalError) and "locked" in str(error):
+                self.locked += 1
+
+
+def seed(users, fields_per_user):
+    User = get_user_model()
+    crop, _ = CropType.objects.get_or_create(name="Pszenica")
+    year = datetime.date.today().year
+    seeded = []
+
+    for index in range(users):
+        user, created = User.objects.get_or_create(username=f"{USER_PREFIX}{index}")
+        if created:
+            user.set_password(USER_PASSWORD)
+            user.save()
+            fields = Field.objects.bulk_create(
+                Field(name=f"Pole {number}", area_size=10, owner=user)
+                for number in range(fields_per_user)
+            )
+            cultivations = [
+                Cultivation(
+                    field=field,
+                    crop_type=crop,
+                    owner=user,
+                    year=year,
+                    sowing_date=datetime.date(year, 4, 1),
+                )
+                for field in fields
+            ]
+            Cultivation.objects.bulk_create(Cultivation.assign_slugs(cultivations))
+
+        seeded.append(
+            {
+                "username": user.username,
+                "fields": list(
+                    Field.objects.for_owner(user).values_list("pk", flat=True)
+                ),
+                "cultivations": list(
+                    Cultivation.objects.for_owner(user).values_list("pk", flat=True)
+                ),
+            }
+        )
+
+    return seeded, crop.pk
+
+
+def cleanup():
+    users = get_user_model().objects.filter(username__startswith=USER_PREFIX)
+    Cultivation.objects.filter(owner__in=users).delete()
+    Field.objects.filter(owner__in=users).delete()
+    users.delete()
+
+
+def start_wsgi(host, port):
+    from AgriLog.wsgi import application
+
+    server = ThreadedWSGIServer((host, port), QuietHandler)
+    server.set_app(application)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server.server_address[1], server.shutdown
+
+
+def start_asgi(host, port):
+    try:
+        import uvicorn
+    except ImportError as error:
+        raise RuntimeError("Tryb ASGI wymaga pakietu uvicorn") from error
+
+    from AgriLog.asgi import application
+
+    server = uvicorn.Server(
+        uvicorn.Config(application, host=host, port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    def stop():
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    return port, stop
+
+
+class Session:
+    def __init__(self, base_url, record):
+        self.base_url = base_url
+        self.record = record
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies)
+        )
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == "csrftoken":
+                return cookie.value
+        return ""
+
+    def request(self, action, path, data=None):
+        body = None
+        headers = {}
+        if data is not None:
+            body = urllib.parse.urlencode(data).encode()
+            headers["X-CSRFToken"] = self.csrf_token()
+            headers["Referer"] = self.base_url + path
+        request = urllib.request.Request(self.base_url + path, body, headers)
+
+        started = time.perf_counter()
+        status = 0
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as error:
+            status = error.code
+        except OSError:
+            status = -1
+        self.record(action, time.perf_counter() - started, status)
+        return status
+
+    def login(self, username):
+        self.request("login_form", "/accounts/login/")
+        return self.request(
+            "login",
+            "/accounts/login/",
+            {"username": username, "password": USER_PASSWORD},
+        )
+
+
+def run_session(base_url, user, crop_id, deadline, write_ratio, record, rng):
+    session = Session(base_url, record)
+    session.login(user["username"])
+    today = datetime.date.today().isoformat()
+
+    while time.monotonic() < deadline:
+        field_id = rng.choice(user["fields"])
+        session.request("fields", "/fields/")
+        session.request("field_detail", f"/fields/{field_id}/")
+
+        if rng.random() < write_ratio:
+            sowing = rng.random() < 0.1
+            session.request(
+                "add_treatment",
+                f"/fields/{field_id}/add-treatment",
+                {
+                    "treatment_type": "SW" if sowing else "FT",
+                    "date": today,
+                    "crop_type": crop_id if sowing else "",
+                    "description": "loadtest",
+                },
+            )
+
+        if user["cultivations"] and rng.random() < write_ratio / 2:
+            cultivation_id = rng.choice(user["cultivations"])
+            session.request(
+                "edit_cultivation",
+                f"/cultivations/{cultivation_id}/update",
+                {
+                    "status": "PG",
+                    "sowing_date": today,
+                    "yield_amount": f"{rng.uniform(0, 9000):.2f}",
+                },
+            )
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def stats(rows, elapsed):
+    durations = sorted(duration for duration, _, _ in rows)
+    return {
+        "requests": len(durations),
+        "throughput_rps": round(len(durations) / elapsed, 2),
+        "errors": sum(1 for _, status, _ in rows if status >= 400 or status < 0),
+        "p50_ms": _ms(percentile(durations, 0.50)),
+        "p95_ms": _ms(percentile(durations, 0.95)),
+        "p99_ms": _ms(percentile(durations, 0.99)),
+    }
+
+
+def summarize(samples, elapsed):
+    actions = {action: stats(rows, elapsed) for action, rows in sorted(samples.items())}
+    everything = [row for rows in samples.values() for row in rows]
+    return stats(everything, elapsed), actions
+
+
+class BackupRunner(threading.Thread):
+    """Tworzy pełne kopie bazy w tle co ``interval`` sekund aż do ``deadline``,
+    zapamiętując okresy, w których kopia trwała."""
+
+    def __init__(self, deadline, interval):
+        super().__init__(name="loadtest-backup", daemon=True)
+        self.deadline = deadline
+        self.interval = interval
+        self.directory = tempfile.mkdtemp(prefix="loadtest-backup-")
+        self.windows = []
+        self.snapshots = []
+
+    def run(self):
+        try:
+            while time.monotonic() < self.deadline:
+                started = time.monotonic()
+                snapshot = backups.create(self.directory)
+                self.windows.append((started, time.monotonic()))
+                self.snapshots.append(snapshot)
+                # Tylko ostatnia kopia jest potrzebna, nie zapełniamy dysku
+                backups.prune(keep_full=1, directory=self.directory)
+                time.sleep(self.interval)
+        finally:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def overlaps(self, finished, duration):
+        started = finished - duration
+        return any(
+            started < window_end and finished > window_start
+            for window_start, window_end in self.windows
+        )
+
+    def report(self, samples, elapsed):
+        # Żądania trwające choć częściowo w czasie kopii vs pozostałe
+        everything = [row for rows in samples.values() for row in rows]
+        during = [row for row in everything if self.overlaps(row[2], row[0])]
+        outside = [row for row in everything if not self.overlaps(row[2], row[0])]
+        seconds = [snapshot.stats["seconds"] for snapshot in self.snapshots]
+        return {
+            "interval_s": self.interval,
+            "snapshots": len(self.snapshots),
+            "pages": self.snapshots[-1].page_count if self.snapshots else 0,
+            "mean_s": round(sum(seconds) / len(seconds), 3) if seconds else None,
+            "max_s": max(seconds, default=None),
+            "restarts": sum(snapshot.stats["restarts"] for snapshot in self.snapshots),
+            "busy_share": round(
+                sum(end - start for start, end in self.windows) / elapsed, 3
+            ),
+            "during_backup": stats(during, elapsed),
+            "outside_backup": stats(outside, elapsed),
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def run(
+    server="wsgi",
+    concurrency=10,
+    duration=30.0,
+    write_ratio=0.3,
+    fields_per_user=20,
+    users=None,
+    host="127.0.0.1",
+    port=0,
+    seed_value=None,
+    backup_interval=None,
+):
+    seeded, crop_id = seed(users or concurrency, fields_per_user)
+    start = start_asgi if server == "asgi" else start_wsgi
+    port, stop = start(host, port)
+    base_url = f"http://{host}:{port}"
+
+    samples = defaultdict(list)
+    samples_lock = threading.Lock()
+
+    def record(action, duration, status):
+        with samples_lock:
+            samples[action].append((duration, status, time.monotonic()))
+
+    counter = ErrorCounter()
+    got_request_exception.connect(counter, weak=False)
+    rng = random.Random(seed_value)
+    started = time.monotonic()
+    deadline = started + duration
+    workers = [
+        threading.Thread(
+            target=run_session,
+            args=(
+                base_url,
+                seeded[index % len(seeded)],
+                crop_id,
+                deadline,
+                write_ratio,
+                record,
+                random.Random(rng.random()),
+            ),
+        )
+        for index in range(concurrency)
+    ]
+    backup = None
+    if backup_interval is not None:
+        backup = BackupRunner(deadline, backup_interval)
+    try:
+        if backup is not None:
+            backup.start()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if backup is not None:
+            backup.join()
+    finally:
+        elapsed = time.monotonic() - started
+        got_request_exception.disconnect(counter)
+        stop()
+
+    total, actions = summarize(samples, elapsed)
+    report = {
+        "server": server,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "write_ratio": write_ratio,
+        "total": total,
+        "actions": actions,
+        "server_errors": counter.errors,
+        "lock_errors": counter.locked,
+        "lock_error_rate": round(counter.locked / max(total["requests"], 1), 5),
+    }
+    if backup is not None:
+        report["backup"] = backup.report(samples, elapsed)
+    return report
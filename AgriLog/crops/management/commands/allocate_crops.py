@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from crops import allocation, refdata, rollover
+
+
+class Command(BaseCommand):
+    help = (
+        "Układa plan roślin na nowy sezon dla wszystkich pól użytkownika "
+        "z zadanymi powierzchniami upraw i ograniczeniami płodozmianu."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True)
+        parser.add_argument(
+            "--year", type=int, help="Sezon do zaplanowania (domyślnie następny)."
+        )
+        parser.add_argument(
+            "--target",
+            action="append",
+            default=[],
+            metavar="ROŚLINA=HA",
+            help="Docelowa powierzchnia rośliny; domyślnie jak w roku poprzednim.",
+        )
+        parser.add_argument(
+            "--gap",
+            action="append",
+            default=[],
+            metavar="ROŚLINA=LATA",
+            help=f"Minimalna przerwa przed powrotem rośliny na pole "
+            f"(domyślnie {allocation.DEFAULT_GAP}).",
+        )
+        parser.add_argument("--rotation", help="Nazwa preferowanego płodozmianu.")
+        parser.add_argument("--time-limit", type=float, default=allocation.TIME_LIMIT)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--commit",
+            action="store_true",
+            help="Zapisz plan jako zaplanowane uprawy.",
+        )
+
+    def parse_pairs(self, values, cast):
+        by_name = {crop.name.lower(): crop for crop in refdata.crop_types()}
+        pairs = {}
+        for value in values:
+            name, _, amount = value.rpartition("=")
+            crop = by_name.get(name.strip().lower())
+            if crop is None:
+                raise CommandError(f"Nieznana roślina: {name or value}")
+            try:
+                pairs[crop.pk] = cast(amount)
+            except ValueError:
+                raise CommandError(f"Niepoprawna wartość: {value}")
+            if pairs[crop.pk] < 0:
+                raise CommandError(f"Wartość nie może być ujemna: {value}")
+        return pairs
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options["user"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Brak użytkownika '{options['user']}'")
+        rotation = None
+        if options["rotation"]:
+            rotation = user.rotation_templates.filter(name=options["rotation"]).first()
+            if rotation is None:
+                raise CommandError(f"Brak płodozmianu '{options['rotation']}'")
+
+        year = options["year"] or timezone.localdate().year + 1
+        plan = allocation.allocate(
+            user,
+            year,
+            targets=self.parse_pairs(options["target"], float) or None,
+            rotation=rotation,
+            gaps=self.parse_pairs(options["gap"], int),
+            time_limit=options["time_limit"],
+            seed=options["seed"],
+        )
+
+        self.stdout.write(
+            f"Sezon {year}: pól {len(plan.proposals)}, do zaplanowania "
+            f"{plan.ready_count}, {plan.seconds:.2f} s "
+            f"(przeniesień {plan.moves}, łańcuchów {plan.chains})"
+        )
+        for crop, target, area in plan.summary():
+            self.stdout.write(f"  {crop}: {area:.2f} / {target:.2f} ha")
+
+        if options["commit"]:
+            created = rollover.commit(user, year, plan.proposals)
+            self.stdout.write(
+                self.style.SUCCESS(f"Zaplanowano {len(created)} upraw na sezon {year}")
+            )
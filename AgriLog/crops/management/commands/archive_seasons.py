@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from crops.archive import archive_cutoff_year, archive_seasons
+
+
+class Command(BaseCommand):
+    help = "Przenosi uprawy i zabiegi z zamkniętych sezonów do tabel archiwalnych."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--horizon",
+            type=int,
+            help="Ile ostatnich lat zostawić w tabelach bieżących "
+            "(domyślnie ARCHIVE_HORIZON_YEARS).",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.05,
+            help="Przerwa (s) między paczkami, by nie blokować zapisów.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size musi być dodatnie")
+        if options["horizon"] is not None and options["horizon"] < 1:
+            raise CommandError("--horizon musi wynosić co najmniej 1 rok")
+
+        cutoff = archive_cutoff_year(options["horizon"])
+        self.stdout.write(f"Archiwizacja sezonów sprzed {cutoff} roku")
+        moved = archive_seasons(
+            horizon=options["horizon"],
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            stdout=self.stdout if options["verbosity"] > 1 else None,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Przeniesiono upraw: {moved['cultivations']}, "
+                f"zabiegów: {moved['treatments']}"
+            )
+        )
@@ -0,0 +1,101 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crops import backups
+
+
+class Command(BaseCommand):
+    help = (
+        "Tworzy kopię zapasową bazy SQLite bez zatrzymywania aplikacji "
+        "(SQLite backup API, kopiowanie krokami)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Zapisz tylko strony zmienione od ostatniej kopii.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Twórz kopie w pętli co tyle sekund: przyrostowe, a co "
+            "BACKUP_FULL_EVERY kopii pełną (0 = jednorazowo).",
+        )
+        parser.add_argument(
+            "--pages", type=int, help="Stron na krok (domyślnie BACKUP_PAGES)."
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            help="Przerwa (s) między krokami (domyślnie BACKUP_PAUSE_MS).",
+        )
+        parser.add_argument(
+            "--list", action="store_true", help="Wypisz istniejące kopie."
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Sprawdź sumy kontrolne wszystkich kopii.",
+        )
+
+    def handle(self, *args, **options):
+        if options["pages"] == 0:
+            raise CommandError("--pages musi być dodatnie albo -1")
+        if options["list"]:
+            return self.list_snapshots()
+        if options["verify"]:
+            return self.verify()
+
+        while True:
+            if options["interval"]:
+                snapshot = backups.scheduled(
+                    pages=options["pages"], pause=options["pause"]
+                )
+            else:
+                snapshot = backups.create(
+                    incremental=options["incremental"],
+                    pages=options["pages"],
+                    pause=options["pause"],
+                )
+            self.report(snapshot)
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
+
+    def report(self, snapshot):
+        if snapshot is None:
+            self.stdout.write("Brak zmian od ostatniej kopii")
+            return
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Kopia {snapshot.name} ({snapshot.kind}): "
+                f"stron {snapshot.pages_written}/{snapshot.page_count}, "
+                f"{snapshot.stats['seconds']:.2f} s, "
+                f"kroków {snapshot.stats['steps']}, "
+                f"restartów {snapshot.stats['restarts']}"
+            )
+        )
+
+    def list_snapshots(self):
+        for snapshot in backups.list_snapshots():
+            created = time.strftime(
+                "%Y-%m-%d %H:%M:%S", time.localtime(snapshot.created)
+            )
+            self.stdout.write(
+                f"{snapshot.name}  {snapshot.kind:<11}  {created}  "
+                f"stron {snapshot.pages_written}/{snapshot.page_count}"
+            )
+
+    def verify(self):
+        damaged = 0
+        for snapshot in backups.list_snapshots():
+            if backups.verify(snapshot):
+                self.stdout.write(f"{snapshot.name}: OK")
+            else:
+                damaged += 1
+                self.stdout.write(self.style.ERROR(f"{snapshot.name}: USZKODZONA"))
+        if damaged:
+            raise CommandError(f"Uszkodzonych kopii: {damaged}")
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from crops.forecast import run_forecast
+
+
+class Command(BaseCommand):
+    help = "Przelicza prognozy plonów dla upraw bieżącego sezonu (uruchamiane nocą)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, help="Sezon (domyślnie bieżący rok).")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = run_forecast(year=options["year"], batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Zapisano prognoz: {count} w {time.perf_counter() - started:.1f} s"
+            )
+        )
@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from crops.planning import DEFAULT_HORIZON_DAYS, generate
+
+
+class Command(BaseCommand):
+    help = "Tworzy zaplanowane zabiegi z aktywnych harmonogramów (TreatmentSchedule)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Ogranicz do harmonogramów użytkownika.")
+        parser.add_argument(
+            "--horizon",
+            type=int,
+            default=DEFAULT_HORIZON_DAYS,
+            help="Na ile dni naprzód tworzyć terminy.",
+        )
+
+    def handle(self, *args, **options):
+        owner = None
+        if options["user"]:
+            try:
+                owner = get_user_model().objects.get(username=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Brak użytkownika '{options['user']}'")
+
+        count = generate(owner=owner, horizon_days=options["horizon"])
+        self.stdout.write(self.style.SUCCESS(f"Wyliczono terminów: {count}"))
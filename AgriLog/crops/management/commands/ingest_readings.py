@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crops.models import Field, SensorChunk
+from crops.timeseries import ingest_csv
+
+
+class Command(BaseCommand):
+    help = (
+        "Importuje odczyty czujników z pliku CSV (kolumny: timestamp, value "
+        "oraz opcjonalnie field i metric)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Ścieżka do pliku CSV lub '-' dla stdin.")
+        parser.add_argument("--field", type=int, help="Id pola dla wszystkich wierszy.")
+        parser.add_argument(
+            "--metric",
+            choices=SensorChunk.Metric.values,
+            help="Metryka dla wszystkich wierszy.",
+        )
+        parser.add_argument("--block-size", type=int, default=50000)
+
+    def handle(self, *args, **options):
+        if options["field"] and not Field.objects.filter(pk=options["field"]).exists():
+            raise CommandError(f"Brak pola o id {options['field']}")
+
+        def run(stream):
+            return ingest_csv(
+                stream,
+                field_id=options["field"],
+                metric=options["metric"],
+                block_size=options["block_size"],
+            )
+
+        try:
+            if options["path"] == "-":
+                stored = run(sys.stdin)
+            else:
+                with open(options["path"], newline="", encoding="utf-8") as stream:
+                    stored = run(stream)
+        except (KeyError, ValueError) as error:
+            raise CommandError(f"Nieprawidłowy plik CSV: {error}")
+
+        self.stdout.write(self.style.SUCCESS(f"Zapisano odczytów: {stored}"))
@@ -0,0 +1,67 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crops import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        "Uruchamia aplikację lokalnie (WSGI lub ASGI) i obciąża ją równoległymi "
+        "sesjami użytkowników; wynik w formacie JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--server", choices=["wsgi", "asgi"], default="wsgi")
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument("--duration", type=float, default=30.0)
+        parser.add_argument(
+            "--write-ratio",
+            type=float,
+            default=0.3,
+            help="Prawdopodobieństwo dodania zabiegu w jednym przebiegu sesji.",
+        )
+        parser.add_argument("--users", type=int, help="Domyślnie = --concurrency.")
+        parser.add_argument("--fields-per-user", type=int, default=20)
+        parser.add_argument("--port", type=int, default=0)
+        parser.add_argument("--seed", type=int, help="Ziarno losowania scenariuszy.")
+        parser.add_argument("--output", help="Zapisz raport JSON do pliku.")
+        parser.add_argument(
+            "--backup-interval",
+            type=float,
+            help="Twórz w tle kopie zapasowe bazy co tyle sekund (0 = jedna po "
+            "drugiej); raport rozdziela opóźnienia w trakcie kopii i poza nią.",
+        )
+        parser.add_argument(
+            "--cleanup",
+            action="store_true",
+            help=f"Usuń użytkowników {loadtest.USER_PREFIX}* i ich dane po teście.",
+        )
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1 or options["duration"] <= 0:
+            raise CommandError("--concurrency i --duration muszą być dodatnie")
+
+        try:
+            report = loadtest.run(
+                server=options["server"],
+                concurrency=options["concurrency"],
+                duration=options["duration"],
+                write_ratio=options["write_ratio"],
+                fields_per_user=options["fields_per_user"],
+                users=options["users"],
+                port=options["port"],
+                seed_value=options["seed"],
+                backup_interval=options["backup_interval"],
+            )
+        except RuntimeError as error:
+            raise CommandError(str(error))
+        finally:
+            if options["cleanup"]:
+                loadtest.cleanup()
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                stream.write(output)
+        self.stdout.write(output)
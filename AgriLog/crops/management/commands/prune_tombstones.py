@@ -0,0 +1,18 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from crops.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = "Usuwa ślady usuniętych wierszy starsze niż SYNC_TOMBSTONE_RETENTION_DAYS."
+
+    def handle(self, *args, **options):
+        horizon = timezone.now() - datetime.timedelta(
+            days=settings.SYNC_TOMBSTONE_RETENTION_DAYS
+        )
+        deleted, _ = Tombstone.objects.filter(deleted__lt=horizon).delete()
+        self.stdout.write(self.style.SUCCESS(f"Usunięto wpisów: {deleted}"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from crops.archive import archive_cutoff_year
+from crops.inputs import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Odbudowuje zestawienia nawozów i środków ochrony (InputRollup) z zabiegów."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--field", type=int, help="Ogranicz do jednego pola (id).")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--include-archived",
+            action="store_true",
+            help="Przelicz też sezony archiwalne (ich zestawienia zostaną usunięte).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size musi być dodatnie")
+
+        created = rebuild_rollups(
+            field_ids=[options["field"]] if options["field"] else None,
+            batch_size=batch_size,
+            min_season=None if options["include_archived"] else archive_cutoff_year(),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Utworzono zestawień: {created}"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from crops.last_treatments import rebuild_last_treatments
+
+
+class Command(BaseCommand):
+    help = (
+        "Odbudowuje tabelę ostatnich zabiegów każdego typu na polach "
+        "(LastTreatment) z zabiegów bieżących i archiwalnych."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--field", type=int, help="Ogranicz do jednego pola (id).")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size musi być dodatnie")
+
+        created = rebuild_last_treatments(
+            field_ids=[options["field"]] if options["field"] else None,
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Zapisano ostatnich zabiegów: {created}"))
@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from crops.reconcile import reconcile, reconcile_from_watermark
+
+
+class Command(BaseCommand):
+    help = "Odbudowuje uprawy (Cultivation) na podstawie zabiegów siewu (Treatment)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Ignoruj znacznik ostatniego uruchomienia i przelicz wszystkie pola.",
+        )
+        parser.add_argument("--user", help="Ogranicz do pól użytkownika (username).")
+        parser.add_argument("--field", type=int, help="Ogranicz do jednego pola (id).")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size musi być dodatnie")
+
+        if options["user"] or options["field"]:
+            owner = None
+            if options["user"]:
+                try:
+                    owner = get_user_model().objects.get(username=options["user"])
+                except get_user_model().DoesNotExist:
+                    raise CommandError(f"Brak użytkownika '{options['user']}'")
+            result = reconcile(
+                owner=owner, field=options["field"], batch_size=batch_size
+            )
+        else:
+            result = reconcile_from_watermark(
+                batch_size=batch_size, full=options["full"]
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Pola: {result.fields}, utworzono: {result.created}, "
+                f"zaktualizowano: {result.updated}, usunięto: {result.deleted}"
+            )
+        )
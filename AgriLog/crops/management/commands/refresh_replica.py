@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crops import replica
+
+
+class Command(BaseCommand):
+    help = "Odświeża kopię bazy tylko do odczytu (REPLICA_DB_NAME) przez SQLite backup API."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Odświeżaj w pętli co tyle sekund (0 = jednorazowo).",
+        )
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=-1,
+            help="Stron na krok backupu (-1 = cała baza w jednym kroku).",
+        )
+
+    def handle(self, *args, **options):
+        if not replica.is_configured():
+            raise CommandError("Brak REPLICA_DB_NAME w konfiguracji")
+
+        while True:
+            started = time.perf_counter()
+            replica.refresh(pages=options["pages"])
+            self.stdout.write(
+                f"Kopia odświeżona w {time.perf_counter() - started:.2f} s"
+            )
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
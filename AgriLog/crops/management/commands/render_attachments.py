@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from crops.attachments import render_pending
+
+
+class Command(BaseCommand):
+    help = "Generuje brakujące miniatury zdjęć (gdy pula procesów była zajęta lub wyłączona)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, help="Najwyżej tyle plików.")
+
+    def handle(self, *args, **options):
+        done, failed = render_pending(limit=options["limit"], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"Wygenerowano: {done}, błędy: {failed}"))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from crops import backups
+
+
+class Command(BaseCommand):
+    help = "Przywraca bazę z kopii zapasowej po sprawdzeniu sum kontrolnych."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "snapshot",
+            nargs="?",
+            help="Nazwa kopii (domyślnie najnowsza, zob. backup_database --list).",
+        )
+        parser.add_argument(
+            "--output",
+            help="Zapisz odtworzoną bazę do tego pliku zamiast nadpisywać bieżącą.",
+        )
+        parser.add_argument(
+            "--noinput",
+            "--no-input",
+            action="store_false",
+            dest="interactive",
+            help="Nie pytaj o potwierdzenie.",
+        )
+
+    def handle(self, *args, **options):
+        name = options["snapshot"]
+        if name is None:
+            snapshots = backups.list_snapshots()
+            if not snapshots:
+                raise CommandError("Brak kopii zapasowych")
+            name = snapshots[-1].name
+
+        try:
+            if options["output"]:
+                backups.materialize(name, options["output"])
+                self.stdout.write(
+                    self.style.SUCCESS(f"Kopia {name} zapisana do {options['output']}")
+                )
+                return
+
+            if options["interactive"]:
+                answer = input(
+                    f"Bieżąca baza zostanie zastąpiona kopią {name}. "
+                    "Wpisz 'tak', aby kontynuować: "
+                )
+                if answer != "tak":
+                    raise CommandError("Przerwano")
+            backups.restore(name)
+        except backups.BackupError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(f"Przywrócono kopię {name}"))
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crops', '0016_watermark'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedCultivation',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('slug', models.SlugField(blank=True, max_length=100)),
+                ('notes', models.TextField(blank=True, null=True, verbose_name='Opis')),
+                ('status', models.CharField(choices=[('PG', 'W trakcie'), ('CP', 'Zakończono (zebrano)'), ('CL', 'Anulowano (nie przetrwaly)')], default='PG', max_length=2)),
+                ('year', models.PositiveIntegerField()),
+                ('yield_amount', models.DecimalField(blank=True, decimal_places=2, default=0, max_digits=10, null=True, verbose_name='Plony (w kg)')),
+                ('sowing_date', models.DateField(blank=True, null=True)),
+                ('created', models.DateTimeField()),
+                ('updated', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-year'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTreatment',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('treatment_type', models.CharField(choices=[('SW', 'Siew'), ('FT', 'Nawożenie'), ('LM', 'Wapnowanie'), ('PT', 'Ochrona roślin'), ('HV', 'Zbiór'), ('PL', 'Orka'), ('HR', 'Bronowanie'), ('CT', 'Gruberowanie'), ('DC', 'Talerzowanie'), ('OT', 'Inna czynność')], default='OT', max_length=2)),
+                ('date', models.DateField(verbose_name='Data wykonanie')),
+                ('description', models.TextField(blank=True, verbose_name='Opis')),
+                ('created', models.DateTimeField()),
+                ('updated', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='cultivation',
+            index=models.Index(fields=['year'], name='crops_culti_year_492518_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='treatment',
+            index=models.Index(fields=['date'], name='crops_treat_date_4ef5e9_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedcultivation',
+            name='crop_type',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_cultivations', to='crops.croptype'),
+        ),
+        migrations.AddField(
+            model_name='archivedcultivation',
+            name='field',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_cultivations', to='crops.field'),
+        ),
+        migrations.AddField(
+            model_name='archivedcultivation',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_cultivations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedtreatment',
+            name='crop_type',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='crops.croptype', verbose_name='Roślina uprawna'),
+        ),
+        migrations.AddField(
+            model_name='archivedtreatment',
+            name='field',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_treatments', to='crops.field'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcultivation',
+            index=models.Index(fields=['owner', 'year'], name='crops_archi_owner_i_0dd430_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtreatment',
+            index=models.Index(fields=['field', 'date'], name='crops_archi_field_i_26466b_idx'),
+        ),
+    ]
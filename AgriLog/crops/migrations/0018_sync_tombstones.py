@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crops", "0017_season_archive"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model", models.CharField(max_length=50)),
+                ("object_id", models.PositiveIntegerField()),
+                ("deleted", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="treatment",
+            name="client_key",
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name="croptype",
+            index=models.Index(
+                fields=["updated"], name="crops_cropt_updated_c5a17c_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cultivation",
+            index=models.Index(
+                fields=["owner", "updated"], name="crops_culti_owner_i_36195f_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="field",
+            index=models.Index(
+                fields=["owner", "updated"], name="crops_field_owner_i_6e2983_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="treatment",
+            index=models.Index(
+                fields=["updated"], name="crops_treat_updated_886437_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="tombstone",
+            name="owner",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tombstone",
+            index=models.Index(
+                fields=["owner", "deleted"], name="crops_tombs_owner_i_9efcfe_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crops", "0018_sync_tombstones"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SensorChunk",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "metric",
+                    models.CharField(
+                        choices=[
+                            ("SM", "Wilgotność gleby"),
+                            ("ST", "Temperatura gleby"),
+                            ("AT", "Temperatura powietrza"),
+                            ("AH", "Wilgotność powietrza"),
+                            ("PR", "Opady"),
+                            ("WS", "Prędkość wiatru"),
+                        ],
+                        max_length=2,
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("timestamps", models.BinaryField()),
+                ("values", models.BinaryField()),
+                ("hourly", models.BinaryField()),
+                ("value_min", models.FloatField(null=True)),
+                ("value_mean", models.FloatField(null=True)),
+                ("value_max", models.FloatField(null=True)),
+                ("updated", models.DateTimeField(auto_now=True)),
+                (
+                    "field",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sensor_chunks",
+                        to="crops.field",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["day"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("field", "metric", "day"),
+                        name="unique_sensor_chunk_day",
+                    )
+                ],
+            },
+        ),
+    ]
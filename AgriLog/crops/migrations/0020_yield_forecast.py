@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crops", "0019_sensor_chunk"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="YieldForecast",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("per_ha", models.DecimalField(decimal_places=2, max_digits=12)),
+                (
+                    "expected",
+                    models.DecimalField(
+                        decimal_places=2,
+                        max_digits=12,
+                        verbose_name="Prognoza plonu (w kg)",
+                    ),
+                ),
+                ("lower", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("upper", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("samples", models.PositiveIntegerField(default=0)),
+                ("level", models.CharField(blank=True, max_length=20)),
+                ("computed", models.DateTimeField()),
+                (
+                    "cultivation",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="forecast",
+                        to="crops.cultivation",
+                    ),
+                ),
+            ],
+        ),
+    ]
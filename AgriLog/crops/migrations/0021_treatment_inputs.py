@@ -0,0 +1,135 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crops", "0020_yield_forecast"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TreatmentInput",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("product", models.CharField(max_length=100, verbose_name="Produkt")),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("NU", "Składnik pokarmowy"),
+                            ("AI", "Substancja czynna"),
+                        ],
+                        default="NU",
+                        max_length=2,
+                        verbose_name="Rodzaj",
+                    ),
+                ),
+                (
+                    "component",
+                    models.CharField(
+                        help_text="Np. N, P2O5, K2O albo nazwa substancji czynnej",
+                        max_length=50,
+                        verbose_name="Składnik / substancja",
+                    ),
+                ),
+                (
+                    "dose_per_ha",
+                    models.DecimalField(
+                        decimal_places=3, max_digits=10, verbose_name="Dawka na ha"
+                    ),
+                ),
+                (
+                    "unit",
+                    models.CharField(
+                        choices=[("kg", "kg"), ("l", "l"), ("g", "g")],
+                        default="kg",
+                        max_length=2,
+                    ),
+                ),
+                (
+                    "total_amount",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=3,
+                        max_digits=12,
+                        verbose_name="Ilość całkowita",
+                    ),
+                ),
+                (
+                    "treatment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="inputs",
+                        to="crops.treatment",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+        migrations.CreateModel(
+            name="InputRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("season", models.PositiveIntegerField()),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("NU", "Składnik pokarmowy"),
+                            ("AI", "Substancja czynna"),
+                        ],
+                        max_length=2,
+                    ),
+                ),
+                ("component", models.CharField(max_length=50)),
+                (
+                    "unit",
+                    models.CharField(
+                        choices=[("kg", "kg"), ("l", "l"), ("g", "g")], max_length=2
+                    ),
+                ),
+                ("total_amount", models.DecimalField(decimal_places=3, max_digits=14)),
+                ("per_ha", models.DecimalField(decimal_places=3, max_digits=12)),
+                ("treatments", models.PositiveIntegerField(default=0)),
+                (
+                    "field",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="input_rollups",
+                        to="crops.field",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["season", "kind", "component"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("field", "season", "kind", "component", "unit"),
+                        name="unique_input_rollup",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,209 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:09
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crops", "0022_audit_log"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TreatmentSchedule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                (
+                    "treatment_type",
+                    models.CharField(
+                        choices=[
+                            ("SW", "Siew"),
+                            ("FT", "Nawożenie"),
+                            ("LM", "Wapnowanie"),
+                            ("PT", "Ochrona roślin"),
+                            ("HV", "Zbiór"),
+                            ("PL", "Orka"),
+                            ("HR", "Bronowanie"),
+                            ("CT", "Gruberowanie"),
+                            ("DC", "Talerzowanie"),
+                            ("OT", "Inna czynność"),
+                        ],
+                        max_length=2,
+                    ),
+                ),
+                ("start_date", models.DateField(default=datetime.date.today)),
+                (
+                    "interval_months",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Co ile miesięcy powtarzać (0 = jednorazowo)",
+                    ),
+                ),
+                (
+                    "days_after_sowing",
+                    models.PositiveIntegerField(
+                        blank=True,
+                        help_text="Termin liczony od daty siewu bieżącej uprawy (faza rozwoju)",
+                        null=True,
+                    ),
+                ),
+                ("active", models.BooleanField(default=True)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "crop_type",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Tylko pola, na których w bieżącym sezonie rośnie ta roślina",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="crops.croptype",
+                        verbose_name="Roślina uprawna",
+                    ),
+                ),
+                (
+                    "fields",
+                    models.ManyToManyField(
+                        blank=True,
+                        help_text="Puste = wszystkie pola właściciela",
+                        related_name="schedules",
+                        to="crops.field",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="schedules",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="PlannedTreatment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "treatment_type",
+                    models.CharField(
+                        choices=[
+                            ("SW", "Siew"),
+                            ("FT", "Nawożenie"),
+                            ("LM", "Wapnowanie"),
+                            ("PT", "Ochrona roślin"),
+                            ("HV", "Zbiór"),
+                            ("PL", "Orka"),
+                            ("HR", "Bronowanie"),
+                            ("CT", "Gruberowanie"),
+                            ("DC", "Talerzowanie"),
+                            ("OT", "Inna czynność"),
+                        ],
+                        max_length=2,
+                    ),
+                ),
+                ("due_date", models.DateField(verbose_name="Termin")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PL", "Zaplanowany"),
+                            ("DN", "Wykonany"),
+                            ("SK", "Pominięty"),
+                        ],
+                        default="PL",
+                        max_length=2,
+                    ),
+                ),
+                (
+                    "crop_type",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="crops.croptype",
+                    ),
+                ),
+                (
+                    "field",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="planned_treatments",
+                        to="crops.field",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "treatment",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="plan",
+                        to="crops.treatment",
+                    ),
+                ),
+                (
+                    "schedule",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="plans",
+                        to="crops.treatmentschedule",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["due_date"],
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "PL")),
+                        fields=["owner", "due_date"],
+                        name="planned_treatment_next_due",
+                    ),
+                    models.Index(
+                        fields=["field", "treatment_type", "due_date"],
+                        name="crops_plann_field_i_270de3_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("schedule", "field", "due_date"),
+                        name="unique_schedule_occurrence",
+                    )
+                ],
+            },
+        ),
+    ]
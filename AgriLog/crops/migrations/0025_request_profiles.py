@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crops", "0024_attachments"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RequestProfile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "trigger",
+                    models.CharField(
+                        choices=[
+                            ("HD", "Nagłówek z tokenem"),
+                            ("ST", "Personel"),
+                            ("SL", "Wolne żądanie (próbka)"),
+                        ],
+                        max_length=2,
+                    ),
+                ),
+                ("view_name", models.CharField(max_length=200)),
+                ("method", models.CharField(max_length=10)),
+                ("path", models.CharField(max_length=255)),
+                ("status_code", models.PositiveSmallIntegerField()),
+                ("duration_ms", models.PositiveIntegerField()),
+                ("sql_ms", models.PositiveIntegerField()),
+                ("sql_count", models.PositiveIntegerField()),
+                ("template_ms", models.PositiveIntegerField()),
+                ("python_ms", models.PositiveIntegerField()),
+                ("samples", models.PositiveIntegerField()),
+                ("file_name", models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                "ordering": ["-created"],
+                "indexes": [
+                    models.Index(
+                        fields=["view_name", "created"],
+                        name="crops_reque_view_na_cfe7bc_idx",
+                    )
+                ],
+            },
+        ),
+    ]
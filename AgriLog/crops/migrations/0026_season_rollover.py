@@ -0,0 +1,120 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crops", "0025_request_profiles"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="archivedcultivation",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PG", "W trakcie"),
+                    ("CP", "Zakończono (zebrano)"),
+                    ("CL", "Anulowano (nie przetrwaly)"),
+                    ("PN", "Zaplanowano"),
+                ],
+                default="PG",
+                max_length=2,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="cultivation",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PG", "W trakcie"),
+                    ("CP", "Zakończono (zebrano)"),
+                    ("CL", "Anulowano (nie przetrwaly)"),
+                    ("PN", "Zaplanowano"),
+                ],
+                default="PG",
+                max_length=2,
+            ),
+        ),
+        migrations.CreateModel(
+            name="RotationTemplate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(max_length=100, verbose_name="Nazwa płodozmianu"),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rotation_templates",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="RotationStep",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("position", models.PositiveSmallIntegerField()),
+                (
+                    "crop_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="crops.croptype",
+                    ),
+                ),
+                (
+                    "template",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="steps",
+                        to="crops.rotationtemplate",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["position"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="rotationtemplate",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "name"), name="unique_rotation_template_name"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="rotationstep",
+            constraint=models.UniqueConstraint(
+                fields=("template", "position"), name="unique_rotation_step"
+            ),
+        ),
+    ]
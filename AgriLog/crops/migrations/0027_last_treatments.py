@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crops", "0026_season_rollover"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LastTreatment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "treatment_type",
+                    models.CharField(
+                        choices=[
+                            ("SW", "Siew"),
+                            ("FT", "Nawożenie"),
+                            ("LM", "Wapnowanie"),
+                            ("PT", "Ochrona roślin"),
+                            ("HV", "Zbiór"),
+                            ("PL", "Orka"),
+                            ("HR", "Bronowanie"),
+                            ("CT", "Gruberowanie"),
+                            ("DC", "Talerzowanie"),
+                            ("OT", "Inna czynność"),
+                        ],
+                        max_length=2,
+                    ),
+                ),
+                ("date", models.DateField()),
+                (
+                    "field",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="last_treatments",
+                        to="crops.field",
+                    ),
+                ),
+                (
+                    "treatment",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="crops.treatment",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["treatment_type"],
+                "indexes": [
+                    models.Index(
+                        fields=["treatment_type", "date"],
+                        name="crops_lastt_treatme_313a3a_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("field", "treatment_type"), name="unique_last_treatment"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crops", "0027_last_treatments"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="attachment",
+            name="treatment",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="attachments",
+                to="crops.treatment",
+            ),
+        ),
+    ]
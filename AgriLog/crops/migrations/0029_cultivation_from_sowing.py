@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crops", "0028_attachment_treatment_set_null"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cultivation",
+            name="from_sowing",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crops", "0029_cultivation_from_sowing"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedTreatmentInput",
+            fields=[
+                ("id", models.IntegerField(primary_key=True, serialize=False)),
+                ("product", models.CharField(max_length=100, verbose_name="Produkt")),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("NU", "Składnik pokarmowy"),
+                            ("AI", "Substancja czynna"),
+                        ],
+                        default="NU",
+                        max_length=2,
+                        verbose_name="Rodzaj",
+                    ),
+                ),
+                (
+                    "component",
+                    models.CharField(
+                        max_length=50, verbose_name="Składnik / substancja"
+                    ),
+                ),
+                (
+                    "dose_per_ha",
+                    models.DecimalField(
+                        decimal_places=3, max_digits=10, verbose_name="Dawka na ha"
+                    ),
+                ),
+                (
+                    "unit",
+                    models.CharField(
+                        choices=[("kg", "kg"), ("l", "l"), ("g", "g")],
+                        default="kg",
+                        max_length=2,
+                    ),
+                ),
+                (
+                    "total_amount",
+                    models.DecimalField(
+                        decimal_places=3, max_digits=12, verbose_name="Ilość całkowita"
+                    ),
+                ),
+                (
+                    "treatment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="inputs",
+                        to="crops.archivedtreatment",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+    ]
@@ -1,13 +1,30 @@
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.text import slugify
 import datetime
+import json
 import uuid
 
 
+class AuditedMixin:
+    # Pola, których zmiany trafiają do dziennika zmian (audit.py)
+    audit_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        from .audit import snapshot
+
+        instance = super().from_db(db, field_names, values)
+        instance._audit_snapshot = snapshot(instance)
+        return instance
+
+
 class CropType(models.Model):
     name = models.CharField(max_length=50, unique=True)
     created = models.DateTimeField(auto_now_add=True)
@@ -15,12 +32,24 @@ class CropType(models.Model):
 
     class Meta:
         ordering = ["name"]
+        indexes = [models.Index(fields=["updated"])]
 
     def __str__(self):
         return self.name
 
 
-class Field(models.Model):
+class FieldQuerySet(models.QuerySet):
+    def for_owner(self, user):
+        return self.filter(owner=user)
+
+    def for_list(self):
+        return self.defer("notes", "created", "updated")
+
+    def for_detail(self):
+        return self.select_related("owner")
+
+
+class Field(AuditedMixin, models.Model):
     class SoilClass(models.TextChoices):
         I = "I", "I klasa"
         II = "II", "II klasa"
@@ -43,8 +72,12 @@ class Field(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    objects = FieldQuerySet.as_manager()
+    audit_fields = ("name", "area_size", "soil_class", "notes")
+
     class Meta:
         ordering = ["name"]
+        indexes = [models.Index(fields=["owner", "updated"])]
 
     def __str__(self):
         return self.name
@@ -73,15 +106,53 @@ class Field(models.Model):
                 )
 
     def latest_cultivations(self):
+        # Przy liście pól uprawy ostatniego roku są już pobrane (FieldPage)
+        if hasattr(self, "current_cultivations"):
+            return self.current_cultivations
+
         latest_year = self.current_year()
         return self.cultivations.filter(year=latest_year)
 
 
-class Cultivation(models.Model):
+class CultivationQuerySet(models.QuerySet):
+    def for_owner(self, user):
+        return self.filter(owner=user)
+
+    def for_list(self, *extra):
+        # ``extra`` to kolumny potrzebne tylko niektórym listom (np. notatki)
+        return self.select_related("field", "crop_type").only(
+            "id",
+            "year",
+            "status",
+            "sowing_date",
+            "yield_amount",
+            "field",
+            "field__name",
+            "crop_type",
+            "crop_type__name",
+            *extra,
+        )
+
+    def latest_per_field(self):
+        # Tylko uprawy z ostatniego roku danego pola
+        latest = (
+            self.model.objects.filter(field_id=OuterRef("field_id"))
+            .order_by("-year")
+            .values("year")[:1]
+        )
+        return self.filter(year=Subquery(latest))
+
+    def for_detail(self):
+        return self.select_related("field", "crop_type", "owner")
+
+
+class Cultivation(AuditedMixin, models.Model):
     class Status(models.TextChoices):
         PROGRESS = "PG", "W trakcie"
         COMPLETED = "CP", "Zakończono (zebrano)"
         CANCELLED = "CL", "Anulowano (nie przetrwaly)"
+        # Zaplanowana przy przejściu na nowy sezon; siew zmienia status na PG
+        PLANNED = "PN", "Zaplanowano"
 
     field = models.ForeignKey(
         Field, on_delete=models.SET_NULL, null=True, related_name="cultivations"
@@ -111,11 +182,21 @@ class Cultivation(models.Model):
         default=0,
     )
     sowing_date = models.DateField(null=True, blank=True)
+    # Założona przez uzgadnianie z zabiegu siewu; tylko takie uprawy
+    # uzgadnianie może usunąć, gdy siew zniknie
+    from_sowing = models.BooleanField(default=False, editable=False)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    objects = CultivationQuerySet.as_manager()
+    audit_fields = ("crop_type", "status", "sowing_date", "yield_amount", "notes")
+
     class Meta:
         ordering = ["-year"]
+        indexes = [
+            models.Index(fields=["year"]),
+            models.Index(fields=["owner", "updated"]),
+        ]
 
     def __str__(self):
         return f"{self.field.name} - {self.crop_type.name} ({self.year})"
@@ -132,32 +213,89 @@ class Cultivation(models.Model):
                     {"year": f"Rok {self.year} jest zbyt odległy w przyszłości"}
                 )
 
-        if self.yield_amount < 0:
+        if self.yield_amount is not None and self.yield_amount < 0:
             raise ValidationError(
                 {
                     "yield_amount": f"Nie można wpisać ujemną wartość zebranych plonów (podano: {self.yield_amount})"
                 }
             )
 
+    def base_slug(self):
+        return slugify(f"{self.year}-{self.field.name}-{self.crop_type.name}")
+
+    @classmethod
+    def assign_slugs(cls, cultivations):
+        # Wersja save() dla bulk_create - jedno zapytanie o kolizje zamiast
+        # osobnego exists() dla każdego wiersza
+        cultivations = list(cultivations)
+        bases = {id(c): c.base_slug() for c in cultivations}
+        taken = set(
+            cls.objects.filter(slug__in=set(bases.values()))
+            .exclude(pk__in=[c.pk for c in cultivations if c.pk])
+            .values_list("slug", flat=True)
+        )
+
+        for cultivation in cultivations:
+            slug = bases[id(cultivation)]
+            if slug in taken:
+                slug = f"{slug}-{str(uuid.uuid4())[:4]}"
+            taken.add(slug)
+            cultivation.slug = slug
+
+        return cultivations
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if {"year", "field_id", "crop_type_id"} <= set(field_names):
+            instance._slug_key = instance.slug_key()
+        return instance
+
+    def slug_key(self):
+        return (self.year, self.field_id, self.crop_type_id)
+
     def save(self, *args, **kwargs):
-        base_string = f"{self.year}-{self.field.name}-{self.crop_type.name}"
-        new_slug = slugify(base_string)
+        # Slug zależy tylko od roku, pola i rośliny; przy zmianie notatek,
+        # statusu czy plonu nie liczymy go od nowa (bez zapytania exists())
+        if not self.slug or getattr(self, "_slug_key", None) != self.slug_key():
+            new_slug = self.base_slug()
 
-        if Cultivation.objects.filter(slug=new_slug).exclude(pk=self.pk).exists():
-            new_slug = f"{new_slug}-{str(uuid.uuid4())[:4]}"
+            if Cultivation.objects.filter(slug=new_slug).exclude(pk=self.pk).exists():
+                new_slug = f"{new_slug}-{str(uuid.uuid4())[:4]}"
+
+            self.slug = new_slug
 
         if not self.sowing_date and self.year:
             self.sowing_date = datetime.date(self.year, 9, 1)
 
-        self.slug = new_slug
         super().save(*args, **kwargs)
+        self._slug_key = self.slug_key()
 
     @property
     def is_active_now(self):
         return self.year == timezone.now().year
 
 
-class Treatment(models.Model):
+class TreatmentQuerySet(models.QuerySet):
+    def for_owner(self, user):
+        return self.filter(field__owner=user)
+
+    def for_list(self):
+        return self.select_related("crop_type").only(
+            "id",
+            "field_id",
+            "treatment_type",
+            "date",
+            "description",
+            "crop_type",
+            "crop_type__name",
+        )
+
+    def for_detail(self):
+        return self.select_related("field", "crop_type")
+
+
+class Treatment(AuditedMixin, models.Model):
     class TreatmentType(models.TextChoices):
         SOWING = "SW", "Siew"
         FERTILIZING = "FT", "Nawożenie"
@@ -189,36 +327,821 @@ class Treatment(models.Model):
         verbose_name="Roślina uprawna",
         help_text="Wymagane tyklo dla zbiegu typu siew",
     )
+    # Klucz idempotencji nadawany przez tablet przy zapisie offline
+    client_key = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+
+    objects = TreatmentQuerySet.as_manager()
+    audit_fields = ("field", "treatment_type", "date", "crop_type", "description")
 
     class Meta:
         ordering = ["-date"]
+        indexes = [
+            models.Index(fields=["date"]),
+            models.Index(fields=["updated"]),
+        ]
 
     def __str__(self):
         return f"{self.treatment_type} - {self.field.name} ({self.date})"
 
     def clean(self):
-        if self.treatment_type == self.TreatmentType.SOWING and not self.crop_type:
+        if self.treatment_type == self.TreatmentType.SOWING and not self.crop_type_id:
             raise ValidationError(
                 {
                     "crop_type": "Musisz wybrać rośliną uprawną, jeśli chcesz dodać zabieg siewu"
                 }
             )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Pole i sezon z bazy, by po edycji przeliczyć też stare zestawienia
+        if "field_id" in field_names and "date" in field_names:
+            instance._loaded_season = (instance.field_id, instance.date.year)
+            if "treatment_type" in field_names:
+                instance._loaded_last = (
+                    instance.field_id,
+                    instance.treatment_type,
+                    instance.date,
+                )
+        return instance
+
     def save(self, *args, **kwargs):
+        from .inputs import refresh_rollups
+        from .last_treatments import record_treatment, refresh_last_treatments
+        from .planning import complete_plans
+        from .reconcile import reconcile_fields
+
         is_new = self.pk is None
 
         self.full_clean()
 
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            # Edycja istniejącego zabiegu mogła zmienić typ, datę, roślinę
+            # siewu lub pole, więc uprawy obu pól liczymy od nowa z dziennika
+            loaded = getattr(self, "_loaded_season", None)
+            if not is_new or self.treatment_type == self.TreatmentType.SOWING:
+                reconcile_fields({self.field_id, loaded[0] if loaded else None})
+
+            if is_new:
+                complete_plans([self])
+
+            if loaded and loaded != (self.field_id, self.date.year):
+                refresh_rollups([loaded, (self.field_id, self.date.year)])
+            self._loaded_season = (self.field_id, self.date.year)
+
+            # Zabieg wpisany z datą wsteczną nie wypiera późniejszego; po
+            # cofnięciu daty lub zmianie typu liczymy obie pary od nowa
+            loaded = getattr(self, "_loaded_last", None)
+            current = (self.field_id, self.treatment_type, self.date)
+            if is_new or (
+                loaded and loaded[:2] == current[:2] and loaded[2] <= current[2]
+            ):
+                if loaded != current:
+                    record_treatment(self)
+            else:
+                refresh_last_treatments({current[:2], (loaded or current)[:2]})
+            self._loaded_last = current
+
+
+@receiver(post_delete, sender=Treatment)
+def reconcile_after_treatment_delete(sender, instance, **kwargs):
+    from .reconcile import is_paused, reconcile_fields
+
+    if is_paused():
+        return
+
+    if instance.treatment_type == Treatment.TreatmentType.SOWING:
+        reconcile_fields([instance.field_id])
+
+
+class TreatmentInput(models.Model):
+    class Kind(models.TextChoices):
+        NUTRIENT = "NU", "Składnik pokarmowy"
+        ACTIVE_INGREDIENT = "AI", "Substancja czynna"
+
+    class Unit(models.TextChoices):
+        KG = "kg", "kg"
+        L = "l", "l"
+        G = "g", "g"
+
+    treatment = models.ForeignKey(
+        Treatment, on_delete=models.CASCADE, related_name="inputs"
+    )
+    product = models.CharField(max_length=100, verbose_name="Produkt")
+    kind = models.CharField(
+        max_length=2, choices=Kind.choices, default=Kind.NUTRIENT, verbose_name="Rodzaj"
+    )
+    component = models.CharField(
+        max_length=50,
+        verbose_name="Składnik / substancja",
+        help_text="Np. N, P2O5, K2O albo nazwa substancji czynnej",
+    )
+    dose_per_ha = models.DecimalField(
+        max_digits=10, decimal_places=3, verbose_name="Dawka na ha"
+    )
+    unit = models.CharField(max_length=2, choices=Unit.choices, default=Unit.KG)
+    total_amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=3,
+        blank=True,
+        verbose_name="Ilość całkowita",
+    )
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.product}: {self.component} {self.dose_per_ha} {self.unit}/ha"
+
+    def clean(self):
+        if self.dose_per_ha is not None and self.dose_per_ha < 0:
+            raise ValidationError({"dose_per_ha": "Dawka nie może być ujemna"})
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "dose_per_ha" in field_names and "total_amount" in field_names:
+            instance._loaded_amounts = (instance.dose_per_ha, instance.total_amount)
+        return instance
+
+    def fill_total(self, area_size):
+        if self.total_amount is None and self.dose_per_ha is not None:
+            self.total_amount = self.dose_per_ha * area_size
+        return self
+
+    def save(self, *args, **kwargs):
+        # Zmieniona dawka bez ręcznie zmienionej ilości: ilość liczymy od
+        # nowa, inaczej zestawienia liczyłyby dawkę z ha z nieaktualnej sumy
+        loaded = getattr(self, "_loaded_amounts", None)
+        if loaded and self.dose_per_ha != loaded[0] and self.total_amount == loaded[1]:
+            self.total_amount = None
+        if self.total_amount is None:
+            self.fill_total(self.treatment.field.area_size)
         super().save(*args, **kwargs)
+        self._loaded_amounts = (self.dose_per_ha, self.total_amount)
+
+
+class InputRollup(models.Model):
+    # Suma dawek na pole, sezon i składnik; utrzymywana przez inputs.py
+    field = models.ForeignKey(
+        Field, on_delete=models.CASCADE, related_name="input_rollups"
+    )
+    season = models.PositiveIntegerField()
+    kind = models.CharField(max_length=2, choices=TreatmentInput.Kind.choices)
+    component = models.CharField(max_length=50)
+    unit = models.CharField(max_length=2, choices=TreatmentInput.Unit.choices)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=3)
+    per_ha = models.DecimalField(max_digits=12, decimal_places=3)
+    treatments = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["season", "kind", "component"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["field", "season", "kind", "component", "unit"],
+                name="unique_input_rollup",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.field_id} {self.season} {self.component}: {self.total_amount}"
+
+
+@receiver(post_save, sender=TreatmentInput)
+@receiver(post_delete, sender=TreatmentInput)
+def refresh_input_rollup(sender, instance, **kwargs):
+    from . import reconcile
+    from .inputs import refresh_rollups
+
+    # Archiwizacja usuwa zabiegi, ale zestawienia starych sezonów zostają
+    if reconcile.is_paused():
+        return
+
+    treatment = (
+        Treatment.objects.filter(pk=instance.treatment_id)
+        .values_list("field_id", "date")
+        .first()
+    )
+    if treatment:
+        refresh_rollups([(treatment[0], treatment[1].year)])
+
+
+class LastTreatment(models.Model):
+    # Ostatni zabieg danego typu na polu; utrzymywany przez last_treatments.py
+    field = models.ForeignKey(
+        Field, on_delete=models.CASCADE, related_name="last_treatments"
+    )
+    treatment_type = models.CharField(
+        max_length=2, choices=Treatment.TreatmentType.choices
+    )
+    date = models.DateField()
+    # Puste, gdy zabieg został już przeniesiony do archiwum
+    treatment = models.ForeignKey(
+        Treatment, on_delete=models.SET_NULL, blank=True, null=True, related_name="+"
+    )
+
+    class Meta:
+        ordering = ["treatment_type"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["field", "treatment_type"], name="unique_last_treatment"
+            )
+        ]
+        indexes = [models.Index(fields=["treatment_type", "date"])]
+
+    def __str__(self):
+        return f"{self.field_id} {self.treatment_type}: {self.date}"
+
+
+@receiver(post_delete, sender=Treatment)
+def refresh_last_treatment(sender, instance, **kwargs):
+    from . import reconcile
+    from .last_treatments import forget_treatment
+
+    # Archiwizacja usuwa zabiegi, ale data ostatniego zabiegu zostaje
+    if reconcile.is_paused():
+        return
+    forget_treatment(instance)
+
+
+class RotationTemplate(models.Model):
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="rotation_templates",
+    )
+    name = models.CharField(max_length=100, verbose_name="Nazwa płodozmianu")
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["name"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "name"], name="unique_rotation_template_name"
+            )
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def crop_ids(self):
+        return [step.crop_type_id for step in self.steps.all()]
+
+
+class RotationStep(models.Model):
+    template = models.ForeignKey(
+        RotationTemplate, on_delete=models.CASCADE, related_name="steps"
+    )
+    position = models.PositiveSmallIntegerField()
+    crop_type = models.ForeignKey(CropType, on_delete=models.CASCADE, related_name="+")
+
+    class Meta:
+        ordering = ["position"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["template", "position"], name="unique_rotation_step"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.template} #{self.position}"
+
+
+class TreatmentSchedule(models.Model):
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="schedules"
+    )
+    name = models.CharField(max_length=100)
+    treatment_type = models.CharField(
+        max_length=2, choices=Treatment.TreatmentType.choices
+    )
+    fields = models.ManyToManyField(
+        Field,
+        blank=True,
+        related_name="schedules",
+        help_text="Puste = wszystkie pola właściciela",
+    )
+    crop_type = models.ForeignKey(
+        CropType,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        verbose_name="Roślina uprawna",
+        help_text="Tylko pola, na których w bieżącym sezonie rośnie ta roślina",
+    )
+    start_date = models.DateField(default=datetime.date.today)
+    interval_months = models.PositiveIntegerField(
+        default=0, help_text="Co ile miesięcy powtarzać (0 = jednorazowo)"
+    )
+    days_after_sowing = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        help_text="Termin liczony od daty siewu bieżącej uprawy (faza rozwoju)",
+    )
+    active = models.BooleanField(default=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        if self.days_after_sowing is not None and not self.crop_type:
+            raise ValidationError(
+                {"crop_type": "Termin od siewu wymaga wybrania rośliny uprawnej"}
+            )
+
+
+class PlannedTreatment(models.Model):
+    class Status(models.TextChoices):
+        PLANNED = "PL", "Zaplanowany"
+        DONE = "DN", "Wykonany"
+        SKIPPED = "SK", "Pominięty"
+
+    # Właściciel powielony z pola, by "co w tym tygodniu" było jednym
+    # przejściem po indeksie (owner, due_date) bez złączenia
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    field = models.ForeignKey(
+        Field, on_delete=models.CASCADE, related_name="planned_treatments"
+    )
+    schedule = models.ForeignKey(
+        TreatmentSchedule,
+        on_delete=models.CASCADE,
+        related_name="plans",
+        blank=True,
+        null=True,
+    )
+    treatment_type = models.CharField(
+        max_length=2, choices=Treatment.TreatmentType.choices
+    )
+    crop_type = models.ForeignKey(
+        CropType, on_delete=models.SET_NULL, blank=True, null=True
+    )
+    due_date = models.DateField(verbose_name="Termin")
+    status = models.CharField(
+        max_length=2, choices=Status.choices, default=Status.PLANNED
+    )
+    treatment = models.OneToOneField(
+        Treatment,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="plan",
+    )
+
+    class Meta:
+        ordering = ["due_date"]
+        indexes = [
+            models.Index(
+                fields=["owner", "due_date"],
+                condition=models.Q(status="PL"),
+                name="planned_treatment_next_due",
+            ),
+            models.Index(fields=["field", "treatment_type", "due_date"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["schedule", "field", "due_date"],
+                name="unique_schedule_occurrence",
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.get_treatment_type_display()} - {self.field_id} ({self.due_date})"
+        )
+
 
-        if (
-            is_new
-            and self.treatment_type == self.TreatmentType.SOWING
-            and self.crop_type
-        ):
-            Cultivation.objects.update_or_create(
-                field=self.field,
-                crop_type=self.crop_type,
-                year=self.date.year,
-                defaults={"sowing_date": self.date, "owner": self.field.owner},
+class ArchivedCultivation(models.Model):
+    # Kopia Cultivation dla zamkniętych sezonów, zachowuje oryginalne id
+    id = models.IntegerField(primary_key=True)
+    field = models.ForeignKey(
+        Field,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="archived_cultivations",
+    )
+    crop_type = models.ForeignKey(
+        CropType,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="archived_cultivations",
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name="archived_cultivations",
+        blank=True,
+        null=True,
+    )
+    slug = models.SlugField(max_length=100, blank=True)
+    notes = models.TextField(verbose_name="Opis", blank=True, null=True)
+    status = models.CharField(
+        max_length=2,
+        choices=Cultivation.Status.choices,
+        default=Cultivation.Status.PROGRESS,
+    )
+    year = models.PositiveIntegerField()
+    yield_amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name="Plony (w kg)",
+        blank=True,
+        null=True,
+        default=0,
+    )
+    sowing_date = models.DateField(null=True, blank=True)
+    created = models.DateTimeField()
+    updated = models.DateTimeField()
+
+    objects = CultivationQuerySet.as_manager()
+
+    is_archived = True
+
+    class Meta:
+        ordering = ["-year"]
+        indexes = [models.Index(fields=["owner", "year"])]
+
+    def __str__(self):
+        return f"{self.field.name} - {self.crop_type.name} ({self.year})"
+
+
+class ArchivedTreatment(models.Model):
+    id = models.IntegerField(primary_key=True)
+    field = models.ForeignKey(
+        Field, on_delete=models.CASCADE, related_name="archived_treatments"
+    )
+    treatment_type = models.CharField(
+        max_length=2,
+        choices=Treatment.TreatmentType.choices,
+        default=Treatment.TreatmentType.OTHER,
+    )
+    date = models.DateField(verbose_name="Data wykonanie")
+    description = models.TextField(blank=True, verbose_name="Opis")
+    created = models.DateTimeField()
+    updated = models.DateTimeField()
+    crop_type = models.ForeignKey(
+        CropType,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="+",
+        verbose_name="Roślina uprawna",
+    )
+
+    is_archived = True
+
+    class Meta:
+        ordering = ["-date"]
+        indexes = [models.Index(fields=["field", "date"])]
+
+    def __str__(self):
+        return f"{self.treatment_type} - {self.field.name} ({self.date})"
+
+
+class ArchivedTreatmentInput(models.Model):
+    # Kopia TreatmentInput; przenoszona razem z zabiegiem, by archiwizacja
+    # nie kasowała ewidencji nawozów i środków ochrony
+    id = models.IntegerField(primary_key=True)
+    treatment = models.ForeignKey(
+        ArchivedTreatment, on_delete=models.CASCADE, related_name="inputs"
+    )
+    product = models.CharField(max_length=100, verbose_name="Produkt")
+    kind = models.CharField(
+        max_length=2,
+        choices=TreatmentInput.Kind.choices,
+        default=TreatmentInput.Kind.NUTRIENT,
+        verbose_name="Rodzaj",
+    )
+    component = models.CharField(max_length=50, verbose_name="Składnik / substancja")
+    dose_per_ha = models.DecimalField(
+        max_digits=10, decimal_places=3, verbose_name="Dawka na ha"
+    )
+    unit = models.CharField(
+        max_length=2,
+        choices=TreatmentInput.Unit.choices,
+        default=TreatmentInput.Unit.KG,
+    )
+    total_amount = models.DecimalField(
+        max_digits=12, decimal_places=3, verbose_name="Ilość całkowita"
+    )
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.product}: {self.component} {self.dose_per_ha} {self.unit}/ha"
+
+
+class SensorChunk(models.Model):
+    # Odczyty czujników z jednej doby jako spakowane tablice (zob. timeseries.py)
+    class Metric(models.TextChoices):
+        SOIL_MOISTURE = "SM", "Wilgotność gleby"
+        SOIL_TEMPERATURE = "ST", "Temperatura gleby"
+        AIR_TEMPERATURE = "AT", "Temperatura powietrza"
+        AIR_HUMIDITY = "AH", "Wilgotność powietrza"
+        PRECIPITATION = "PR", "Opady"
+        WIND_SPEED = "WS", "Prędkość wiatru"
+
+    field = models.ForeignKey(
+        Field, on_delete=models.CASCADE, related_name="sensor_chunks"
+    )
+    metric = models.CharField(max_length=2, choices=Metric.choices)
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    timestamps = models.BinaryField()
+    values = models.BinaryField()
+    hourly = models.BinaryField()
+    value_min = models.FloatField(null=True)
+    value_mean = models.FloatField(null=True)
+    value_max = models.FloatField(null=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["day"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["field", "metric", "day"], name="unique_sensor_chunk_day"
             )
+        ]
+
+    def __str__(self):
+        return f"{self.field_id} {self.metric} {self.day} ({self.count})"
+
+
+class YieldForecast(models.Model):
+    # Prognoza plonu uprawy bieżącego sezonu, liczona zbiorczo (forecast.py)
+    cultivation = models.OneToOneField(
+        Cultivation, on_delete=models.CASCADE, related_name="forecast"
+    )
+    per_ha = models.DecimalField(max_digits=12, decimal_places=2)
+    expected = models.DecimalField(
+        max_digits=12, decimal_places=2, verbose_name="Prognoza plonu (w kg)"
+    )
+    lower = models.DecimalField(max_digits=12, decimal_places=2)
+    upper = models.DecimalField(max_digits=12, decimal_places=2)
+    samples = models.PositiveIntegerField(default=0)
+    level = models.CharField(max_length=20, blank=True)
+    computed = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.cultivation_id}: {self.expected} ({self.lower}-{self.upper})"
+
+
+class Blob(models.Model):
+    # Plik adresowany treścią (SHA-256); ten sam plik wgrany dwa razy
+    # zajmuje miejsce na dysku tylko raz
+    digest = models.CharField(max_length=64, unique=True)
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=100)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    renditions_ready = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["created"],
+                condition=models.Q(renditions_ready=False),
+                name="blob_pending_renditions",
+            )
+        ]
+
+    def __str__(self):
+        return self.digest
+
+
+class Attachment(models.Model):
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    field = models.ForeignKey(
+        Field, on_delete=models.CASCADE, related_name="attachments"
+    )
+    # Zdjęcie zostaje przy polu, także gdy zabieg trafia do archiwum
+    treatment = models.ForeignKey(
+        Treatment,
+        on_delete=models.SET_NULL,
+        related_name="attachments",
+        blank=True,
+        null=True,
+    )
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, related_name="+")
+    name = models.CharField(max_length=255, blank=True)
+    caption = models.CharField(max_length=255, blank=True, verbose_name="Opis")
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["field", "created"]),
+            models.Index(fields=["treatment", "created"]),
+        ]
+
+    def __str__(self):
+        return self.name or self.blob.digest
+
+
+class Tombstone(models.Model):
+    # Ślad po usuniętym wierszu dla synchronizacji przyrostowej tabletów
+    model = models.CharField(max_length=50)
+    object_id = models.PositiveIntegerField()
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+        blank=True,
+        null=True,
+    )
+    deleted = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["owner", "deleted"])]
+
+    def __str__(self):
+        return f"{self.model}#{self.object_id}"
+
+
+def _owner_id(instance):
+    if isinstance(instance, Treatment):
+        if Treatment.field.is_cached(instance):
+            return instance.field.owner_id
+        # Kilka sygnałów pyta o właściciela tego samego zabiegu; jedno zapytanie
+        cached = getattr(instance, "_field_owner", None)
+        if cached is None or cached[0] != instance.field_id:
+            owner_id = (
+                Field.objects.filter(pk=instance.field_id)
+                .values_list("owner_id", flat=True)
+                .first()
+            )
+            cached = instance._field_owner = (instance.field_id, owner_id)
+        return cached[1]
+    return getattr(instance, "owner_id", None)
+
+
+@receiver(post_delete, sender=Field)
+@receiver(post_delete, sender=Cultivation)
+@receiver(post_delete, sender=Treatment)
+@receiver(post_delete, sender=CropType)
+def record_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(
+        model=sender._meta.model_name,
+        object_id=instance.pk,
+        owner_id=_owner_id(instance),
+    )
+
+
+@receiver(post_save, sender=Field)
+@receiver(post_save, sender=Cultivation)
+@receiver(post_save, sender=Treatment)
+@receiver(post_delete, sender=Field)
+@receiver(post_delete, sender=Cultivation)
+@receiver(post_delete, sender=Treatment)
+def invalidate_owner_dashboard(sender, instance, **kwargs):
+    from .dashboard import invalidate_dashboard
+
+    invalidate_dashboard(_owner_id(instance))
+
+
+@receiver(post_save, sender=Cultivation)
+@receiver(post_save, sender=Treatment)
+@receiver(post_delete, sender=Cultivation)
+@receiver(post_delete, sender=Treatment)
+def publish_field_change(sender, instance, signal, created=False, raw=False, **kwargs):
+    from . import events, reconcile
+
+    if raw or reconcile.is_paused():
+        return
+    if signal is post_delete:
+        action = "deleted"
+    else:
+        action = "created" if created else "updated"
+    field_ids = {instance.field_id}
+    # Zabieg przeniesiony na inne pole znika też ze strony poprzedniego
+    loaded = getattr(instance, "_loaded_season", None)
+    if loaded:
+        field_ids.add(loaded[0])
+    events.field_changed(field_ids, sender._meta.model_name, action, instance.pk)
+
+
+@receiver(post_save, sender=CropType)
+@receiver(post_delete, sender=CropType)
+def invalidate_crop_type_cache(sender, **kwargs):
+    from . import refdata
+
+    # Po zatwierdzeniu, by inne procesy nie wczytały stanu sprzed zapisu
+    transaction.on_commit(refdata.invalidate)
+
+
+class AuditEntry(models.Model):
+    class Action(models.TextChoices):
+        CREATE = "C", "Utworzenie"
+        UPDATE = "U", "Zmiana"
+        DELETE = "D", "Usunięcie"
+
+    # Wiersze tylko dopisywane; zmiany jako zwarty JSON {"pole": [przed, po]}
+    model = models.CharField(max_length=20)
+    object_id = models.PositiveBigIntegerField()
+    action = models.CharField(max_length=1, choices=Action.choices)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+        blank=True,
+        null=True,
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        blank=True,
+        null=True,
+    )
+    changes = models.TextField()
+    created = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=["model", "object_id", "created"])]
+
+    def __str__(self):
+        return f"{self.model}#{self.object_id} {self.action} ({self.created})"
+
+    def decoded_changes(self):
+        return json.loads(self.changes)
+
+
+@receiver(post_save, sender=Field)
+@receiver(post_save, sender=Cultivation)
+@receiver(post_save, sender=Treatment)
+def audit_save(sender, instance, created, raw=False, **kwargs):
+    from . import audit
+
+    if raw:
+        return
+    action = AuditEntry.Action.CREATE if created else AuditEntry.Action.UPDATE
+    audit.record(instance, action, _owner_id(instance))
+
+
+@receiver(post_delete, sender=Field)
+@receiver(post_delete, sender=Cultivation)
+@receiver(post_delete, sender=Treatment)
+def audit_delete(sender, instance, **kwargs):
+    from . import audit, reconcile
+
+    # Przeniesienie do archiwum nie jest usunięciem danych
+    if reconcile.is_paused():
+        return
+    audit.record(instance, AuditEntry.Action.DELETE, _owner_id(instance))
+
+
+class RequestProfile(models.Model):
+    class Trigger(models.TextChoices):
+        HEADER = "HD", "Nagłówek z tokenem"
+        STAFF = "ST", "Personel"
+        SLOW = "SL", "Wolne żądanie (próbka)"
+
+    # Metadane profilu; same próbki leżą w pliku PROFILES_DIR/file_name
+    created = models.DateTimeField(auto_now_add=True)
+    trigger = models.CharField(max_length=2, choices=Trigger.choices)
+    view_name = models.CharField(max_length=200)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.PositiveIntegerField()
+    sql_ms = models.PositiveIntegerField()
+    sql_count = models.PositiveIntegerField()
+    template_ms = models.PositiveIntegerField()
+    python_ms = models.PositiveIntegerField()
+    samples = models.PositiveIntegerField()
+    file_name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        ordering = ["-created"]
+        indexes = [models.Index(fields=["view_name", "created"])]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms} ms)"
+
+
+class Watermark(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField()
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.value})"
+
+    @classmethod
+    def get(cls, name):
+        return cls.objects.filter(name=name).values_list("value", flat=True).first()
+
+    @classmethod
+    def set(cls, name, value):
+        cls.objects.update_or_create(name=name, defaults={"value": value})
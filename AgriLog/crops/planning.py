@@ -0,0 +1,173 @@
+import calendar
+import datetime
+from collections import defaultdict
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Cultivation, Field, PlannedTreatment, TreatmentSchedule
+
+DEFAULT_HORIZON_DAYS = 365
+# Zabieg zalicza plan, jeśli wykonano go najwyżej tyle dni przed terminem
+# lub w dowolnym momencie po nim
+MATCH_EARLY_DAYS = 14
+
+
+def add_months(date, months):
+    month = date.month - 1 + months
+    year = date.year + month // 12
+    month = month % 12 + 1
+    day = min(date.day, calendar.monthrange(year, month)[1])
+    return datetime.date(year, month, day)
+
+
+def _calendar_dates(schedule, start, end):
+    if not schedule.interval_months:
+        if start <= schedule.start_date <= end:
+            yield schedule.start_date
+        return
+    step = 0
+    date = schedule.start_date
+    while date <= end:
+        if date >= start:
+            yield date
+        step += 1
+        date = add_months(schedule.start_date, step * schedule.interval_months)
+
+
+def _current_crops(field_ids, year):
+    # pole -> lista (roślina, data siewu) upraw bieżącego sezonu
+    crops = defaultdict(list)
+    rows = Cultivation.objects.filter(
+        field_id__in=field_ids, year=year, status=Cultivation.Status.PROGRESS
+    ).values_list("field_id", "crop_type_id", "sowing_date")
+    for field_id, crop_id, sowing_date in rows:
+        crops[field_id].append((crop_id, sowing_date))
+    return crops
+
+
+def occurrences(schedules, start, end):
+    """Wylicza terminy harmonogramów w przedziale [start, end] jako plany.
+
+    Pola wszystkich harmonogramów i ich bieżące uprawy pobierane są
+    zbiorczo, bez zapytań na harmonogram.
+    """
+    schedules = list(schedules.prefetch_related("fields"))
+    owner_ids = {schedule.owner_id for schedule in schedules}
+    owner_fields = defaultdict(list)
+    for pk, owner_id in Field.objects.filter(owner_id__in=owner_ids).values_list(
+        "pk", "owner_id"
+    ):
+        owner_fields[owner_id].append(pk)
+    crops = _current_crops(
+        [pk for pks in owner_fields.values() for pk in pks], start.year
+    )
+
+    plans = []
+    for schedule in schedules:
+        allowed = set(owner_fields[schedule.owner_id])
+        field_ids = [f.pk for f in schedule.fields.all() if f.pk in allowed] or sorted(
+            allowed
+        )
+
+        for field_id in field_ids:
+            if schedule.crop_type_id is None:
+                dates = _calendar_dates(schedule, start, end)
+            else:
+                sowings = [
+                    sowing
+                    for crop_id, sowing in crops[field_id]
+                    if crop_id == schedule.crop_type_id
+                ]
+                if not sowings:
+                    continue
+                if schedule.days_after_sowing is None:
+                    dates = _calendar_dates(schedule, start, end)
+                else:
+                    delta = datetime.timedelta(days=schedule.days_after_sowing)
+                    dates = {
+                        sowing + delta
+                        for sowing in sowings
+                        if sowing and start <= sowing + delta <= end
+                    }
+
+            plans.extend(
+                PlannedTreatment(
+                    owner_id=schedule.owner_id,
+                    field_id=field_id,
+                    schedule=schedule,
+                    treatment_type=schedule.treatment_type,
+                    crop_type_id=schedule.crop_type_id,
+                    due_date=date,
+                )
+                for date in dates
+            )
+    return plans
+
+
+def generate(
+    owner=None, horizon_days=DEFAULT_HORIZON_DAYS, today=None, batch_size=1000
+):
+    """Materializuje nadchodzące terminy aktywnych harmonogramów.
+
+    Powtórne uruchomienie jest bezpieczne: istniejące terminy pomija
+    ograniczenie unikalności (harmonogram, pole, termin).
+    """
+    today = today or timezone.localdate()
+    schedules = TreatmentSchedule.objects.filter(active=True)
+    if owner is not None:
+        schedules = schedules.filter(owner=owner)
+    plans = occurrences(schedules, today, today + datetime.timedelta(days=horizon_days))
+    PlannedTreatment.objects.bulk_create(
+        plans, batch_size=batch_size, ignore_conflicts=True
+    )
+    return len(plans)
+
+
+def due(user, start, end, include_overdue=True):
+    # Jedno przejście po częściowym indeksie (owner, due_date) dla planów otwartych
+    plans = PlannedTreatment.objects.filter(
+        owner=user, status=PlannedTreatment.Status.PLANNED, due_date__lte=end
+    )
+    if not include_overdue:
+        plans = plans.filter(due_date__gte=start)
+    return plans.select_related("field", "crop_type").order_by("due_date")
+
+
+def complete_plans(treatments):
+    """Oznacza jako wykonane plany pasujące do zapisanych zabiegów.
+
+    Wywoływane w transakcji zapisu zabiegu; dla każdego zabiegu zaliczany
+    jest najwcześniejszy otwarty plan tego samego rodzaju na tym polu.
+    """
+    treatments = [t for t in treatments if t.pk and t.field_id]
+    if not treatments:
+        return 0
+
+    latest = max(t.date for t in treatments)
+    query = Q()
+    for treatment in treatments:
+        query |= Q(field_id=treatment.field_id, treatment_type=treatment.treatment_type)
+    candidates = defaultdict(list)
+    plans = PlannedTreatment.objects.filter(
+        query,
+        status=PlannedTreatment.Status.PLANNED,
+        due_date__lte=latest + datetime.timedelta(days=MATCH_EARLY_DAYS),
+    ).order_by("due_date", "pk")
+    for plan in plans:
+        candidates[(plan.field_id, plan.treatment_type)].append(plan)
+
+    completed = []
+    for treatment in sorted(treatments, key=lambda t: t.date):
+        window = treatment.date + datetime.timedelta(days=MATCH_EARLY_DAYS)
+        pending = candidates[(treatment.field_id, treatment.treatment_type)]
+        for plan in pending:
+            if plan.due_date <= window:
+                plan.status = PlannedTreatment.Status.DONE
+                plan.treatment_id = treatment.pk
+                completed.append(plan)
+                pending.remove(plan)
+                break
+
+    PlannedTreatment.objects.bulk_update(completed, ["status", "treatment"])
+    return len(completed)
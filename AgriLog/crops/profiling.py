@@ -0,0 +1,228 @@
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import (
+    async_to_sync,
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.db import connections
+
+from .models import RequestProfile
+
+HEADER = "X-Profile"
+QUERY_PARAM = "_profile"
+# Fragmenty ścieżek plików, po których próbka trafia do kategorii
+SQL_MODULES = (os.sep.join(("django", "db", "backends")), "sqlite3")
+TEMPLATE_MODULES = (os.sep.join(("django", "template")),)
+# Najdłuższy pasujący katalog z sys.path, by "django/..." zamiast site-packages
+_PATH_PREFIXES = sorted(filter(None, sys.path), key=len, reverse=True)
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    path = code.co_filename
+    for prefix in _PATH_PREFIXES:
+        if path.startswith(prefix):
+            path = path[len(prefix) :].lstrip(os.sep)
+            break
+    # Średnik rozdziela ramki w formacie "folded", nie może pojawić się w nazwie
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _category(frame):
+    # Od liści w górę: zapytanie wykonane w szablonie liczymy jako SQL
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if any(part in path for part in SQL_MODULES):
+            return "sql"
+        if any(part in path for part in TEMPLATE_MODULES):
+            return "template"
+        frame = frame.f_back
+    return "python"
+
+
+class Sampler(threading.Thread):
+    """Co ``interval`` sekund zapisuje stos wątku obsługującego żądanie."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.categories = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.categories[_category(frame)] += 1
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def requested_trigger(request):
+    """Zwraca powód profilowania na życzenie albo None.
+
+    Nagłówek z tokenem działa dla każdego klienta, nagłówek lub parametr
+    ``_profile`` bez tokenu tylko dla personelu.
+    """
+    header = request.headers.get(HEADER)
+    token = settings.PROFILER_TOKEN
+    if header and token and header == token:
+        return RequestProfile.Trigger.HEADER
+    if header is None and QUERY_PARAM not in request.GET:
+        return None
+    if request.user.is_staff:
+        return RequestProfile.Trigger.STAFF
+    return None
+
+
+def sampled():
+    # Losowe profilowanie z prawdopodobieństwem PROFILER_SAMPLE_RATE
+    rate = settings.PROFILER_SAMPLE_RATE
+    if rate and random.random() < rate:
+        return RequestProfile.Trigger.SLOW
+    return None
+
+
+def _rotate(directory, keep):
+    stale = RequestProfile.objects.order_by("-created", "-pk")[keep:]
+    stale = list(stale.values_list("pk", "file_name"))
+    for _, file_name in stale:
+        try:
+            os.unlink(os.path.join(directory, file_name))
+        except FileNotFoundError:
+            pass
+    RequestProfile.objects.filter(pk__in=[pk for pk, _ in stale]).delete()
+
+
+def save_profile(request, response, trigger, sampler, queries, duration):
+    directory = str(settings.PROFILES_DIR)
+    os.makedirs(directory, exist_ok=True)
+    match = request.resolver_match
+    view_name = (match.view_name if match else "") or "-"
+    file_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:12]}.folded"
+    # Format "folded" (stos;stos;... liczba) czytają flamegraph.pl i speedscope
+    with open(os.path.join(directory, file_name), "w") as output:
+        for stack, count in sampler.stacks.most_common():
+            output.write(f"{stack} {count}\n")
+
+    samples = sum(sampler.categories.values())
+
+    def share(category):
+        if not samples:
+            return 0
+        return round(duration * 1000 * sampler.categories[category] / samples)
+
+    profile = RequestProfile.objects.create(
+        trigger=trigger,
+        view_name=view_name[:200],
+        method=request.method,
+        path=request.get_full_path()[:255],
+        status_code=response.status_code,
+        duration_ms=round(duration * 1000),
+        sql_ms=round(queries.seconds * 1000),
+        sql_count=queries.count,
+        template_ms=share("template"),
+        python_ms=share("python"),
+        samples=samples,
+        file_name=file_name,
+    )
+    _rotate(directory, settings.PROFILER_KEEP)
+    return profile
+
+
+class ProfilerMiddleware:
+    """Profiler próbkujący dla wybranych żądań.
+
+    Żądanie jest profilowane na życzenie (nagłówek, personel) albo losowo
+    z prawdopodobieństwem PROFILER_SAMPLE_RATE; losowe profile zapisujemy
+    tylko, gdy żądanie trwało co najmniej PROFILER_SLOW_MS. Pozostałe
+    żądania kosztują jedno sprawdzenie nagłówka i jedno losowanie.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        trigger = requested_trigger(request) or sampled()
+        if trigger is None:
+            return self.get_response(request)
+        return self.profile(request, trigger, self.get_response)
+
+    async def __acall__(self, request):
+        # Zwykłe żądania przechodzą bez przełączania wątku. Profilowane
+        # obsługuje osobny wątek: widoki synchroniczne wywołane przez
+        # async_to_sync trafiają do tego samego wątku, którego stos próbkujemy
+        if request.headers.get(HEADER) is None and QUERY_PARAM not in request.GET:
+            trigger = sampled()
+        else:
+            # request.user wymaga zapytania do bazy
+            trigger = await sync_to_async(requested_trigger)(request) or sampled()
+        if trigger is None:
+            return await self.get_response(request)
+        return await sync_to_async(self.profile)(
+            request, trigger, async_to_sync(self.get_response)
+        )
+
+    def profile(self, request, trigger, get_response):
+        sampler = Sampler(threading.get_ident(), settings.PROFILER_INTERVAL_MS / 1000)
+        queries = QueryTimer()
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            with ExitStack() as stack:
+                # Także kopia bazy, jeśli żądanie z niej czyta
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(queries))
+                response = get_response(request)
+        finally:
+            sampler.stop()
+        duration = time.perf_counter() - started
+
+        slow_enough = duration * 1000 >= settings.PROFILER_SLOW_MS
+        if response.streaming or (
+            trigger == RequestProfile.Trigger.SLOW and not slow_enough
+        ):
+            return response
+        save_profile(request, response, trigger, sampler, queries, duration)
+        return response
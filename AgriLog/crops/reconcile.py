@@ -0,0 +1,213 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import audit, events
+from .dashboard import invalidate_dashboard
+from .models import AuditEntry, CropType, Cultivation, Field, Treatment, Watermark
+
+WATERMARK_NAME = "reconcile_cultivations"
+
+_paused = ContextVar("reconcile_paused", default=False)
+
+
+@contextmanager
+def paused():
+    # Wyłącza uzgadnianie z sygnałów, np. przy przenoszeniu sezonów do archiwum
+    token = _paused.set(True)
+    try:
+        yield
+    finally:
+        _paused.reset(token)
+
+
+def is_paused():
+    return _paused.get()
+
+
+@dataclass
+class ReconcileResult:
+    fields: int = 0
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+
+    def __iadd__(self, other):
+        self.fields += other.fields
+        self.created += other.created
+        self.updated += other.updated
+        self.deleted += other.deleted
+        return self
+
+
+def _is_pristine(cultivation):
+    # Uprawa założona z zabiegu siewu i bez danych wpisanych ręcznie (plon,
+    # notatki, zmiana statusu) może zostać usunięta, gdy siew zniknie.
+    # Uprawy dodane ręcznie, przez panel administracyjny lub sprzed
+    # uzgadniania nie mają from_sowing i nigdy nie są usuwane
+    return (
+        cultivation.from_sowing
+        and cultivation.status == Cultivation.Status.PROGRESS
+        and not cultivation.yield_amount
+        and not cultivation.notes
+    )
+
+
+def _desired_state(field_ids):
+    # (pole, roślina, rok) -> data ostatniego siewu; Treatment jest źródłem prawdy
+    desired = {}
+    crop_names = {}
+    sowings = Treatment.objects.filter(
+        field_id__in=field_ids,
+        treatment_type=Treatment.TreatmentType.SOWING,
+        crop_type__isnull=False,
+    ).values_list("field_id", "crop_type_id", "crop_type__name", "date")
+
+    for field_id, crop_type_id, crop_name, date in sowings:
+        key = (field_id, crop_type_id, date.year)
+        if key not in desired or desired[key] < date:
+            desired[key] = date
+        crop_names[crop_type_id] = crop_name
+
+    return desired, crop_names
+
+
+def reconcile_fields(field_ids):
+    """Przelicza uprawy podanych pól na podstawie zabiegów siewu."""
+    field_ids = {pk for pk in field_ids if pk is not None}
+    result = ReconcileResult()
+    if not field_ids:
+        return result
+
+    fields = Field.objects.only("id", "name", "owner_id").in_bulk(field_ids)
+    desired, crop_names = _desired_state(fields.keys())
+
+    existing = defaultdict(list)
+    for cultivation in Cultivation.objects.filter(field_id__in=fields.keys()).order_by(
+        "pk"
+    ):
+        existing[
+            (cultivation.field_id, cultivation.crop_type_id, cultivation.year)
+        ].append(cultivation)
+
+    to_create, to_update, to_delete = [], [], []
+
+    for key, sowing_date in desired.items():
+        field_id, crop_type_id, year = key
+        field = fields[field_id]
+        matches = existing.pop(key, [])
+
+        if not matches:
+            to_create.append(
+                Cultivation(
+                    field=field,
+                    crop_type=CropType(pk=crop_type_id, name=crop_names[crop_type_id]),
+                    owner_id=field.owner_id,
+                    year=year,
+                    sowing_date=sowing_date,
+                    from_sowing=True,
+                )
+            )
+            continue
+
+        cultivation, duplicates = matches[0], matches[1:]
+        if (
+            cultivation.sowing_date != sowing_date
+            or cultivation.owner_id != field.owner_id
+            or cultivation.status == Cultivation.Status.PLANNED
+        ):
+            cultivation.sowing_date = sowing_date
+            cultivation.owner_id = field.owner_id
+            # Zaplanowana uprawa staje się bieżącą po zabiegu siewu
+            if cultivation.status == Cultivation.Status.PLANNED:
+                cultivation.status = Cultivation.Status.PROGRESS
+            to_update.append(cultivation)
+        to_delete.extend(c for c in duplicates if _is_pristine(c))
+
+    # Plan z przejścia sezonu ustępuje innej roślinie wysianej w tym roku
+    sown = {(field_id, year) for field_id, _, year in desired}
+    for orphans in existing.values():
+        to_delete.extend(
+            c
+            for c in orphans
+            if _is_pristine(c)
+            or (c.status == Cultivation.Status.PLANNED and (c.field_id, c.year) in sown)
+        )
+
+    now = timezone.now()
+    for cultivation in to_update:
+        cultivation.updated = now
+
+    with transaction.atomic():
+        if to_delete:
+            Cultivation.objects.filter(pk__in=[c.pk for c in to_delete]).delete()
+        if to_update:
+            Cultivation.objects.bulk_update(
+                to_update, ["sowing_date", "owner", "status", "updated"]
+            )
+        if to_create:
+            Cultivation.objects.bulk_create(Cultivation.assign_slugs(to_create))
+        # Usunięcia zapisuje sygnał post_delete; zapisy zbiorcze trzeba dopisać
+        for cultivation in to_update:
+            audit.record(cultivation, AuditEntry.Action.UPDATE, cultivation.owner_id)
+        for cultivation in to_create:
+            audit.record(cultivation, AuditEntry.Action.CREATE, cultivation.owner_id)
+
+    if to_create or to_update or to_delete:
+        invalidate_dashboard(*{field.owner_id for field in fields.values()})
+        # Zapisy zbiorcze omijają sygnały, więc strony pól powiadamiamy tutaj
+        events.field_changed(
+            {c.field_id for c in to_create + to_update + to_delete},
+            "cultivation",
+            "reconciled",
+        )
+
+    result.fields = len(fields)
+    result.created = len(to_create)
+    result.updated = len(to_update)
+    result.deleted = len(to_delete)
+    return result
+
+
+def changed_field_ids(since=None, owner=None, field=None):
+    fields = Field.objects.all()
+    if owner is not None:
+        fields = fields.filter(owner=owner)
+    if field is not None:
+        fields = fields.filter(pk=getattr(field, "pk", field))
+    if since is not None:
+        fields = fields.filter(treatments__updated__gt=since)
+    return fields.order_by("pk").values_list("pk", flat=True).distinct()
+
+
+def reconcile(since=None, owner=None, field=None, batch_size=500):
+    """Uzgadnia uprawy pól, których zabiegi zmieniły się po ``since``.
+
+    Pola przetwarzane są paczkami po ``batch_size``, więc zużycie pamięci
+    nie zależy od wielkości bazy, a każda paczka to osobna transakcja.
+    """
+    result = ReconcileResult()
+    last_pk = 0
+
+    while True:
+        batch = list(
+            changed_field_ids(since, owner, field).filter(pk__gt=last_pk)[:batch_size]
+        )
+        if not batch:
+            break
+        result += reconcile_fields(batch)
+        last_pk = batch[-1]
+
+    return result
+
+
+def reconcile_from_watermark(batch_size=500, full=False):
+    started = timezone.now()
+    since = None if full else Watermark.get(WATERMARK_NAME)
+    result = reconcile(since=since, batch_size=batch_size)
+    Watermark.set(WATERMARK_NAME, started)
+    return result
@@ -0,0 +1,56 @@
+import threading
+import uuid
+
+from django.core.cache import cache
+
+from .models import CropType
+
+# Słownik roślin zmienia się rzadko, więc każdy proces trzyma własną kopię.
+# We współdzielonym cache (settings.CACHES, wspólny dla procesów) leży tylko
+# znacznik wersji: zapis CropType go zmienia, a procesy przy następnym
+# odczycie wczytują słownik od nowa.
+VERSION_KEY = "refdata:croptype:version"
+
+_lock = threading.Lock()
+_snapshot = {"version": None, "items": (), "by_pk": {}}
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _load(version):
+    items = tuple(CropType.objects.order_by("name"))
+    with _lock:
+        _snapshot.update(
+            version=version, items=items, by_pk={crop.pk: crop for crop in items}
+        )
+    return _snapshot
+
+
+def _get_snapshot():
+    version = _current_version()
+    snapshot = _snapshot
+    if snapshot["version"] != version:
+        snapshot = _load(version)
+    return snapshot
+
+
+def crop_types():
+    return _get_snapshot()["items"]
+
+
+def crop_type(pk):
+    return _get_snapshot()["by_pk"].get(pk)
+
+
+def crop_type_choices():
+    return [(crop.pk, crop.name) for crop in crop_types()]
+
+
+def invalidate():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
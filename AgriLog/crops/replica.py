@@ -0,0 +1,146 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+REPLICA = "replica"
+PIN_COOKIE = "replica_pin"
+# Tylko dane aplikacji; sesje i użytkownicy zawsze z bazy głównej, bo świeżo
+# zalogowanego użytkownika może jeszcze nie być w kopii
+REPLICA_APPS = {"crops"}
+
+_reading = ContextVar("replica_reading", default=False)
+
+
+def is_configured():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def reading():
+    token = _reading.set(True)
+    try:
+        yield
+    finally:
+        _reading.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _reading.get() and model._meta.app_label in REPLICA_APPS:
+            return REPLICA
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Kopia powstaje przez backup bazy głównej, nie przez migracje
+        return db != REPLICA
+
+
+def _path(alias):
+    return str(connections[alias].settings_dict["NAME"])
+
+
+def refreshed_at():
+    # Czas rozpoczęcia ostatniej kopii, zapisany jako mtime pliku
+    try:
+        return os.path.getmtime(_path(REPLICA))
+    except OSError:
+        return None
+
+
+def refresh(pages=-1):
+    """Kopiuje bazę główną do pliku kopii przez SQLite backup API.
+
+    Kopia powstaje w pliku tymczasowym i podmienia plik kopii atomowo,
+    więc czytający nigdy nie widzą kopii w połowie.
+    """
+    target = _path(REPLICA)
+    temporary = f"{target}.tmp"
+    started = time.time()
+
+    source = sqlite3.connect(_path("default"))
+    destination = sqlite3.connect(temporary)
+    try:
+        source.backup(destination, pages=pages)
+    finally:
+        destination.close()
+        source.close()
+
+    os.utime(temporary, (started, started))
+    os.replace(temporary, target)
+    # Otwarte połączenie wskazuje na stary plik; pozostałe wątki zamykają
+    # swoje połączenia na końcu żądania (CONN_MAX_AGE = 0)
+    connections[REPLICA].close()
+    return started
+
+
+def can_read(request):
+    if not is_configured():
+        return False
+    replica_time = refreshed_at()
+    if replica_time is None:
+        return False
+    if time.time() - replica_time > settings.REPLICA_MAX_LAG_SECONDS:
+        return False
+    # Read-your-writes: po zapisie czytamy z bazy głównej, dopóki kopia
+    # nie zostanie odświeżona po tym zapisie
+    try:
+        pinned = float(request.COOKIES.get(PIN_COOKIE, 0))
+    except ValueError:
+        pinned = time.time()
+    return replica_time >= pinned
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.process_request(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        # Sprawdzenie kopii to tylko stat() pliku, bez bazy danych
+        self.process_request(request)
+        return self.process_response(request, await self.get_response(request))
+
+    def process_request(self, request):
+        request.use_replica = request.method in ("GET", "HEAD") and can_read(request)
+
+    def process_response(self, request, response):
+        if is_configured() and request.method not in ("GET", "HEAD", "OPTIONS"):
+            response.set_cookie(
+                PIN_COOKIE,
+                f"{time.time():.3f}",
+                max_age=settings.REPLICA_MAX_LAG_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+@contextmanager
+def reading_for(request):
+    if getattr(request, "use_replica", False):
+        with reading():
+            yield
+    else:
+        yield
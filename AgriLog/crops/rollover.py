@@ -0,0 +1,135 @@
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import F
+
+from . import audit, events, refdata
+from .dashboard import invalidate_dashboard
+from .models import AuditEntry, Cultivation, Field
+
+BATCH_SIZE = 500
+
+
+@dataclass
+class Proposal:
+    field_id: int
+    field_name: str
+    area_size: object
+    source_crop_id: int | None
+    crop_id: int | None
+    planned: bool = False
+
+    @property
+    def source_crop(self):
+        return refdata.crop_type(self.source_crop_id)
+
+    @property
+    def crop(self):
+        return refdata.crop_type(self.crop_id)
+
+    @property
+    def ready(self):
+        return self.crop_id is not None and not self.planned
+
+
+def next_crop(sequence, crop_id):
+    """Roślina następna po ``crop_id`` w płodozmianie; spoza niego - pierwsza."""
+    if not sequence:
+        return crop_id
+    if crop_id in sequence:
+        return sequence[(sequence.index(crop_id) + 1) % len(sequence)]
+    return sequence[0]
+
+
+def source_years(user):
+    return list(
+        Cultivation.objects.for_owner(user)
+        .order_by("-year")
+        .values_list("year", flat=True)
+        .distinct()
+    )
+
+
+def _source_crops(user, year):
+    # pole -> roślina roku źródłowego; przy kilku uprawach ostatnio wysiana
+    rows = (
+        Cultivation.objects.for_owner(user)
+        .filter(year=year, crop_type__isnull=False)
+        .order_by("field_id", F("sowing_date").asc(nulls_first=True), "pk")
+        .values_list("field_id", "crop_type_id")
+    )
+    return dict(rows)
+
+
+def propose(user, source_year, rotation=None):
+    """Proponowana roślina na rok ``source_year + 1`` dla każdego pola.
+
+    Trzy zapytania niezależnie od liczby pól; pola z uprawą w roku
+    docelowym są oznaczone i pomijane przy zatwierdzaniu.
+    """
+    sequence = rotation.crop_ids() if rotation is not None else None
+    source = _source_crops(user, source_year)
+    planned = set(
+        Cultivation.objects.for_owner(user)
+        .filter(year=source_year + 1)
+        .values_list("field_id", flat=True)
+    )
+    fields = (
+        Field.objects.for_owner(user)
+        .order_by("name", "pk")
+        .values_list("pk", "name", "area_size")
+    )
+    return [
+        Proposal(
+            field_id=pk,
+            field_name=name,
+            area_size=area_size,
+            source_crop_id=source.get(pk),
+            crop_id=next_crop(sequence, source.get(pk)),
+            planned=pk in planned,
+        )
+        for pk, name, area_size in fields
+    ]
+
+
+def commit(user, year, proposals, batch_size=BATCH_SIZE):
+    """Zapisuje gotowe propozycje jako zaplanowane uprawy roku ``year``.
+
+    Zamiast save() dla każdej uprawy: slugi nadaje jedno zapytanie
+    Cultivation.assign_slugs, a wiersze trafiają do bazy przez bulk_create.
+    """
+    with transaction.atomic():
+        # Pola, które dostały uprawę od czasu wyliczenia propozycji, pomijamy
+        taken = set(
+            Cultivation.objects.for_owner(user)
+            .filter(year=year)
+            .values_list("field_id", flat=True)
+        )
+        cultivations = Cultivation.assign_slugs(
+            Cultivation(
+                field=Field(pk=p.field_id, name=p.field_name, owner=user),
+                crop_type=p.crop,
+                owner=user,
+                year=year,
+                status=Cultivation.Status.PLANNED,
+            )
+            for p in proposals
+            if p.ready and p.field_id not in taken
+        )
+        Cultivation.objects.bulk_create(cultivations, batch_size=batch_size)
+        for cultivation in cultivations:
+            audit.record(cultivation, AuditEntry.Action.CREATE, user.pk)
+
+    if cultivations:
+        invalidate_dashboard(user.pk)
+        events.field_changed(
+            {c.field_id for c in cultivations}, "cultivation", "created"
+        )
+    return cultivations
+
+
+def apply(user, source_year, rotation=None, batch_size=BATCH_SIZE):
+    """Zakłada zaplanowane uprawy na nowy sezon w jednej transakcji."""
+    return commit(
+        user, source_year + 1, propose(user, source_year, rotation), batch_size
+    )
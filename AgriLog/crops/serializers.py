@@ -0,0 +1,37 @@
+from rest_framework import serializers
+
+from .models import Cultivation, Field, Treatment
+
+
+class OfflineTreatmentSerializer(serializers.Serializer):
+    key = serializers.UUIDField()
+    field = serializers.IntegerField()
+    treatment_type = serializers.ChoiceField(choices=Treatment.TreatmentType.choices)
+    date = serializers.DateField()
+    crop_type = serializers.IntegerField(required=False, allow_null=True)
+    description = serializers.CharField(required=False, allow_blank=True, default="")
+
+
+class SyncUploadSerializer(serializers.Serializer):
+    treatments = OfflineTreatmentSerializer(many=True, max_length=1000)
+
+
+class FieldBundleQuerySerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1, max_length=200
+    )
+    treatments = serializers.IntegerField(min_value=0, max_value=100, default=10)
+    # ETagi paczek, które klient już ma: {id pola: etag}
+    known = serializers.DictField(child=serializers.CharField(), required=False)
+
+
+class FieldPatchSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Field
+        fields = ["notes"]
+
+
+class CultivationPatchSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Cultivation
+        fields = ["notes", "status", "yield_amount", "sowing_date"]
@@ -0,0 +1,194 @@
+import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import audit, events
+from .dashboard import invalidate_dashboard
+from .last_treatments import refresh_last_treatments
+from .models import AuditEntry, CropType, Cultivation, Field, Tombstone, Treatment
+from .planning import complete_plans
+from .reconcile import reconcile_fields
+
+# Zapisy zatwierdzane tuż przed wydaniem tokenu mogą mieć wcześniejszy
+# znacznik "updated", więc każda paczka nakłada się na poprzednią o kilka
+# sekund. Tablet traktuje wiersze jako upsert, więc powtórki są nieszkodliwe.
+SYNC_OVERLAP = datetime.timedelta(seconds=5)
+
+SYNC_TABLES = {
+    "crop_types": (CropType, ["id", "name"]),
+    "fields": (Field, ["id", "name", "area_size", "soil_class", "notes"]),
+    "cultivations": (
+        Cultivation,
+        [
+            "id",
+            "field_id",
+            "crop_type_id",
+            "status",
+            "year",
+            "sowing_date",
+            "yield_amount",
+            "notes",
+        ],
+    ),
+    "treatments": (
+        Treatment,
+        ["id", "field_id", "treatment_type", "date", "crop_type_id", "description"],
+    ),
+}
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def encode_token(moment):
+    return moment.isoformat()
+
+
+def decode_token(token):
+    if not token:
+        return None
+    moment = parse_datetime(token)
+    if moment is None or timezone.is_naive(moment):
+        raise InvalidToken(token)
+    return moment
+
+
+def _scoped(model, user):
+    if model is CropType:
+        return CropType.objects.all()
+    return model.objects.for_owner(user)
+
+
+def _tombstone_horizon():
+    return timezone.now() - datetime.timedelta(
+        days=settings.SYNC_TOMBSTONE_RETENTION_DAYS
+    )
+
+
+def changes_since(user, since=None):
+    """Zwraca zmienione wiersze i tombstony od ``since`` w zwartej postaci.
+
+    Każda tabela to lista kolumn i lista wierszy-tablic; przy braku tokenu
+    (lub tokenie starszym niż przechowywane tombstony) wysyłany jest pełny
+    stan z flagą ``reset``.
+    """
+    started = timezone.now()
+    reset = since is None or since < _tombstone_horizon()
+    payload = {"token": encode_token(started), "reset": reset, "changes": {}}
+
+    for name, (model, columns) in SYNC_TABLES.items():
+        queryset = _scoped(model, user).order_by()
+        if not reset:
+            queryset = queryset.filter(updated__gte=since - SYNC_OVERLAP)
+        payload["changes"][name] = {
+            "columns": columns,
+            "rows": [list(row) for row in queryset.values_list(*columns)],
+        }
+
+    deleted = {name: [] for name in SYNC_TABLES}
+    if not reset:
+        models_by_name = {
+            model._meta.model_name: name for name, (model, _) in SYNC_TABLES.items()
+        }
+        tombstones = Tombstone.objects.filter(
+            Q(owner=user) | Q(model=CropType._meta.model_name, owner__isnull=True),
+            deleted__gte=since - SYNC_OVERLAP,
+        ).values_list("model", "object_id")
+        for model_name, object_id in tombstones:
+            if model_name in models_by_name:
+                deleted[models_by_name[model_name]].append(object_id)
+    payload["deleted"] = deleted
+
+    return payload
+
+
+def apply_offline_treatments(user, entries):
+    """Zapisuje zabiegi utworzone offline w jednej transakcji.
+
+    ``entries`` to zwalidowane słowniki z kluczem idempotencji ``key``;
+    klucze już zapisane są pomijane, więc ponowne wysłanie paczki po
+    zerwanym połączeniu nie tworzy duplikatów.
+    """
+    keys = [entry["key"] for entry in entries]
+    field_ids = {entry["field"] for entry in entries}
+    owned = set(
+        Field.objects.for_owner(user)
+        .filter(pk__in=field_ids)
+        .values_list("pk", flat=True)
+    )
+    missing = field_ids - owned
+    if missing:
+        raise ValidationError(
+            {"field": f"Brak dostępu do pól: {', '.join(map(str, sorted(missing)))}"}
+        )
+
+    crop_ids = {entry["crop_type"] for entry in entries if entry.get("crop_type")}
+    crop_types = CropType.objects.in_bulk(crop_ids)
+    missing = crop_ids - crop_types.keys()
+    if missing:
+        raise ValidationError(
+            {"crop_type": f"Nieznane rośliny: {', '.join(map(str, sorted(missing)))}"}
+        )
+
+    with transaction.atomic():
+        # Klucz jest unikalny w całej tabeli, ale pomijamy tylko zabiegi tego
+        # użytkownika; cudzego zabiegu (ani jego id) nie zwracamy
+        existing, taken = {}, []
+        rows = Treatment.objects.filter(client_key__in=keys).values_list(
+            "client_key", "pk", "field__owner_id"
+        )
+        for key, pk, owner_id in rows:
+            if owner_id == user.pk:
+                existing[key] = pk
+            else:
+                taken.append(str(key))
+        if taken:
+            raise ValidationError(
+                {"key": f"Klucze użyte przez innego użytkownika: {', '.join(taken)}"}
+            )
+        to_create = []
+        for entry in entries:
+            if entry["key"] in existing:
+                continue
+            treatment = Treatment(
+                client_key=entry["key"],
+                field_id=entry["field"],
+                treatment_type=entry["treatment_type"],
+                date=entry["date"],
+                crop_type=crop_types.get(entry.get("crop_type")),
+                description=entry.get("description", ""),
+            )
+            # Klucze obce sprawdzone wyżej zbiorczo, bez zapytania na wiersz
+            treatment.clean_fields(exclude=["field", "crop_type"])
+            treatment.clean()
+            to_create.append(treatment)
+            # Ten sam klucz dwa razy w jednej paczce zapisujemy tylko raz
+            existing[entry["key"]] = None
+
+        created = Treatment.objects.bulk_create(to_create)
+        # bulk_create omija sygnały, więc wpisy dziennika zmian dodajemy sami
+        for treatment in created:
+            audit.record(treatment, AuditEntry.Action.CREATE, user.pk)
+        sown = {
+            t.field_id
+            for t in created
+            if t.treatment_type == Treatment.TreatmentType.SOWING
+        }
+        if sown:
+            reconcile_fields(sown)
+        complete_plans(created)
+        refresh_last_treatments((t.field_id, t.treatment_type) for t in created)
+        events.field_changed({t.field_id for t in created}, "treatment", "created")
+
+    if created:
+        invalidate_dashboard(user.pk)
+
+    for treatment in created:
+        existing[treatment.client_key] = treatment.pk
+    return {str(key): existing[key] for key in keys}
@@ -1,3 +1,2549 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import uuid
+from collections import Counter
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.admin import site
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import (
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import numpy as np
+from PIL import Image
+
+from . import (
+    allocation,
+    audit,
+    backups,
+    bulk_edit,
+    events,
+    forecast,
+    inputs,
+    last_treatments,
+    planning,
+    reconcile,
+    refdata,
+    replica,
+    rollover,
+    timeseries,
+)
+from .archive import archive_seasons, cultivations_for
+from .dashboard import compute_dashboard, get_dashboard
+from .admin import EstimatedCountPaginator, mark_completed
+from .attachments import (
+    AttachmentError,
+    attach,
+    blob_path,
+    render_pending,
+    storage_root,
+)
+from .audit import AuditMiddleware
+from .models import (
+    ArchivedCultivation,
+    ArchivedTreatment,
+    AuditEntry,
+    Blob,
+    CropType,
+    Cultivation,
+    Field,
+    InputRollup,
+    LastTreatment,
+    PlannedTreatment,
+    RequestProfile,
+    RotationStep,
+    RotationTemplate,
+    SensorChunk,
+    Treatment,
+    TreatmentInput,
+    TreatmentSchedule,
+    YieldForecast,
+)
+from .planning import add_months, generate
+from .profiling import ProfilerMiddleware
+from .replica import ReplicaMiddleware
+from .sync import apply_offline_treatments
+
+# Dwa rozmiary gospodarstwa; liczba zapytań musi być identyczna dla obu
+SMALL = 2
+LARGE = 12
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix="agrilog-tests-")
+
+
+def _normalize(sql):
+    # Parametry zastępujemy "?", by zapytania różniące się tylko id się zliczały
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r'"s\d+_x\d+"', "?", sql)
+    sql = re.sub(r"\b\d+(\.\d+)?\b", "?", sql)
+    return re.sub(r"\(\?(, \?)*\)", "(...)", sql)
+
+
+def describe_queries(queries):
+    counts = Counter(_normalize(query["sql"]) for query in queries)
+    duplicated = [
+        f"  {count}x {sql}" for sql, count in counts.most_common() if count > 1
+    ]
+    return "\n".join(duplicated) or "  (brak powtórzonych zapytań)"
+
+
+class QueryCountMixin:
+    def capture(self, func):
+        # Zimny cache: pulpit i słownik roślin liczone od nowa przy każdym pomiarze
+        cache.clear()
+        # Wpisy audytu zapisywane są po zatwierdzeniu transakcji, też je liczymy
+        with CaptureQueriesContext(connection) as context:
+            with self.captureOnCommitCallbacks(execute=True):
+                func()
+        return context.captured_queries
+
+    def assertQueryBudget(self, budget, small, large):
+        """Sprawdza, że oba rozmiary danych dają tyle samo zapytań, nie więcej
+        niż ``budget``; w komunikacie błędu wypisuje powtórzone zapytania."""
+        small_queries = self.capture(small)
+        large_queries = self.capture(large)
+
+        if len(small_queries) != len(large_queries):
+            extra = Counter(_normalize(q["sql"]) for q in large_queries)
+            extra.subtract(_normalize(q["sql"]) for q in small_queries)
+            grown = "\n".join(
+                f"  {count:+}x {sql}" for sql, count in extra.items() if count
+            )
+            self.fail(
+                f"Liczba zapytań zależy od rozmiaru danych: {len(small_queries)} "
+                f"({SMALL} pól) vs {len(large_queries)} ({LARGE} pól)\n"
+                f"Dodatkowe zapytania:\n{grown}\n"
+                f"Powtórzone zapytania:\n{describe_queries(large_queries)}"
+            )
+        if len(large_queries) > budget:
+            self.fail(
+                f"{len(large_queries)} zapytań, budżet {budget}\n"
+                f"Powtórzone zapytania:\n{describe_queries(large_queries)}"
+            )
+
+
+def _image(name="photo.jpg"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (30, 140, 60)).save(buffer, "JPEG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+def seed_farm(user, size, crops, year):
+    """Gospodarstwo z ``size`` polami; każde ma tyle samo danych."""
+    farm = {"fields": [], "cultivations": [], "treatments": []}
+    for index in range(size):
+        field = Field.objects.create(
+            name=f"Pole {index}", area_size=10 + index, owner=user
+        )
+        for offset, crop in enumerate(crops):
+            sowing = Treatment.objects.create(
+                field=field,
+                treatment_type=Treatment.TreatmentType.SOWING,
+                date=datetime.date(year - offset, 4, 1),
+                crop_type=crop,
+            )
+            farm["treatments"].append(sowing)
+        fertilizing = Treatment.objects.create(
+            field=field,
+            treatment_type=Treatment.TreatmentType.FERTILIZING,
+            date=datetime.date(year, 5, 1),
+            description="Saletra",
+        )
+        TreatmentInput.objects.create(
+            treatment=fertilizing,
+            product="Saletra",
+            kind=TreatmentInput.Kind.NUTRIENT,
+            component="N",
+            dose_per_ha=34,
+        )
+        farm["treatments"].append(fertilizing)
+        attach(user, field, [_image(f"pole-{index}.jpg")], treatment=fertilizing)
+        farm["fields"].append(field)
+
+    farm["cultivations"] = list(Cultivation.objects.filter(owner=user))
+    TreatmentSchedule.objects.create(
+        owner=user,
+        name="Wapnowanie",
+        treatment_type=Treatment.TreatmentType.LIMING,
+        start_date=datetime.date.today() + datetime.timedelta(days=2),
+        interval_months=48,
+    )
+    generate(owner=user)
+    farm["plan"] = PlannedTreatment.objects.filter(owner=user).first()
+    farm["attachment"] = field.attachments.first()
+    return farm
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, ATTACHMENT_WORKERS=0)
+class QueryBudgetTestCase(QueryCountMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.year = datetime.date.today().year
+        cls.crops = [
+            CropType.objects.create(name=name)
+            for name in ("Pszenica", "Rzepak", "Kukurydza")
+        ]
+        cls.users = {}
+        cls.farms = {}
+        for label, size in (("small", SMALL), ("large", LARGE)):
+            user = User.objects.create_user(f"{label}@example.com", password="x")
+            cls.users[label] = user
+            cls.farms[label] = seed_farm(user, size, cls.crops, cls.year)
+        render_pending()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def assertViewBudget(self, budget, request):
+        """``request(client, farm)`` wykonuje żądanie dla danego gospodarstwa."""
+
+        def run(label):
+            # Logowanie poza pomiarem
+            client = Client()
+            client.force_login(self.users[label])
+
+            def call():
+                response = request(client, self.farms[label])
+                self.assertLess(response.status_code, 400, response)
+
+            return call
+
+        self.assertQueryBudget(budget, run("small"), run("large"))
+
+
+class CropsPageQueriesTest(QueryBudgetTestCase):
+    def test_dashboard(self):
+        self.assertViewBudget(4, lambda c, farm: c.get(reverse("dashboard")))
+
+    def test_fields(self):
+        self.assertViewBudget(5, lambda c, farm: c.get(reverse("fields")))
+
+    def test_fields_by_last_treatment(self):
+        self.assertViewBudget(
+            5,
+            lambda c, farm: c.get(
+                reverse("fields"),
+                {"treatment_type": "LM", "order": "last", "not_since_years": 4},
+            ),
+        )
+
+    def test_field_detail(self):
+        self.assertViewBudget(
+            8,
+            lambda c, farm: c.get(reverse("field_detail", args=[farm["fields"][0].pk])),
+        )
+
+    def test_field_fragment_treatments(self):
+        self.assertViewBudget(
+            4,
+            lambda c, farm: c.get(
+                reverse("field_fragment", args=[farm["fields"][0].pk, "treatments"])
+            ),
+        )
+
+    def test_field_fragment_cultivations(self):
+        self.assertViewBudget(
+            4,
+            lambda c, farm: c.get(
+                reverse("field_fragment", args=[farm["fields"][0].pk, "cultivations"])
+            ),
+        )
+
+    def test_cultivations(self):
+        self.assertViewBudget(5, lambda c, farm: c.get(reverse("cultivations")))
+
+    def test_cultivations_edit(self):
+        self.assertViewBudget(
+            5, lambda c, farm: c.get(reverse("cultivations"), {"edit": "1"})
+        )
+
+    def test_cultivations_with_archive(self):
+        self.assertViewBudget(
+            6, lambda c, farm: c.get(reverse("cultivations"), {"archive": "1"})
+        )
+
+    def test_cultivation_detail(self):
+        self.assertViewBudget(
+            3,
+            lambda c, farm: c.get(
+                reverse("cultivation_detail", args=[farm["cultivations"][0].pk])
+            ),
+        )
+
+    def test_season_rollover_preview(self):
+        self.assertViewBudget(
+            8,
+            lambda c, farm: c.get(
+                reverse("season_rollover"), {"source_year": self.year}
+            ),
+        )
+
+    def test_season_rollover_optimized_preview(self):
+        self.assertViewBudget(
+            8,
+            lambda c, farm: c.get(
+                reverse("season_rollover"),
+                {"source_year": self.year, "optimize": "on"},
+            ),
+        )
+
+    def test_plans(self):
+        self.assertViewBudget(3, lambda c, farm: c.get(reverse("plans")))
+
+    def test_input_report(self):
+        self.assertViewBudget(
+            4, lambda c, farm: c.get(reverse("input_report"), {"year": self.year})
+        )
+
+    def test_audit_history(self):
+        self.assertViewBudget(
+            4,
+            lambda c, farm: c.get(
+                reverse("audit_history", args=["field", farm["fields"][0].pk])
+            ),
+        )
+
+    def test_attachment_file(self):
+        self.assertViewBudget(
+            3,
+            lambda c, farm: c.get(
+                reverse("attachment_file", args=[farm["attachment"].pk, "thumb"])
+            ),
+        )
+
+
+class CropsApiQueriesTest(QueryBudgetTestCase):
+    def test_sync_download(self):
+        self.assertViewBudget(6, lambda c, farm: c.get(reverse("sync")))
+
+    def test_field_bundle(self):
+        def request(client, farm):
+            ids = ",".join(str(field.pk) for field in farm["fields"])
+            return client.get(reverse("field_bundle"), {"ids": ids})
+
+        self.assertViewBudget(5, request)
+
+    def test_sync_upload(self):
+        def request(client, farm):
+            entries = [
+                {
+                    "key": str(uuid.uuid4()),
+                    "field": field.pk,
+                    "treatment_type": Treatment.TreatmentType.FERTILIZING,
+                    "date": str(datetime.date(self.year, 6, 1)),
+                }
+                for field in farm["fields"][:SMALL]
+            ]
+            return client.post(
+                reverse("sync"),
+                json.dumps({"treatments": entries}),
+                content_type="application/json",
+            )
+
+        self.assertViewBudget(14, request)
+
+    def test_patch_field(self):
+        self.assertViewBudget(
+            4,
+            lambda c, farm: c.patch(
+                reverse("patch_field", args=[farm["fields"][0].pk]),
+                json.dumps({"notes": "pH 6,2"}),
+                content_type="application/json",
+            ),
+        )
+
+    def test_patch_cultivation(self):
+        self.assertViewBudget(
+            4,
+            lambda c, farm: c.patch(
+                reverse("patch_cultivation", args=[farm["cultivations"][0].pk]),
+                json.dumps({"status": "CP", "yield_amount": "5000"}),
+                content_type="application/json",
+            ),
+        )
+
+
+class CropsFormQueriesTest(QueryBudgetTestCase):
+    def test_update_field(self):
+        self.assertViewBudget(
+            6,
+            lambda c, farm: c.post(
+                reverse("update_field", args=[farm["fields"][0].pk]),
+                {"name": "Nowa nazwa", "area_size": "15.5", "soil_class": "III"},
+            ),
+        )
+
+    def test_field_notes(self):
+        self.assertViewBudget(
+            4,
+            lambda c, farm: c.post(
+                reverse("field_detail", args=[farm["fields"][0].pk]),
+                {"notes": "Wapnowanie jesienią"},
+            ),
+        )
+
+    def test_update_cultivation(self):
+        self.assertViewBudget(
+            4,
+            lambda c, farm: c.post(
+                reverse("update_cultivation", args=[farm["cultivations"][0].pk]),
+                {"status": "CP", "sowing_date": "2024-04-01", "yield_amount": "100"},
+            ),
+        )
+
+    def test_cultivations_bulk_edit(self):
+        def request(client, farm):
+            rows = {
+                "form-TOTAL_FORMS": len(farm["cultivations"]),
+                "form-INITIAL_FORMS": len(farm["cultivations"]),
+            }
+            for index, cultivation in enumerate(farm["cultivations"]):
+                rows[f"form-{index}-id"] = cultivation.pk
+                rows[f"form-{index}-status"] = "CP"
+                rows[f"form-{index}-sowing_date"] = cultivation.sowing_date
+                rows[f"form-{index}-yield_amount"] = "4200.50"
+            return client.post(reverse("cultivations") + "?edit=1", rows)
+
+        self.assertViewBudget(6, request)
+
+    def test_add_treatment_with_inputs(self):
+        def request(client, farm):
+            return client.post(
+                reverse("add_treatment", args=[farm["fields"][0].pk]),
+                {
+                    "treatment_type": Treatment.TreatmentType.FERTILIZING,
+                    "date": str(datetime.date(self.year, 6, 1)),
+                    "description": "",
+                    "inputs-TOTAL_FORMS": "2",
+                    "inputs-INITIAL_FORMS": "0",
+                    "inputs-0-product": "Mocznik",
+                    "inputs-0-kind": TreatmentInput.Kind.NUTRIENT,
+                    "inputs-0-component": "N",
+                    "inputs-0-dose_per_ha": "46",
+                    "inputs-0-unit": TreatmentInput.Unit.KG,
+                    "inputs-1-product": "Polifoska",
+                    "inputs-1-kind": TreatmentInput.Kind.NUTRIENT,
+                    "inputs-1-component": "K2O",
+                    "inputs-1-dose_per_ha": "60",
+                    "inputs-1-unit": TreatmentInput.Unit.KG,
+                },
+            )
+
+        self.assertViewBudget(17, request)
+
+    def test_add_sowing_treatment(self):
+        def request(client, farm):
+            return client.post(
+                reverse("add_treatment", args=[farm["fields"][0].pk]),
+                {
+                    "treatment_type": Treatment.TreatmentType.SOWING,
+                    "date": str(datetime.date(self.year, 9, 10)),
+                    "crop_type": self.crops[1].pk,
+                    "inputs-TOTAL_FORMS": "0",
+                    "inputs-INITIAL_FORMS": "0",
+                },
+            )
+
+        self.assertViewBudget(21, request)
+
+    def test_season_rollover(self):
+        self.assertViewBudget(
+            12,
+            lambda c, farm: c.post(
+                reverse("season_rollover"), {"source_year": self.year}
+            ),
+        )
+
+    def test_season_rollover_optimized(self):
+        self.assertViewBudget(
+            9,
+            lambda c, farm: c.post(
+                reverse("season_rollover"),
+                {"source_year": self.year, "optimize": "on"},
+            ),
+        )
+
+    def test_add_rotation(self):
+        self.assertViewBudget(
+            6,
+            lambda c, farm: c.post(
+                reverse("add_rotation"),
+                {"name": "Czteroletni", "sequence": "Rzepak, Pszenica, Kukurydza"},
+            ),
+        )
+
+    def test_skip_plan(self):
+        self.assertViewBudget(
+            3,
+            lambda c, farm: c.post(reverse("skip_plan", args=[farm["plan"].pk])),
+        )
+
+    def test_add_attachments(self):
+        self.assertViewBudget(
+            6,
+            lambda c, farm: c.post(
+                reverse("add_attachments", args=[farm["fields"][0].pk]),
+                {"photos": [_image("a.jpg"), _image("b.jpg")], "caption": "Mszyca"},
+            ),
+        )
+
+
+class ModelWriteQueriesTest(QueryBudgetTestCase):
+    def test_cultivation_save(self):
+        def save(label):
+            def call():
+                cultivation = Cultivation.objects.get(
+                    pk=self.farms[label]["cultivations"][0].pk
+                )
+                cultivation.notes = "Dobre wschody"
+                cultivation.save()
+
+            return call
+
+        self.assertQueryBudget(3, save("small"), save("large"))
+
+    def test_cultivation_save_new_slug(self):
+        def save(label):
+            def call():
+                cultivation = Cultivation.objects.get(
+                    pk=self.farms[label]["cultivations"][0].pk
+                )
+                cultivation.year -= 10
+                cultivation.save()
+
+            return call
+
+        self.assertQueryBudget(5, save("small"), save("large"))
+
+    def test_treatment_save_sowing(self):
+        def save(label):
+            def call():
+                Treatment.objects.create(
+                    field=self.farms[label]["fields"][0],
+                    treatment_type=Treatment.TreatmentType.SOWING,
+                    date=datetime.date(self.year, 9, 15),
+                    crop_type=self.crops[2],
+                )
+
+            return call
+
+        self.assertQueryBudget(16, save("small"), save("large"))
+
+    def test_treatment_update(self):
+        def save(label):
+            def call():
+                treatment = Treatment.objects.get(
+                    pk=self.farms[label]["treatments"][0].pk
+                )
+                treatment.date = treatment.date.replace(year=self.year - 5)
+                treatment.save()
+
+            return call
+
+        self.assertQueryBudget(32, save("small"), save("large"))
+
+    def test_treatment_delete(self):
+        def delete(label):
+            def call():
+                Treatment.objects.get(pk=self.farms[label]["treatments"][0].pk).delete()
+
+            return call
+
+        self.assertQueryBudget(26, delete("small"), delete("large"))
+
+
+class ReconcileTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rolnik@example.com", password="x")
+        cls.wheat = CropType.objects.create(name="Pszenica")
+        cls.field = Field.objects.create(name="Pole", area_size=10, owner=cls.user)
+
+    def sow(self, date, crop=None):
+        return Treatment.objects.create(
+            field=self.field,
+            treatment_type=Treatment.TreatmentType.SOWING,
+            date=date,
+            crop_type=crop or self.wheat,
+        )
+
+    def cultivations(self):
+        return list(
+            Cultivation.objects.order_by("year").values_list(
+                "year", "crop_type__name", "sowing_date", "from_sowing"
+            )
+        )
+
+    def test_sowing_creates_and_moves_cultivation(self):
+        sowing = self.sow(datetime.date(2025, 9, 10))
+        self.assertEqual(
+            self.cultivations(),
+            [(2025, "Pszenica", datetime.date(2025, 9, 10), True)],
+        )
+
+        sowing.date = datetime.date(2025, 9, 20)
+        sowing.save()
+        self.assertEqual(
+            self.cultivations(),
+            [(2025, "Pszenica", datetime.date(2025, 9, 20), True)],
+        )
+
+        sowing.delete()
+        self.assertEqual(self.cultivations(), [])
+
+    def test_sowing_moved_to_another_field(self):
+        sowing = self.sow(datetime.date(2025, 9, 10))
+        other = Field.objects.create(name="Łąka", area_size=3, owner=self.user)
+
+        sowing = Treatment.objects.get(pk=sowing.pk)
+        sowing.field = other
+        sowing.save()
+
+        self.assertEqual(
+            list(Cultivation.objects.values_list("field__name", "year")),
+            [("Łąka", 2025)],
+        )
+
+    def test_entered_data_survives_sowing_removal(self):
+        sowing = self.sow(datetime.date(2025, 9, 10))
+        Cultivation.objects.update(yield_amount=5000)
+        sowing.delete()
+        self.assertEqual(Cultivation.objects.get().yield_amount, 5000)
+
+    def test_manual_cultivation_is_never_deleted(self):
+        manual = Cultivation.objects.create(
+            field=self.field, crop_type=self.wheat, owner=self.user, year=2026
+        )
+        fertilizing = Treatment.objects.create(
+            field=self.field,
+            treatment_type=Treatment.TreatmentType.FERTILIZING,
+            date=datetime.date(2026, 4, 1),
+        )
+        fertilizing.description = "Saletra"
+        fertilizing.save()
+        reconcile.reconcile_from_watermark(full=True)
+
+        self.assertEqual(list(Cultivation.objects.all()), [manual])
+        self.assertFalse(manual.from_sowing)
+
+    def test_manual_cultivation_matching_sowing_is_kept(self):
+        manual = Cultivation.objects.create(
+            field=self.field, crop_type=self.wheat, owner=self.user, year=2025
+        )
+        sowing = self.sow(datetime.date(2025, 9, 10))
+        manual.refresh_from_db()
+        self.assertEqual(manual.sowing_date, datetime.date(2025, 9, 10))
+        self.assertEqual(Cultivation.objects.count(), 1)
+
+        sowing.delete()
+        self.assertEqual(list(Cultivation.objects.all()), [manual])
+
+
+class ArchiveTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rolnik@example.com", password="x")
+        cls.wheat = CropType.objects.create(name="Pszenica")
+        cls.field = Field.objects.create(name="Pole", area_size=10, owner=cls.user)
+        cls.year = timezone.now().year
+        for offset in (9, 8, 7, 1, 0):
+            Treatment.objects.create(
+                field=cls.field,
+                treatment_type=Treatment.TreatmentType.SOWING,
+                date=datetime.date(cls.year - offset, 4, 1),
+                crop_type=cls.wheat,
+            )
+
+    def test_closed_seasons_move_in_batches(self):
+        ids = dict(Cultivation.objects.values_list("year", "pk"))
+
+        moved = archive_seasons(horizon=5, batch_size=2)
+
+        self.assertEqual(moved, {"cultivations": 3, "treatments": 3})
+        self.assertEqual(
+            sorted(Cultivation.objects.values_list("year", flat=True)),
+            [self.year - 1, self.year],
+        )
+        # Archiwum zachowuje id, a uzgadnianie nie usuwa ani nie odtwarza upraw
+        self.assertEqual(
+            dict(ArchivedCultivation.objects.values_list("year", "pk")),
+            {year: pk for year, pk in ids.items() if year < self.year - 5},
+        )
+        self.assertEqual(Treatment.objects.count(), 2)
+        self.assertEqual(
+            archive_seasons(horizon=5), {"cultivations": 0, "treatments": 0}
+        )
+
+    def test_history_pages_across_both_tables(self):
+        archive_seasons(horizon=5)
+        chain = cultivations_for(self.user, include_archived=True)
+        years = [self.year - offset for offset in (0, 1, 7, 8, 9)]
+
+        self.assertEqual(len(chain), 5)
+        self.assertEqual([c.year for c in chain[0:5]], years)
+        self.assertEqual([c.year for c in chain[1:4]], years[1:4])
+        self.assertEqual([c.year for c in chain[3:]], years[3:])
+        self.assertEqual(chain[2].year, years[2])
+        self.assertTrue(chain[2].is_archived)
+
+        self.client.force_login(self.user)
+        page = self.client.get(reverse("cultivations"), {"archive": "1"})
+        self.assertEqual(len(page.context["cultivations_list"]), 5)
+        self.assertEqual(
+            len(self.client.get(reverse("cultivations")).context["cultivations_list"]),
+            2,
+        )
+
+
+class FieldListTest(TestCase):
+    def test_only_latest_season_is_fetched(self):
+        user = User.objects.create_user("rolnik@example.com", password="x")
+        wheat = CropType.objects.create(name="Pszenica")
+        rape = CropType.objects.create(name="Rzepak")
+        field = Field.objects.create(name="Pole", area_size=10, owner=user)
+        Field.objects.create(name="Ugór", area_size=3, owner=user)
+        for year, crop in ((2023, wheat), (2024, rape), (2025, wheat), (2025, rape)):
+            Cultivation.objects.create(
+                field=field, crop_type=crop, owner=user, year=year, notes="Notatka"
+            )
+
+        self.client.force_login(user)
+        response = self.client.get(reverse("fields"))
+        fields = {f.name: f for f in response.context["fields"]}
+
+        latest = fields["Pole"].current_cultivations
+        self.assertEqual(
+            sorted((c.year, c.crop_type.name) for c in latest),
+            [(2025, "Pszenica"), (2025, "Rzepak")],
+        )
+        self.assertIn("notes", latest[0].get_deferred_fields())
+        self.assertEqual(fields["Ugór"].latest_cultivations(), [])
+        self.assertContains(response, "Rzepak")
+
+
+class SyncTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rolnik@example.com", password="x")
+        cls.field = Field.objects.create(name="Pole", area_size=10, owner=cls.user)
+        cls.treatment = Treatment.objects.create(
+            field=cls.field,
+            treatment_type=Treatment.TreatmentType.LIMING,
+            date=datetime.date(2025, 3, 1),
+        )
+        stranger = User.objects.create_user("obcy@example.com", password="x")
+        cls.foreign = Field.objects.create(name="Obce", area_size=5, owner=stranger)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def download(self, since=None):
+        params = {"since": since} if since else {}
+        return self.client.get(reverse("sync"), params).json()
+
+    def upload(self, entries):
+        return self.client.post(
+            reverse("sync"),
+            json.dumps({"treatments": entries}),
+            content_type="application/json",
+        )
+
+    def ids(self, payload, table):
+        return [row[0] for row in payload["changes"][table]["rows"]]
+
+    def test_full_then_incremental_download(self):
+        full = self.download()
+        self.assertTrue(full["reset"])
+        self.assertEqual(self.ids(full, "fields"), [self.field.pk])
+        self.assertEqual(self.ids(full, "treatments"), [self.treatment.pk])
+
+        # Wiersze sprzed tokenu (poza zakładką SYNC_OVERLAP) nie wracają
+        old = timezone.now() - datetime.timedelta(minutes=5)
+        Field.objects.update(updated=old)
+        Treatment.objects.update(updated=old)
+        token = self.download()["token"]
+        deleted = self.treatment.pk
+        self.treatment.delete()
+        self.foreign.delete()
+        self.field.name = "Nowa nazwa"
+        self.field.save()
+
+        delta = self.download(token)
+        self.assertFalse(delta["reset"])
+        self.assertEqual(self.ids(delta, "fields"), [self.field.pk])
+        self.assertEqual(self.ids(delta, "treatments"), [])
+        self.assertEqual(delta["deleted"]["treatments"], [deleted])
+        # Tombstone cudzego pola nie trafia do tego użytkownika
+        self.assertEqual(delta["deleted"]["fields"], [])
+
+    def test_expired_or_invalid_token(self):
+        expired = timezone.now() - datetime.timedelta(
+            days=settings.SYNC_TOMBSTONE_RETENTION_DAYS + 1
+        )
+        self.assertTrue(self.download(expired.isoformat())["reset"])
+        response = self.client.get(reverse("sync"), {"since": "wczoraj"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_upload_is_idempotent(self):
+        key = str(uuid.uuid4())
+        entry = {
+            "key": key,
+            "field": self.field.pk,
+            "treatment_type": Treatment.TreatmentType.PLOWING,
+            "date": "2025-10-01",
+        }
+        first = self.upload([entry, entry]).json()
+        second = self.upload([entry]).json()
+
+        self.assertEqual(first, second)
+        self.assertEqual(
+            Treatment.objects.get(client_key=key).pk, first["treatments"][key]
+        )
+
+    def test_foreign_key_collision_is_rejected(self):
+        key = uuid.uuid4()
+        Treatment.objects.create(
+            field=self.foreign,
+            treatment_type=Treatment.TreatmentType.LIMING,
+            date=datetime.date(2025, 3, 1),
+            client_key=key,
+        )
+        response = self.upload(
+            [
+                {
+                    "key": str(key),
+                    "field": self.field.pk,
+                    "treatment_type": Treatment.TreatmentType.PLOWING,
+                    "date": "2025-10-01",
+                }
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        # Odpowiedź nie zdradza id cudzego zabiegu
+        self.assertEqual(list(response.json()), ["key"])
+        self.assertEqual(Treatment.objects.filter(field=self.field).count(), 1)
+
+    def test_upload_to_foreign_field_saves_nothing(self):
+        entries = [
+            {
+                "key": str(uuid.uuid4()),
+                "field": field.pk,
+                "treatment_type": Treatment.TreatmentType.PLOWING,
+                "date": "2025-10-01",
+            }
+            for field in (self.field, self.foreign)
+        ]
+        response = self.upload(entries)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Treatment.objects.count(), 1)
+
+
+class TimeseriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("rolnik@example.com", password="x")
+        cls.field = Field.objects.create(name="Pole", area_size=10, owner=user)
+
+    def ingest(self, *readings, metric=SensorChunk.Metric.SOIL_MOISTURE):
+        stamps, values = zip(*readings)
+        return timeseries.ingest(
+            self.field.pk, metric, np.array(stamps, dtype="datetime64[s]"), values
+        )
+
+    def read(self, start, end):
+        stamps, values = timeseries.read_range(
+            self.field.pk, SensorChunk.Metric.SOIL_MOISTURE, start, end
+        )
+        return [(str(stamp), float(value)) for stamp, value in zip(stamps, values)]
+
+    def test_merge_keeps_newest_reading(self):
+        self.ingest(
+            ("2025-06-01T10:00:00", 30),
+            ("2025-06-01T08:00:00", 20),
+            ("2025-06-02T01:00:00", 40),
+        )
+        # Powtórzony znacznik nadpisuje, brakujące wartości są pomijane
+        stored = self.ingest(
+            ("2025-06-01T10:00:00", 35),
+            ("2025-06-01T09:00:00", 25),
+            ("2025-06-01T11:00:00", float("nan")),
+        )
+
+        self.assertEqual(stored, 2)
+        self.assertEqual(SensorChunk.objects.count(), 2)
+        self.assertEqual(
+            self.read("2025-06-01", "2025-06-03"),
+            [
+                ("2025-06-01T08:00:00", 20),
+                ("2025-06-01T09:00:00", 25),
+                ("2025-06-01T10:00:00", 35),
+                ("2025-06-02T01:00:00", 40),
+            ],
+        )
+        self.assertEqual(
+            [stamp for stamp, _ in self.read("2025-06-01T09:00", "2025-06-01T10:00")],
+            ["2025-06-01T09:00:00"],
+        )
+
+    def test_rollups_are_trimmed_to_range(self):
+        self.ingest(
+            ("2025-06-01T10:15:00", 10),
+            ("2025-06-01T10:45:00", 20),
+            ("2025-06-01T23:00:00", 5),
+            ("2025-06-02T01:00:00", 40),
+        )
+        metric = SensorChunk.Metric.SOIL_MOISTURE
+
+        hours, hourly = timeseries.read_rollup(
+            self.field.pk, metric, "2025-06-01T10:30", "2025-06-02T00:00", "hour"
+        )
+        self.assertEqual(
+            [str(hour) for hour in hours], ["2025-06-01T10", "2025-06-01T23"]
+        )
+        self.assertEqual(hourly[0].tolist(), [10, 15, 20, 2])
+
+        days, daily = timeseries.read_rollup(
+            self.field.pk, metric, "2025-06-01", "2025-06-02"
+        )
+        self.assertEqual([str(day) for day in days], ["2025-06-01"])
+        self.assertEqual([round(float(v), 3) for v in daily[0]], [5, 11.667, 20, 3])
+
+        with self.assertRaises(ValueError):
+            timeseries.read_rollup(
+                self.field.pk, metric, "2025-06-01", "2025-06-02", "week"
+            )
+
+    def test_csv_validates_field_and_metric(self):
+        rows = (
+            "timestamp,value,field,metric\n"
+            f"2025-06-01T10:00:00Z,12.5,{self.field.pk},AT\n"
+            f"1748772000,13.5,{self.field.pk},AT\n"
+        )
+        self.assertEqual(timeseries.ingest_csv(io.StringIO(rows), block_size=1), 2)
+        self.assertEqual(
+            SensorChunk.objects.get().metric, SensorChunk.Metric.AIR_TEMPERATURE
+        )
+
+        for row, message in (
+            ("2025-06-01T10:00:00,1,999999,AT", "999999"),
+            (f"2025-06-01T10:00:00,1,{self.field.pk},XX", "XX"),
+        ):
+            stream = io.StringIO(f"timestamp,value,field,metric\n{row}\n")
+            with self.assertRaisesMessage(ValueError, message):
+                timeseries.ingest_csv(stream)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "odczyty.csv")
+        with open(path, "w") as stream:
+            stream.write(
+                "timestamp,value,field,metric\n2025-06-01T10:00:00,1,999999,AT\n"
+            )
+        with self.assertRaisesMessage(CommandError, "999999"):
+            call_command("ingest_readings", path)
+        self.assertEqual(SensorChunk.objects.count(), 1)
+
+
+class DashboardTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rolnik@example.com", password="x")
+        cls.today = timezone.localdate()
+        wheat = CropType.objects.create(name="Pszenica")
+        cls.fields = [
+            Field.objects.create(name=name, area_size=area, owner=cls.user)
+            for name, area in (("Duże", 10), ("Małe", 2), ("Łąka", 3))
+        ]
+        for field, status in zip(
+            cls.fields,
+            (
+                Cultivation.Status.PROGRESS,
+                Cultivation.Status.PLANNED,
+                Cultivation.Status.CANCELLED,
+            ),
+        ):
+            Cultivation.objects.create(
+                field=field,
+                crop_type=wheat,
+                owner=cls.user,
+                year=cls.today.year,
+                status=status,
+            )
+        for field, days in ((cls.fields[0], 3), (cls.fields[0], -5)):
+            Treatment.objects.create(
+                field=field,
+                treatment_type=Treatment.TreatmentType.FERTILIZING,
+                date=cls.today - datetime.timedelta(days=days),
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_numbers(self):
+        dashboard = compute_dashboard(self.user, self.today)
+
+        counts = {value: count for value, _, count in dashboard["statuses"]}
+        self.assertEqual(len(counts), 4)
+        self.assertEqual([counts[status] for status in ("PG", "PN", "CL")], [1, 1, 1])
+        # Anulowana uprawa nie liczy się do zasiewów
+        self.assertEqual(dashboard["crop_area"], [("Pszenica", 12)])
+        # Zabieg z datą w przyszłości nie jest wykonanym zabiegiem
+        self.assertEqual(dashboard["recent_treatments"], 1)
+        self.assertEqual(dashboard["field_count"], 3)
+
+    def test_snapshot_is_invalidated_on_write(self):
+        first = get_dashboard(self.user)
+        Treatment.objects.create(
+            field=self.fields[1],
+            treatment_type=Treatment.TreatmentType.LIMING,
+            date=self.today,
+        )
+        second = get_dashboard(self.user)
+        self.assertEqual(first["recent_treatments"] + 1, second["recent_treatments"])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_dashboard(self.user), second)
+
+    def test_status_cards_fit_one_row(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("dashboard"))
+        self.assertContains(response, 'class="col-12 col-md-3"', count=4)
+
+
+class AdminPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin@example.com", password="x")
+        field = Field.objects.create(name="Pole", area_size=10, owner=cls.admin)
+        Treatment.objects.bulk_create(
+            Treatment(
+                field=field,
+                date=datetime.date(2025, 1, 1) + datetime.timedelta(days=day),
+            )
+            for day in range(120)
+        )
+
+    def setUp(self):
+        patcher = mock.patch.object(EstimatedCountPaginator, "count_limit", 50)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def paginator(self, queryset):
+        return EstimatedCountPaginator(queryset.order_by("pk"), 20)
+
+    def test_count_without_statistics(self):
+        self.assertEqual(self.paginator(Treatment.objects.all()).count, 120)
+        # Z filtrem liczymy najwyżej do limitu
+        filtered = Treatment.objects.filter(date__year=2025)
+        self.assertEqual(self.paginator(filtered).count, 50)
+
+    def test_count_from_index_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_stat1 WHERE tbl = %s AND idx IS NULL",
+                [Treatment._meta.db_table],
+            )
+            # Tabela ma indeksy, więc statystyki są tylko dla nich
+            self.assertEqual(cursor.fetchone(), (0,))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.paginator(Treatment.objects.all()).count, 120)
+
+    def test_last_page_is_reachable(self):
+        self.client.force_login(self.admin)
+        url = reverse("admin:crops_treatment_changelist")
+        response = self.client.get(url, {"p": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["cl"].result_list), 20)
+        self.assertEqual(response.context["cl"].result_count, 120)
+
+
+class CropTypeSnapshotTest(TestCase):
+    def test_invalidation_reaches_other_processes(self):
+        # Testy używają LocMemCache; tu potrzebny jest cache plikowy wspólny
+        # z drugim procesem, w katalogu tymczasowym
+        directory = tempfile.mkdtemp(prefix="agrilog-cache-")
+        self.addCleanup(shutil.rmtree, directory)
+        shared = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": directory,
+            }
+        }
+        with override_settings(CACHES=shared):
+            refdata.invalidate()
+            refdata.crop_types()
+            # Bez zatwierdzenia transakcji sygnał nie unieważnia słownika
+            crop = CropType.objects.create(name="Gryka")
+            self.assertIsNone(refdata.crop_type(crop.pk))
+
+            subprocess.run(
+                [
+                    sys.executable,
+                    "manage.py",
+                    "shell",
+                    "-c",
+                    "from crops import refdata; refdata.invalidate()",
+                ],
+                cwd=settings.BASE_DIR,
+                env={**os.environ, "CACHE_DIR": directory},
+                check=True,
+                capture_output=True,
+            )
+            self.assertEqual(refdata.crop_type(crop.pk), crop)
+
+
+class ForecastTest(TestCase):
+    # Trend 10, 11, 12 t/ha na klasie II, jedna obserwacja na klasie IV
+    HISTORY = [
+        (1, 1, 2020, 10, 1, "II"),
+        (2, 1, 2021, 11, 1, "II"),
+        (3, 1, 2022, 12, 1, "II"),
+        (4, 1, 2022, 6, 1, "IV"),
+    ]
+
+    def predict(self, history, *targets):
+        # Cele: (id, pole, roślina, powierzchnia, klasa gleby, rok)
+        ids, fields, crops, areas, soils, years = zip(*targets)
+        targets = {
+            "id": np.asarray(ids, dtype=np.int64),
+            "field": np.asarray(fields, dtype=np.int64),
+            "crop": np.asarray(crops, dtype=np.int64),
+            "area": np.asarray(areas, dtype=np.float64),
+            "soil": forecast._soil_index(soils),
+            "year": np.asarray(years, dtype=np.float64),
+        }
+        return forecast.predict(forecast._to_arrays(history), targets)
+
+    def test_falls_back_to_broader_groups(self):
+        per_ha, sigma, samples, level = self.predict(
+            self.HISTORY,
+            (1, 9, 1, 1, "II", 2023),
+            (2, 9, 1, 1, "IV", 2023),
+            (3, 9, 2, 1, "II", 2023),
+        )
+        self.assertEqual(list(level), ["crop_soil", "crop", "global"])
+        self.assertEqual(list(samples), [3, 4, 4])
+        self.assertAlmostEqual(per_ha[0], 13)
+        self.assertAlmostEqual(sigma[0], 0)
+
+    def test_field_correction_is_shrunk(self):
+        history = [
+            (1, 1, 2020, 12, 1, "II"),
+            (1, 1, 2021, 12, 1, "II"),
+            (2, 1, 2020, 8, 1, "II"),
+            (2, 1, 2021, 8, 1, "II"),
+        ]
+        per_ha, _, _, _ = self.predict(
+            history,
+            (1, 1, 1, 1, "II", 2022),
+            (2, 2, 1, 1, "II", 2022),
+            (3, 3, 1, 1, "II", 2022),
+        )
+        # Reszta +2 z dwóch lat, ściągnięta przez FIELD_SHRINKAGE = 2
+        self.assertEqual([round(value, 6) for value in per_ha], [11, 9, 10])
+
+    def test_no_history(self):
+        per_ha, _, samples, level = self.predict([], (1, 1, 1, 1, "II", 2023))
+        self.assertTrue(np.isnan(per_ha[0]))
+        self.assertEqual((samples[0], level[0]), (0, ""))
+
+        user = User.objects.create_user("rolnik@example.com", password="x")
+        field = Field.objects.create(name="Pole", area_size=2, owner=user)
+        Cultivation.objects.create(
+            field=field,
+            crop_type=CropType.objects.create(name="Owies"),
+            owner=user,
+            year=2025,
+        )
+        self.assertEqual(forecast.run_forecast(2025), 0)
+        self.assertFalse(YieldForecast.objects.exists())
+
+    def test_run_forecast_replaces_stale_rows(self):
+        user = User.objects.create_user("rolnik@example.com", password="x")
+        wheat = CropType.objects.create(name="Pszenica")
+        field = Field.objects.create(
+            name="Pole", area_size=2, soil_class=Field.SoilClass.II, owner=user
+        )
+        for year, amount in ((2022, 10), (2023, 13), (2024, 14)):
+            Cultivation.objects.create(
+                field=field,
+                crop_type=wheat,
+                owner=user,
+                year=year,
+                status=Cultivation.Status.COMPLETED,
+                yield_amount=amount,
+            )
+        current = Cultivation.objects.create(
+            field=field, crop_type=wheat, owner=user, year=2025
+        )
+        # Uprawa zebrana po poprzednim przeliczeniu traci prognozę
+        harvested = Cultivation.objects.create(
+            field=Field.objects.create(name="Łąka", area_size=1, owner=user),
+            crop_type=wheat,
+            owner=user,
+            year=2025,
+            status=Cultivation.Status.COMPLETED,
+        )
+        YieldForecast.objects.create(
+            cultivation=harvested,
+            per_ha=1,
+            expected=1,
+            lower=1,
+            upper=1,
+            computed=timezone.now(),
+        )
+
+        self.assertEqual(forecast.run_forecast(2025), 1)
+        self.assertEqual(forecast.run_forecast(2025), 1)
+
+        result = YieldForecast.objects.get()
+        self.assertEqual(result.cultivation, current)
+        self.assertEqual((result.level, result.samples), ("crop_soil", 3))
+        self.assertAlmostEqual(result.expected, result.per_ha * 2, places=1)
+        self.assertLess(result.lower, result.expected)
+        self.assertLess(result.expected, result.upper)
+
+
+class InputRollupTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rolnik@example.com", password="x")
+        cls.field = Field.objects.create(name="Pole", area_size=4, owner=cls.user)
+        cls.year = timezone.now().year
+
+    def treatment(self, date, *rows):
+        treatment = Treatment.objects.create(
+            field=self.field,
+            treatment_type=Treatment.TreatmentType.FERTILIZING,
+            date=date,
+        )
+        for component, dose, kind in rows:
+            TreatmentInput.objects.create(
+                treatment=treatment,
+                product="Produkt",
+                kind=kind,
+                component=component,
+                dose_per_ha=dose,
+            )
+        return treatment
+
+    def rollups(self):
+        return list(
+            InputRollup.objects.order_by("season", "component").values_list(
+                "season", "component", "total_amount", "per_ha", "treatments"
+            )
+        )
+
+    def test_rollup_sums_season(self):
+        nutrient = TreatmentInput.Kind.NUTRIENT
+        self.treatment(datetime.date(self.year, 3, 1), ("N", 50, nutrient))
+        self.treatment(
+            datetime.date(self.year, 5, 1),
+            ("N", 30, nutrient),
+            ("Tebukonazol", Decimal("0.25"), TreatmentInput.Kind.ACTIVE_INGREDIENT),
+        )
+        self.assertEqual(
+            self.rollups(),
+            [
+                (self.year, "N", 320, 80, 2),
+                (self.year, "Tebukonazol", 1, Decimal("0.25"), 1),
+            ],
+        )
+
+        report = inputs.season_report(self.user, self.year)
+        self.assertEqual(report["nutrient_totals"], [("N", "kg", 320)])
+        self.assertEqual([row.component for row in report["sprays"]], ["Tebukonazol"])
+
+    def test_dose_change_recomputes_total(self):
+        self.treatment(
+            datetime.date(self.year, 3, 1), ("N", 50, TreatmentInput.Kind.NUTRIENT)
+        )
+        treatment_input = TreatmentInput.objects.get()
+        treatment_input.dose_per_ha = 60
+        treatment_input.save()
+        self.assertEqual(TreatmentInput.objects.get().total_amount, 240)
+        self.assertEqual(self.rollups(), [(self.year, "N", 240, 60, 1)])
+
+        # Ręcznie podana ilość (np. zważona) nie jest nadpisywana
+        treatment_input = TreatmentInput.objects.get()
+        treatment_input.dose_per_ha = 70
+        treatment_input.total_amount = 250
+        treatment_input.save()
+        self.assertEqual(TreatmentInput.objects.get().total_amount, 250)
+
+        treatment_input.delete()
+        self.assertEqual(self.rollups(), [])
+
+    def test_moved_treatment_refreshes_both_seasons(self):
+        treatment = self.treatment(
+            datetime.date(self.year, 3, 1), ("N", 50, TreatmentInput.Kind.NUTRIENT)
+        )
+        treatment = Treatment.objects.get(pk=treatment.pk)
+        treatment.date = datetime.date(self.year - 1, 3, 1)
+        treatment.save()
+        self.assertEqual(self.rollups(), [(self.year - 1, "N", 200, 50, 1)])
+
+    def test_archiving_keeps_inputs(self):
+        treatment = self.treatment(
+            datetime.date(self.year - 9, 3, 1),
+            ("N", 50, TreatmentInput.Kind.NUTRIENT),
+            ("K2O", 20, TreatmentInput.Kind.NUTRIENT),
+        )
+        ids = list(TreatmentInput.objects.values_list("pk", flat=True))
+
+        archive_seasons(horizon=5)
+
+        self.assertFalse(TreatmentInput.objects.exists())
+        archived = ArchivedTreatment.objects.get(pk=treatment.pk)
+        self.assertEqual(
+            list(archived.inputs.values_list("pk", "component", "total_amount")),
+            [(ids[0], "N", 200), (ids[1], "K2O", 80)],
+        )
+        # Zestawienie zarchiwizowanego sezonu zostaje
+        self.assertEqual(len(self.rollups()), 2)
+
+
+class AuditTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rolnik@example.com", password="x")
+        cls.wheat = CropType.objects.create(name="Pszenica")
+        cls.field = Field.objects.create(name="Pole", area_size=10, owner=cls.user)
+        cls.cultivation = Cultivation.objects.create(
+            field=cls.field, crop_type=cls.wheat, owner=cls.user, year=2025
+        )
+
+    def entries(self, model="cultivation"):
+        return [
+            (entry.action, entry.decoded_changes())
+            for entry in AuditEntry.objects.filter(model=model).order_by("pk")
+        ]
+
+    def test_only_changed_values_are_stored(self):
+        cultivation = Cultivation.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            cultivation.save()
+            cultivation.status = Cultivation.Status.COMPLETED
+            cultivation.yield_amount = Decimal("5100.00")
+            cultivation.save()
+        self.assertEqual(
+            self.entries(),
+            [("U", {"status": ["PG", "CP"], "yield_amount": ["0.00", "5100.00"]})],
+        )
+
+    def test_delete_is_recorded_but_archiving_is_not(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Treatment.objects.create(
+                field=self.field,
+                treatment_type=Treatment.TreatmentType.LIMING,
+                date=datetime.date(2015, 3, 1),
+            )
+            archive_seasons(horizon=5)
+            treatment = Treatment.objects.create(
+                field=self.field,
+                treatment_type=Treatment.TreatmentType.LIMING,
+                date=datetime.date(2025, 3, 1),
+            )
+            treatment.delete()
+        self.assertEqual(
+            [action for action, _ in self.entries("treatment")], ["C", "C", "D"]
+        )
+
+    def test_bulk_status_change_in_admin(self):
+        admin_site = site._registry[Cultivation]
+        with (
+            mock.patch.object(admin_site, "message_user"),
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            mark_completed(admin_site, None, Cultivation.objects.all())
+            mark_completed(admin_site, None, Cultivation.objects.all())
+        self.assertEqual(self.entries(), [("U", {"status": ["PG", "CP"]})])
+
+    def test_sync_upload_and_reconcile(self):
+        entry = {
+            "key": uuid.uuid4(),
+            "field": self.field.pk,
+            "treatment_type": Treatment.TreatmentType.SOWING,
+            "date": datetime.date(2025, 9, 10),
+            "crop_type": self.wheat.pk,
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_offline_treatments(self.user, [entry])
+        self.assertEqual([a for a, _ in self.entries("treatment")], ["C"])
+        self.assertEqual(
+            self.entries(),
+            [("U", {"sowing_date": ["2025-09-01", "2025-09-10"]})],
+        )
+
+    def test_history_is_owner_scoped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cultivation.notes = "Po rzepaku"
+            self.cultivation.save()
+        url = reverse("audit_history", args=["cultivation", self.cultivation.pk])
+
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertEqual(len(response.context["entries"]), 1)
+
+        stranger = User.objects.create_user("obcy@example.com", password="x")
+        self.client.force_login(stranger)
+        response = self.client.get(url)
+        self.assertEqual(len(response.context["entries"]), 0)
+
+
+class ReplicaTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.now = 1_000_000.0
+        for name, value in (
+            ("is_configured", True),
+            ("refreshed_at", self.now - 10),
+        ):
+            patcher = mock.patch.object(replica, name, return_value=value)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(replica.time, "time", return_value=self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, pin=None):
+        request = self.factory.get("/")
+        if pin is not None:
+            request.COOKIES[replica.PIN_COOKIE] = pin
+        return request
+
+    def test_router(self):
+        router = replica.ReplicaRouter()
+        self.assertEqual(router.db_for_read(Cultivation), "default")
+        with replica.reading():
+            self.assertEqual(router.db_for_read(Cultivation), replica.REPLICA)
+            self.assertEqual(router.db_for_read(User), "default")
+            self.assertEqual(router.db_for_write(Cultivation), "default")
+        self.assertEqual(router.db_for_read(Cultivation), "default")
+        self.assertFalse(router.allow_migrate(replica.REPLICA, "crops"))
+
+    def test_can_read(self):
+        self.assertTrue(replica.can_read(self.get()))
+        # Kopia odświeżona po ostatnim zapisie użytkownika
+        self.assertTrue(replica.can_read(self.get(str(self.now - 20))))
+        # Zapis po odświeżeniu kopii: czytamy z bazy głównej
+        self.assertFalse(replica.can_read(self.get(str(self.now - 5))))
+        self.assertFalse(replica.can_read(self.get("zepsute")))
+
+        self.refreshed_at.return_value = self.now - 61
+        self.assertFalse(replica.can_read(self.get()))
+        self.refreshed_at.return_value = None
+        self.assertFalse(replica.can_read(self.get()))
+        self.is_configured.return_value = False
+        self.assertFalse(replica.can_read(self.get()))
+
+    def test_middleware_pins_after_write(self):
+        seen = []
+
+        def view(request):
+            with replica.reading_for(request):
+                seen.append(replica._reading.get())
+            return HttpResponse()
+
+        middleware = replica.ReplicaMiddleware(view)
+        response = middleware(self.get())
+        self.assertNotIn(replica.PIN_COOKIE, response.cookies)
+
+        response = middleware(self.factory.post("/"))
+        cookie = response.cookies[replica.PIN_COOKIE]
+        self.assertEqual(float(cookie.value), self.now)
+        self.assertEqual(cookie["max-age"], settings.REPLICA_MAX_LAG_SECONDS)
+
+        # Następny odczyt z tym ciasteczkiem omija kopię
+        middleware(self.get(cookie.value))
+        self.assertEqual(seen, [True, False, False])
+
+        self.is_configured.return_value = False
+        response = middleware(self.factory.post("/"))
+        self.assertNotIn(replica.PIN_COOKIE, response.cookies)
+
+    def test_refresh_swaps_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        paths = {
+            "default": os.path.join(directory, "db.sqlite3"),
+            replica.REPLICA: os.path.join(directory, "replica.sqlite3"),
+        }
+        with sqlite3.connect(paths["default"]) as source:
+            source.execute("create table pole (nazwa text)")
+            source.execute("insert into pole values ('Za lasem')")
+        source.close()
+
+        with (
+            mock.patch.object(replica, "_path", paths.get),
+            mock.patch.object(replica, "connections") as connections,
+        ):
+            started = replica.refresh()
+
+        connections[replica.REPLICA].close.assert_called_once()
+        self.assertEqual(os.path.getmtime(paths[replica.REPLICA]), started)
+        self.assertFalse(os.path.exists(paths[replica.REPLICA] + ".tmp"))
+        copy = sqlite3.connect(paths[replica.REPLICA])
+        self.assertEqual(
+            copy.execute("select nazwa from pole").fetchall(), [("Za lasem",)]
+        )
+        copy.close()
+
+
+class FieldBundleTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rolnik@example.com", password="x")
+        cls.wheat = CropType.objects.create(name="Pszenica")
+        cls.field = Field.objects.create(name="Pole", area_size=10, owner=cls.user)
+        cls.empty = Field.objects.create(name="Ugór", area_size=2, owner=cls.user)
+        stranger = User.objects.create_user("obcy@example.com", password="x")
+        cls.foreign = Field.objects.create(name="Obce", area_size=5, owner=stranger)
+        for year in (2024, 2025):
+            Cultivation.objects.create(
+                field=cls.field, crop_type=cls.wheat, owner=cls.user, year=year
+            )
+        for day in range(1, 4):
+            Treatment.objects.create(
+                field=cls.field,
+                treatment_type=Treatment.TreatmentType.FERTILIZING,
+                date=datetime.date(2025, 5, day),
+            )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def get(self, *fields, headers=None, **params):
+        params["ids"] = ",".join(str(field.pk) for field in fields)
+        return self.client.get(reverse("field_bundle"), params, headers=headers)
+
+    def test_bundle_contents(self):
+        response = self.get(self.field, self.empty, self.foreign, treatments=2)
+
+        data = response.json()
+        self.assertEqual(data["missing"], [self.foreign.pk])
+        bundle, empty = data["fields"]
+        self.assertEqual(bundle["id"], self.field.pk)
+        self.assertEqual(bundle["current_year"], 2025)
+        self.assertEqual([c["year"] for c in bundle["latest_cultivations"]], [2025])
+        self.assertEqual(
+            [c["year"] for c in bundle["cultivation_history"]], [2025, 2024]
+        )
+        self.assertEqual(
+            [t["date"] for t in bundle["treatments"]], ["2025-05-03", "2025-05-02"]
+        )
+        self.assertEqual((empty["current_year"], empty["treatments"]), (None, []))
+
+        # Paczka, którą klient już ma, wraca bez treści
+        response = self.get(
+            self.field,
+            self.empty,
+            treatments=2,
+            known=f"{self.field.pk}:{bundle['etag']}",
+        )
+        self.assertEqual(
+            response.json()["fields"][0],
+            {"id": self.field.pk, "etag": bundle["etag"], "unchanged": True},
+        )
+        self.assertNotIn("unchanged", response.json()["fields"][1])
+
+    def test_not_modified(self):
+        etag = self.get(self.field).headers["ETag"]
+
+        for header in (etag, f'"inny", W/{etag}', "*"):
+            response = self.get(self.field, headers={"if-none-match": header})
+            self.assertEqual(response.status_code, 304, header)
+            self.assertEqual(response.headers["ETag"], etag)
+
+        # Inny ETag, który tylko zawiera nasz jako fragment, nie pasuje
+        for header in ('"inny"', f"{etag}-gzip", f'"x{etag[1:]}'):
+            response = self.get(self.field, headers={"if-none-match": header})
+            self.assertEqual(response.status_code, 200, header)
+
+        Treatment.objects.create(
+            field=self.field,
+            treatment_type=Treatment.TreatmentType.LIMING,
+            date=datetime.date(2025, 6, 1),
+        )
+        response = self.get(self.field, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+
+class PlanTest(TestCase):
+    TODAY = datetime.date(2025, 1, 31)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rolnik@example.com", password="x")
+        cls.other = User.objects.create_user("sasiad@example.com", password="x")
+        cls.wheat = CropType.objects.create(name="Pszenica")
+        cls.north = Field.objects.create(name="Północ", area_size=5, owner=cls.user)
+        cls.south = Field.objects.create(name="Południe", area_size=3, owner=cls.user)
+        cls.foreign = Field.objects.create(name="Sąsiad", area_size=2, owner=cls.other)
+        Cultivation.objects.create(
+            field=cls.north,
+            crop_type=cls.wheat,
+            owner=cls.user,
+            year=2025,
+            sowing_date=datetime.date(2025, 1, 10),
+        )
+
+    def schedule(self, **kwargs):
+        kwargs = {
+            "owner": self.user,
+            "name": "Nawożenie",
+            "treatment_type": Treatment.TreatmentType.FERTILIZING,
+            "start_date": self.TODAY,
+            **kwargs,
+        }
+        return TreatmentSchedule.objects.create(**kwargs)
+
+    def plans(self, **filters):
+        return list(
+            PlannedTreatment.objects.filter(**filters)
+            .order_by("due_date", "field__name")
+            .values_list("field__name", "due_date", "status")
+        )
+
+    def test_add_months_clamps_day(self):
+        self.assertEqual(add_months(self.TODAY, 1), datetime.date(2025, 2, 28))
+        self.assertEqual(add_months(self.TODAY, 13), datetime.date(2026, 2, 28))
+        self.assertEqual(add_months(self.TODAY, 11), datetime.date(2025, 12, 31))
+
+    def test_recurring_schedule(self):
+        schedule = self.schedule(interval_months=4)
+        schedule.fields.add(self.south, self.foreign)
+
+        self.assertEqual(generate(horizon_days=200, today=self.TODAY), 2)
+        # Ponowne uruchomienie nie dubluje terminów
+        generate(horizon_days=200, today=self.TODAY)
+        planned = PlannedTreatment.Status.PLANNED
+        self.assertEqual(
+            self.plans(),
+            [
+                ("Południe", self.TODAY, planned),
+                ("Południe", datetime.date(2025, 5, 31), planned),
+            ],
+        )
+
+    def test_schedule_without_fields_covers_all_owner_fields(self):
+        self.schedule()
+        self.schedule(owner=self.other, start_date=self.TODAY.replace(year=2026))
+        generate(owner=self.user, today=self.TODAY)
+        self.assertEqual([name for name, _, _ in self.plans()], ["Południe", "Północ"])
+
+    def test_days_after_sowing(self):
+        self.schedule(crop_type=self.wheat, days_after_sowing=30)
+        generate(today=self.TODAY)
+        # Tylko pole z pszenicą w bieżącym sezonie, termin od daty siewu
+        self.assertEqual(
+            self.plans(),
+            [("Północ", datetime.date(2025, 2, 9), PlannedTreatment.Status.PLANNED)],
+        )
+
+    def test_due(self):
+        self.schedule(start_date=datetime.date(2025, 1, 1), interval_months=1)
+        generate(today=datetime.date(2025, 1, 1), horizon_days=70)
+        PlannedTreatment.objects.filter(
+            field=self.south, due_date=datetime.date(2025, 2, 1)
+        ).update(status=PlannedTreatment.Status.SKIPPED)
+
+        week = (self.TODAY, self.TODAY + datetime.timedelta(days=7))
+        plans = planning.due(self.user, *week)
+        self.assertEqual(
+            [plan.due_date for plan in plans], sorted(plan.due_date for plan in plans)
+        )
+        self.assertCountEqual(
+            [(plan.field.name, plan.due_date) for plan in plans],
+            [
+                ("Południe", datetime.date(2025, 1, 1)),
+                ("Północ", datetime.date(2025, 1, 1)),
+                ("Północ", datetime.date(2025, 2, 1)),
+            ],
+        )
+        self.assertEqual(
+            [plan.due_date for plan in planning.due(self.user, *week, False)],
+            [datetime.date(2025, 2, 1)],
+        )
+
+    def test_treatment_completes_earliest_plan(self):
+        schedule = self.schedule(
+            start_date=datetime.date(2025, 3, 1), interval_months=1
+        )
+        schedule.fields.add(self.north)
+        generate(today=datetime.date(2025, 3, 1), horizon_days=40)
+
+        def treat(date, treatment_type=Treatment.TreatmentType.FERTILIZING):
+            return Treatment.objects.create(
+                field=self.north, treatment_type=treatment_type, date=date
+            )
+
+        # Za wcześnie (więcej niż MATCH_EARLY_DAYS przed terminem) i inny rodzaj
+        treat(datetime.date(2025, 2, 1))
+        treat(datetime.date(2025, 3, 1), Treatment.TreatmentType.LIMING)
+        self.assertFalse(
+            PlannedTreatment.objects.exclude(
+                status=PlannedTreatment.Status.PLANNED
+            ).exists()
+        )
+
+        first = treat(datetime.date(2025, 2, 20))
+        second = treat(datetime.date(2025, 4, 20))
+        self.assertEqual(
+            list(
+                PlannedTreatment.objects.order_by("due_date").values_list(
+                    "due_date", "status", "treatment"
+                )
+            ),
+            [
+                (datetime.date(2025, 3, 1), PlannedTreatment.Status.DONE, first.pk),
+                (datetime.date(2025, 4, 1), PlannedTreatment.Status.DONE, second.pk),
+            ],
+        )
+
+
+class PartialUpdateTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rolnik@example.com", password="x")
+        wheat = CropType.objects.create(name="Pszenica")
+        cls.field = Field.objects.create(name="Pole", area_size=10, owner=cls.user)
+        cls.cultivation = Cultivation.objects.create(
+            field=cls.field, crop_type=wheat, owner=cls.user, year=2025
+        )
+        stranger = User.objects.create_user("obcy@example.com", password="x")
+        cls.foreign = Cultivation.objects.create(
+            field=Field.objects.create(name="Obce", area_size=5, owner=stranger),
+            crop_type=wheat,
+            owner=stranger,
+            year=2025,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def patch(self, cultivation, data):
+        return self.client.patch(
+            reverse("patch_cultivation", args=[cultivation.pk]),
+            json.dumps(data),
+            content_type="application/json",
+        )
+
+    def test_only_sent_columns_are_saved(self):
+        before = Cultivation.objects.get(pk=self.cultivation.pk)
+        # Zmiana z innego miejsca w międzyczasie nie zostaje nadpisana
+        Cultivation.objects.filter(pk=self.cultivation.pk).update(notes="Oprysk")
+
+        response = self.patch(
+            self.cultivation, {"status": "CP", "yield_amount": "5000"}
+        )
+
+        self.assertEqual(response.status_code, 204)
+        cultivation = Cultivation.objects.get(pk=self.cultivation.pk)
+        self.assertEqual(
+            (cultivation.status, cultivation.yield_amount, cultivation.notes),
+            (Cultivation.Status.COMPLETED, 5000, "Oprysk"),
+        )
+        self.assertGreater(cultivation.updated, before.updated)
+
+    def test_columns_outside_serializer_are_ignored(self):
+        response = self.patch(
+            self.cultivation, {"year": 1900, "owner": self.foreign.owner_id}
+        )
+        self.assertEqual(response.status_code, 204)
+        cultivation = Cultivation.objects.get(pk=self.cultivation.pk)
+        self.assertEqual((cultivation.year, cultivation.owner), (2025, self.user))
+
+    def test_invalid_values(self):
+        response = self.patch(self.cultivation, {"yield_amount": "-5"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("yield_amount", response.json())
+
+        response = self.patch(self.cultivation, {"status": "XX"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("status", response.json())
+        self.assertEqual(
+            Cultivation.objects.get(pk=self.cultivation.pk).yield_amount, 0
+        )
+
+    def test_other_owner(self):
+        for data in ({"notes": "Obce"}, {}):
+            self.assertEqual(self.patch(self.foreign, data).status_code, 404)
+        self.assertIsNone(Cultivation.objects.get(pk=self.foreign.pk).notes)
+
+        self.client.logout()
+        self.assertEqual(self.patch(self.cultivation, {}).status_code, 403)
+
+    def test_patch_field_notes(self):
+        response = self.client.patch(
+            reverse("patch_field", args=[self.field.pk]),
+            json.dumps({"notes": "pH 6,2", "name": "Inna"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 204)
+        field = Field.objects.get(pk=self.field.pk)
+        self.assertEqual((field.name, field.notes), ("Pole", "pH 6,2"))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, ATTACHMENT_WORKERS=0)
+class AttachmentTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rolnik@example.com", password="x")
+        cls.field = Field.objects.create(name="Pole", area_size=10, owner=cls.user)
+
+    def test_archiving_keeps_photos(self):
+        treatment = Treatment.objects.create(
+            field=self.field,
+            treatment_type=Treatment.TreatmentType.LIMING,
+            date=datetime.date(2015, 3, 1),
+        )
+        attach(self.user, self.field, [_image()], treatment=treatment)
+
+        archive_seasons(horizon=5)
+
+        self.assertFalse(Treatment.objects.exists())
+        attachment = self.field.attachments.get()
+        self.assertIsNone(attachment.treatment_id)
+
+    def test_content_type_comes_from_file(self):
+        svg = SimpleUploadedFile(
+            "mapa.jpg",
+            b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>',
+            content_type="image/jpeg",
+        )
+        with self.assertRaises(AttachmentError):
+            attach(self.user, self.field, [svg])
+
+        buffer = io.BytesIO()
+        Image.new("RGB", (8, 8)).save(buffer, "PNG")
+        png = SimpleUploadedFile(
+            "pole.jpg", buffer.getvalue(), content_type="image/gif"
+        )
+        (attachment,) = attach(self.user, self.field, [png])
+        self.assertEqual(attachment.blob.content_type, "image/png")
+
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("attachment_file", args=[attachment.pk, "original"])
+        )
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(response["X-Content-Type-Options"], "nosniff")
+
+    def test_rejected_upload_leaves_no_files(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (8, 8), (12, 34, 56)).save(buffer, "PNG")
+        content = buffer.getvalue()
+        photo = SimpleUploadedFile("pole.png", content, content_type="image/png")
+        broken = SimpleUploadedFile("opis.jpg", b"to nie jest zdjecie")
+
+        with self.assertRaises(AttachmentError):
+            attach(self.user, self.field, [photo, broken])
+
+        self.assertFalse(Blob.objects.exists())
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertFalse(os.path.exists(blob_path(digest)))
+        self.assertEqual(os.listdir(os.path.join(storage_root(), "tmp")), [])
+
+    def test_unverified_original_is_downloaded(self):
+        (attachment,) = attach(self.user, self.field, [_image()])
+        # Plik zapisany przed sprawdzaniem treści, z typem podanym przez klienta
+        Blob.objects.filter(pk=attachment.blob_id).update(content_type="text/html")
+
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("attachment_file", args=[attachment.pk, "original"])
+        )
+        self.assertEqual(response["Content-Type"], "application/octet-stream")
+        self.assertTrue(response["Content-Disposition"].startswith("attachment"))
+
+
+class FieldEventsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rolnik@example.com", password="x")
+        cls.crop = CropType.objects.create(name="Pszenica")
+        cls.field = Field.objects.create(name="Pole", area_size=10, owner=cls.user)
+
+    def add_sowing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Treatment.objects.create(
+                field=self.field,
+                treatment_type=Treatment.TreatmentType.SOWING,
+                date=datetime.date(2025, 4, 1),
+                crop_type=self.crop,
+            )
+
+    async def receive(self, subscription):
+        messages = []
+        while True:
+            try:
+                messages.append(await subscription.get(0.1))
+            except asyncio.TimeoutError:
+                return messages
+
+    async def test_sowing_notifies_field_subscribers(self):
+        subscription = events.broker.subscribe(events.channel(self.field.pk))
+        try:
+            treatment = await sync_to_async(self.add_sowing)()
+            messages = await self.receive(subscription)
+        finally:
+            events.broker.unsubscribe(subscription)
+
+        self.assertIn(
+            ("treatment", "created", treatment.pk),
+            [(m["model"], m["action"], m["id"]) for m in messages],
+        )
+        fragments = {name for m in messages for name in m["fragments"]}
+        self.assertEqual(fragments, {"treatments", "cultivations", "history"})
+
+    async def test_rolled_back_write_is_not_published(self):
+        subscription = events.broker.subscribe(events.channel(self.field.pk))
+
+        def failed_save():
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    self.field.treatments.create(date=datetime.date(2025, 5, 1))
+                    transaction.set_rollback(True)
+
+        try:
+            await sync_to_async(failed_save)()
+            self.assertEqual(await self.receive(subscription), [])
+        finally:
+            events.broker.unsubscribe(subscription)
+
+    async def test_stream(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse("field_events", args=[self.field.pk])
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        content = aiter(response.streaming_content)
+        self.assertEqual(await anext(content), b"retry: 5000\n\n")
+
+        events.broker.publish(
+            events.channel(self.field.pk),
+            {"model": "treatment", "fragments": ["treatments"]},
+        )
+        chunk = (await anext(content)).decode()
+        self.assertIn("event: change", chunk)
+        self.assertIn('"fragments":["treatments"]', chunk)
+
+        # Rozłączenie klienta: serwer ASGI przerywa zadanie czekające na wiadomość
+        waiting = asyncio.ensure_future(anext(content))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(events.broker.subscribers(events.channel(self.field.pk)), 0)
+
+    async def test_stream_requires_owner(self):
+        stranger = await User.objects.acreate_user("obcy@example.com", password="x")
+        await self.async_client.aforce_login(stranger)
+        response = await self.async_client.get(
+            reverse("field_events", args=[self.field.pk])
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(PROFILER_INTERVAL_MS=1)
+class ProfilerTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            "admin@example.com", password="x", is_staff=True
+        )
+        cls.user = User.objects.create_user("rolnik@example.com", password="x")
+
+    def setUp(self):
+        directory = tempfile.mkdtemp(prefix="agrilog-profiles-")
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        override = self.settings(PROFILES_DIR=directory)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_staff_request(self):
+        self.client.force_login(self.staff)
+        self.client.get(reverse("fields"), {"_profile": "1"})
+
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.trigger, RequestProfile.Trigger.STAFF)
+        self.assertEqual(profile.view_name, "fields")
+        self.assertGreater(profile.sql_count, 0)
+        with open(os.path.join(settings.PROFILES_DIR, profile.file_name)) as folded:
+            lines = folded.read().splitlines()
+        self.assertEqual(len(lines) > 0, profile.samples > 0)
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            self.assertTrue(stack and int(count) > 0)
+
+    def test_header_requires_token_or_staff(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("fields"), headers={"X-Profile": "1"})
+        self.assertFalse(RequestProfile.objects.exists())
+
+        with self.settings(PROFILER_TOKEN="sekret"):
+            self.client.get(reverse("fields"), headers={"X-Profile": "sekret"})
+        self.assertEqual(
+            RequestProfile.objects.get().trigger, RequestProfile.Trigger.HEADER
+        )
+
+    def test_sampled_requests_saved_only_when_slow(self):
+        self.client.force_login(self.user)
+        with self.settings(PROFILER_SAMPLE_RATE=1.0, PROFILER_SLOW_MS=60_000):
+            self.client.get(reverse("fields"))
+        self.assertFalse(RequestProfile.objects.exists())
+
+        with self.settings(PROFILER_SAMPLE_RATE=1.0, PROFILER_SLOW_MS=0):
+            self.client.get(reverse("fields"))
+        self.assertEqual(
+            RequestProfile.objects.get().trigger, RequestProfile.Trigger.SLOW
+        )
+
+    def test_rotation(self):
+        self.client.force_login(self.staff)
+        with self.settings(PROFILER_KEEP=2):
+            for _ in range(4):
+                self.client.get(reverse("fields"), {"_profile": "1"})
+        profiles = RequestProfile.objects.all()
+        self.assertEqual(len(profiles), 2)
+        self.assertEqual(
+            sorted(os.listdir(settings.PROFILES_DIR)),
+            sorted(p.file_name for p in profiles),
+        )
+
+    def test_admin_download(self):
+        self.client.force_login(self.staff)
+        self.client.get(reverse("fields"), {"_profile": "1"})
+        profile = RequestProfile.objects.get()
+        self.staff.is_superuser = True
+        self.staff.save()
+
+        changelist = self.client.get(reverse("admin:crops_requestprofile_changelist"))
+        self.assertContains(changelist, profile.file_name)
+        response = self.client.get(
+            reverse("admin:crops_requestprofile_folded", args=[profile.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class AsyncMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            "admin@example.com", password="x", is_staff=True
+        )
+
+    def test_chain_stays_async(self):
+        async def async_view(request):
+            return HttpResponse()
+
+        for middleware in (ProfilerMiddleware, AuditMiddleware, ReplicaMiddleware):
+            self.assertTrue(iscoroutinefunction(middleware(async_view)))
+            self.assertFalse(iscoroutinefunction(middleware(lambda r: HttpResponse())))
+
+    async def test_audit_buffer_is_flushed(self):
+        async def view(request):
+            audit._buffer.get().entries.append(
+                AuditEntry(
+                    model="field",
+                    object_id=1,
+                    action=AuditEntry.Action.UPDATE,
+                    changes="{}",
+                    created=timezone.now(),
+                )
+            )
+            return HttpResponse()
+
+        await AuditMiddleware(view)(RequestFactory().post("/"))
+        self.assertIsNone(audit._buffer.get())
+        self.assertEqual(await AuditEntry.objects.acount(), 1)
+
+    async def test_profile_under_asgi(self):
+        directory = tempfile.mkdtemp(prefix="agrilog-profiles-")
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        await self.async_client.aforce_login(self.staff)
+        with self.settings(PROFILES_DIR=directory, PROFILER_INTERVAL_MS=1):
+            response = await self.async_client.get(reverse("fields"), {"_profile": "1"})
+
+        self.assertEqual(response.status_code, 200)
+        profile = await RequestProfile.objects.aget()
+        self.assertEqual(profile.view_name, "fields")
+        # Zapytania widoku wykonują się w wątku objętym pomiarem
+        self.assertGreater(profile.sql_count, 0)
+
+    async def test_replica_pin_under_asgi(self):
+        async def view(request):
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(view)
+        with mock.patch.object(replica, "is_configured", return_value=True):
+            response = await middleware(RequestFactory().post("/"))
+        self.assertIn(replica.PIN_COOKIE, response.cookies)
+
+
+class SeasonRolloverTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rolnik@example.com", password="x")
+        cls.rape, cls.wheat, cls.maize = (
+            CropType.objects.create(name=name)
+            for name in ("Rzepak", "Pszenica", "Kukurydza")
+        )
+        cls.rotation = RotationTemplate.objects.create(owner=cls.user, name="Trzy")
+        RotationStep.objects.bulk_create(
+            RotationStep(template=cls.rotation, position=position, crop_type=crop)
+            for position, crop in enumerate((cls.rape, cls.wheat, cls.maize))
+        )
+        cls.fields = [
+            Field.objects.create(name=f"Pole {i}", area_size=5, owner=cls.user)
+            for i in range(4)
+        ]
+        for field, crop in zip(cls.fields, (cls.rape, cls.maize, cls.wheat)):
+            Treatment.objects.create(
+                field=field,
+                treatment_type=Treatment.TreatmentType.SOWING,
+                date=datetime.date(2025, 4, 1),
+                crop_type=crop,
+            )
+        # Pole 2 ma już uprawę w sezonie docelowym
+        Treatment.objects.create(
+            field=cls.fields[2],
+            treatment_type=Treatment.TreatmentType.SOWING,
+            date=datetime.date(2026, 4, 1),
+            crop_type=cls.rape,
+        )
+
+    def test_proposals_follow_rotation(self):
+        proposals = {
+            p.field_id: p for p in rollover.propose(self.user, 2025, self.rotation)
+        }
+        crops = [proposals[field.pk].crop_id for field in self.fields]
+        self.assertEqual(
+            crops, [self.wheat.pk, self.rape.pk, self.maize.pk, self.rape.pk]
+        )
+        self.assertTrue(proposals[self.fields[2].pk].planned)
+        # Pole bez uprawy w roku źródłowym zaczyna płodozmian od początku
+        self.assertIsNone(proposals[self.fields[3].pk].source_crop_id)
+
+    def test_apply_creates_planned_cultivations(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            created = rollover.apply(self.user, 2025, self.rotation)
+
+        self.assertEqual(
+            {(c.field_id, c.crop_type_id) for c in created},
+            {
+                (self.fields[0].pk, self.wheat.pk),
+                (self.fields[1].pk, self.rape.pk),
+                (self.fields[3].pk, self.rape.pk),
+            },
+        )
+        planned = Cultivation.objects.filter(year=2026, status="PN")
+        self.assertEqual(planned.count(), 3)
+        self.assertEqual(len(set(planned.values_list("slug", flat=True))), 3)
+        self.assertEqual(
+            set(
+                AuditEntry.objects.filter(
+                    model="cultivation", action=AuditEntry.Action.CREATE
+                ).values_list("object_id", flat=True)
+            ),
+            {c.pk for c in created},
+        )
+        # Powtórne zatwierdzenie niczego nie dubluje
+        self.assertEqual(rollover.apply(self.user, 2025, self.rotation), [])
+
+    def test_sowing_starts_planned_cultivation(self):
+        rollover.apply(self.user, 2025, self.rotation)
+        Treatment.objects.create(
+            field=self.fields[0],
+            treatment_type=Treatment.TreatmentType.SOWING,
+            date=datetime.date(2026, 3, 20),
+            crop_type=self.wheat,
+        )
+        cultivation = Cultivation.objects.get(field=self.fields[0], year=2026)
+        self.assertEqual(cultivation.status, Cultivation.Status.PROGRESS)
+        self.assertEqual(cultivation.sowing_date, datetime.date(2026, 3, 20))
+
+    def test_other_sowing_replaces_plan(self):
+        rollover.apply(self.user, 2025, self.rotation)
+        Treatment.objects.create(
+            field=self.fields[0],
+            treatment_type=Treatment.TreatmentType.SOWING,
+            date=datetime.date(2026, 3, 20),
+            crop_type=self.maize,
+        )
+        self.assertEqual(
+            list(
+                Cultivation.objects.filter(field=self.fields[0], year=2026).values_list(
+                    "crop_type_id", "status"
+                )
+            ),
+            [(self.maize.pk, Cultivation.Status.PROGRESS)],
+        )
+
+
+class BackupTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="agrilog-backups-")
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.database = os.path.join(self.directory, "live.sqlite3")
+        self.backups = os.path.join(self.directory, "backups")
+        self.execute("CREATE TABLE readings (id INTEGER PRIMARY KEY, value TEXT)")
+        self.execute(
+            "INSERT INTO readings (value) VALUES "
+            + ",".join(["(hex(randomblob(200)))"] * 500)
+        )
+
+    def execute(self, sql, database=None):
+        db = sqlite3.connect(database or self.database)
+        try:
+            with db:
+                return db.execute(sql).fetchall()
+        finally:
+            db.close()
+
+    def backup(self, **kwargs):
+        return backups.create(self.backups, self.database, pages=8, pause=0, **kwargs)
+
+    def test_incremental_restore(self):
+        full = self.backup()
+        self.execute("UPDATE readings SET value = 'x' WHERE id = 1")
+        incremental = self.backup(incremental=True)
+
+        self.assertEqual(full.kind, backups.FULL)
+        self.assertEqual(incremental.kind, backups.INCREMENTAL)
+        self.assertEqual(incremental.parent, full.name)
+        self.assertLess(incremental.pages_written, full.page_count / 4)
+        self.assertGreater(full.stats["steps"], 1)
+        self.assertIsNone(self.backup(incremental=True))
+
+        self.execute("DELETE FROM readings")
+        backups.restore(incremental.name, self.backups, self.database)
+        self.assertEqual(self.execute("SELECT count(*) FROM readings"), [(500,)])
+        self.assertEqual(
+            self.execute("SELECT value FROM readings WHERE id = 1"), [("x",)]
+        )
+
+    def test_damaged_snapshot(self):
+        full = self.backup()
+        self.execute("DELETE FROM readings WHERE id > 250")
+        incremental = self.backup(incremental=True)
+        with open(incremental.path, "r+b") as delta:
+            delta.seek(10)
+            delta.write(b"!")
+
+        self.assertTrue(backups.verify(full))
+        self.assertFalse(backups.verify(incremental))
+        with self.assertRaises(backups.BackupError):
+            backups.restore(incremental.name, self.backups, self.database)
+        self.assertEqual(self.execute("SELECT count(*) FROM readings"), [(250,)])
+
+    def test_scheduled_retention(self):
+        for step in range(6):
+            self.execute(f"INSERT INTO readings (value) VALUES ('{step}')")
+            with self.settings(BACKUP_FULL_EVERY=2, BACKUP_KEEP_FULL=1):
+                backups.scheduled(self.backups, self.database, pages=-1, pause=0)
+
+        snapshots = backups.list_snapshots(self.backups)
+        self.assertEqual(
+            [snapshot.kind for snapshot in snapshots],
+            [backups.FULL, backups.INCREMENTAL, backups.INCREMENTAL],
+        )
+        self.assertEqual(
+            sorted(os.listdir(self.backups)),
+            sorted(path.rsplit(os.sep, 1)[1] for s in snapshots for path in s.files),
+        )
+        output = os.path.join(self.directory, "restored.sqlite3")
+        backups.materialize(snapshots[-1].name, output, self.backups)
+        self.assertEqual(
+            self.execute("SELECT value FROM readings ORDER BY id DESC LIMIT 1", output),
+            [("5",)],
+        )
+
+
+class AllocationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rolnik@example.com", password="x")
+        cls.wheat, cls.rape, cls.maize = (
+            CropType.objects.create(name=name)
+            for name in ("Pszenica", "Rzepak", "Kukurydza")
+        )
+        cls.fields = Field.objects.bulk_create(
+            Field(name=f"Pole {i}", area_size=10, owner=cls.user) for i in range(6)
+        )
+        history = {
+            2024: [cls.rape, cls.maize, cls.wheat, cls.wheat, cls.maize],
+            2025: [cls.wheat, cls.rape, cls.maize, cls.rape, cls.wheat, cls.maize],
+        }
+        Cultivation.objects.bulk_create(
+            Cultivation.assign_slugs(
+                Cultivation(field=field, crop_type=crop, owner=cls.user, year=year)
+                for year, crops in history.items()
+                for field, crop in zip(cls.fields, crops)
+            )
+        )
+
+    def test_solve_meets_targets(self):
+        rng = np.random.default_rng(1)
+        area = rng.uniform(1, 30, 2000)
+        cost = -rng.uniform(0.8, 1.2, (2000, 5)) * area[:, None]
+        cost[:, -1] = 0
+        allowed = rng.random((2000, 5)) > 0.2
+        allowed[:, -1] = True
+        targets = np.full(4, area.sum() / 5)
+
+        assignment, totals, _ = allocation.solve(cost, allowed, area, targets)
+
+        self.assertTrue(allowed[np.arange(2000), assignment].all())
+        self.assertLess(np.abs(totals - targets).max(), 1.0)
+
+    def test_allocate_respects_rotation_gaps(self):
+        Cultivation.objects.create(
+            field=self.fields[5], crop_type=self.maize, owner=self.user, year=2026
+        )
+        with self.assertNumQueries(3):
+            plan = allocation.allocate(
+                self.user,
+                2026,
+                targets={self.wheat.pk: 20, self.rape.pk: 20, self.maize.pk: 20},
+                gaps={self.rape.pk: 2},
+            )
+
+        self.assertEqual(plan.areas, {c: 20.0 for c in plan.targets})
+        # Jedyny przydział bez tej samej rośliny rok po roku i bez rzepaku
+        # wcześniej niż po dwóch latach
+        self.assertEqual(
+            [p.crop_id for p in plan.proposals],
+            [
+                self.maize.pk,
+                self.wheat.pk,
+                self.rape.pk,
+                self.wheat.pk,
+                self.rape.pk,
+                self.maize.pk,
+            ],
+        )
+        self.assertTrue(plan.proposals[5].planned)
+
+        created = rollover.commit(self.user, 2026, plan.proposals)
+        self.assertEqual(len(created), 5)
+        self.assertEqual(Cultivation.objects.filter(year=2026, status="PN").count(), 5)
+
+
+class LastTreatmentTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rolnik@example.com", password="x")
+        cls.field = Field.objects.create(name="Pole", area_size=10, owner=cls.user)
+
+    def add(self, date, treatment_type=Treatment.TreatmentType.LIMING):
+        return Treatment.objects.create(
+            field=self.field, treatment_type=treatment_type, date=date
+        )
+
+    def last(self, treatment_type=Treatment.TreatmentType.LIMING):
+        return (
+            LastTreatment.objects.filter(
+                field=self.field, treatment_type=treatment_type
+            )
+            .values_list("date", "treatment_id")
+            .first()
+        )
+
+    def test_back_dated_entry(self):
+        recent = self.add(datetime.date(2025, 3, 1))
+        self.add(datetime.date(2021, 3, 1))
+        self.assertEqual(self.last(), (datetime.date(2025, 3, 1), recent.pk))
+
+    def test_edit_and_delete(self):
+        older = self.add(datetime.date(2021, 3, 1))
+        recent = self.add(datetime.date(2025, 3, 1))
+
+        recent.date = datetime.date(2020, 3, 1)
+        recent.save()
+        self.assertEqual(self.last(), (datetime.date(2021, 3, 1), older.pk))
+
+        older.treatment_type = Treatment.TreatmentType.PLOWING
+        older.save()
+        self.assertEqual(self.last(), (datetime.date(2020, 3, 1), recent.pk))
+        self.assertEqual(
+            self.last(Treatment.TreatmentType.PLOWING),
+            (datetime.date(2021, 3, 1), older.pk),
+        )
+
+        recent.delete()
+        self.assertIsNone(self.last())
+
+    def test_archived_treatments(self):
+        ArchivedTreatment.objects.create(
+            id=10_000,
+            field=self.field,
+            treatment_type=Treatment.TreatmentType.LIMING,
+            date=datetime.date(2015, 3, 1),
+            created=timezone.now(),
+            updated=timezone.now(),
+        )
+        treatment = self.add(datetime.date(2014, 3, 1))
+        self.assertEqual(self.last(), (datetime.date(2014, 3, 1), treatment.pk))
+
+        self.assertEqual(last_treatments.rebuild_last_treatments(), 1)
+        self.assertEqual(self.last(), (datetime.date(2015, 3, 1), None))
+        treatment.delete()
+        self.assertEqual(self.last(), (datetime.date(2015, 3, 1), None))
+
+    def test_not_done_for_years(self):
+        other = Field.objects.create(name="Łąka", area_size=5, owner=self.user)
+        never = Field.objects.create(name="Ugór", area_size=5, owner=self.user)
+        self.add(datetime.date(2019, 3, 1))
+        Treatment.objects.create(
+            field=other,
+            treatment_type=Treatment.TreatmentType.LIMING,
+            date=datetime.date(2024, 3, 1),
+        )
+
+        fields = last_treatments.filter_fields(
+            Field.objects.all(),
+            Treatment.TreatmentType.LIMING,
+            order="last",
+            not_since_years=4,
+            today=datetime.date(2026, 10, 1),
+        )
+        self.assertEqual(list(fields), [never, self.field])
+        self.assertEqual(fields[1].last_date, datetime.date(2019, 3, 1))
+
+
+class CultivationBulkEditTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rolnik@example.com", password="x")
+        crop = CropType.objects.create(name="Pszenica")
+        cls.cultivations = [
+            Cultivation.objects.create(
+                field=Field.objects.create(
+                    name=f"Pole {i}", area_size=5, owner=cls.user
+                ),
+                crop_type=crop,
+                owner=cls.user,
+                year=2025,
+                sowing_date=datetime.date(2024, 10, 1),
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def post(self, rows):
+        data = {"form-TOTAL_FORMS": len(rows), "form-INITIAL_FORMS": len(rows)}
+        for index, row in enumerate(rows):
+            for name, value in row.items():
+                data[f"form-{index}-{name}"] = value
+        return self.client.post(reverse("cultivations") + "?edit=1", data)
+
+    def row(self, cultivation, **changes):
+        return {
+            "id": cultivation.pk,
+            "status": cultivation.status,
+            "sowing_date": cultivation.sowing_date,
+            "yield_amount": cultivation.yield_amount,
+            **changes,
+        }
+
+    def test_grid_is_rendered(self):
+        response = self.client.get(reverse("cultivations"), {"edit": "1"})
+        self.assertEqual(len(response.context["formset"].forms), 3)
+        self.assertContains(response, 'name="form-0-yield_amount"')
+
+    def test_updates_only_changed_rows(self):
+        first, second, third = self.cultivations
+        with (
+            CaptureQueriesContext(connection) as context,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            response = self.post(
+                [
+                    self.row(first, status="CP", yield_amount="5100"),
+                    self.row(second, status="CP", yield_amount="4800.5"),
+                    self.row(third),
+                ]
+            )
+        updates = [q for q in context if q["sql"].startswith("UPDATE")]
+        self.assertRedirects(response, reverse("cultivations"))
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"sowing_date"', updates[0]["sql"])
+
+        rows = Cultivation.objects.order_by("pk").values_list(
+            "status", "yield_amount", "updated"
+        )
+        self.assertEqual(
+            [row[:2] for row in rows],
+            [("CP", 5100), ("CP", Decimal("4800.50")), ("PG", 0)],
+        )
+        self.assertEqual(rows[2][2], third.updated)
+
+    def test_changes_are_audited(self):
+        first, second, _ = self.cultivations
+        with self.captureOnCommitCallbacks(execute=True):
+            updated = bulk_edit.update_cultivations(
+                self.user,
+                [
+                    {"id": first.pk, "status": "CP", "yield_amount": Decimal(5100)},
+                    {"id": second.pk, "status": second.status},
+                ],
+            )
+        self.assertEqual(updated, [first])
+        entry = AuditEntry.objects.get(model="cultivation")
+        self.assertEqual(
+            json.loads(entry.changes),
+            {"status": ["PG", "CP"], "yield_amount": ["0.00", "5100"]},
+        )
+
+    def test_invalid_row_saves_nothing(self):
+        first, second, _ = self.cultivations
+        response = self.post(
+            [
+                self.row(first, status="CP", yield_amount="5100"),
+                self.row(second, yield_amount="-5"),
+            ]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["formset"].forms[1].errors)
+        self.assertFalse(
+            Cultivation.objects.filter(status=Cultivation.Status.COMPLETED).exists()
+        )
+
+    def test_other_owner_is_ignored(self):
+        stranger = User.objects.create_user("obcy@example.com", password="x")
+        self.client.force_login(stranger)
+        self.post([self.row(self.cultivations[0], status="CL")])
+        self.cultivations[0].refresh_from_db()
+        self.assertEqual(self.cultivations[0].status, Cultivation.Status.PROGRESS)
@@ -0,0 +1,258 @@
+import csv
+import datetime
+import zlib
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Field, SensorChunk
+
+# Jedna porcja = jedna doba odczytów jednej metryki na jednym polu.
+# Czas zapisujemy jako sekundy od północy UTC (uint32, różnicowo), wartości
+# jako float32; obie tablice są kompresowane zlib.
+SECONDS_PER_DAY = 86400
+HOURLY_COLUMNS = ("min", "mean", "max", "count")
+
+
+def _pack(array):
+    return zlib.compress(np.ascontiguousarray(array).tobytes(), 6)
+
+
+def _unpack(blob, dtype):
+    return np.frombuffer(zlib.decompress(bytes(blob)), dtype=dtype)
+
+
+def _hourly_rollup(offsets, values):
+    hours = offsets // 3600
+    counts = np.bincount(hours, minlength=24)
+    sums = np.bincount(hours, weights=values, minlength=24)
+    mins = np.full(24, np.nan, dtype=np.float32)
+    maxs = np.full(24, np.nan, dtype=np.float32)
+    np.fmin.at(mins, hours, values)
+    np.fmax.at(maxs, hours, values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    return np.column_stack([mins, means, maxs, counts]).astype(np.float32)
+
+
+def encode_day(chunk, offsets, values):
+    chunk.count = len(values)
+    chunk.timestamps = _pack(np.diff(offsets, prepend=np.uint32(0)).astype(np.uint32))
+    chunk.values = _pack(values.astype(np.float32))
+    chunk.hourly = _pack(_hourly_rollup(offsets, values))
+    chunk.value_min = float(values.min())
+    chunk.value_mean = float(values.mean(dtype=np.float64))
+    chunk.value_max = float(values.max())
+    return chunk
+
+
+def decode_day(timestamps, values):
+    offsets = np.cumsum(_unpack(timestamps, np.uint32), dtype=np.uint32)
+    return offsets, _unpack(values, np.float32)
+
+
+def _merge(old_offsets, old_values, offsets, values):
+    # Przy powtórzonym znaczniku czasu wygrywa nowszy odczyt
+    all_offsets = np.concatenate([old_offsets, offsets])
+    all_values = np.concatenate([old_values, values])
+    order = np.argsort(all_offsets, kind="stable")[::-1]
+    unique_offsets, first = np.unique(all_offsets[order], return_index=True)
+    return unique_offsets.astype(np.uint32), all_values[order][first]
+
+
+def ingest(field_id, metric, timestamps, values):
+    """Zapisuje odczyty (datetime64 UTC + wartości) w porcjach dobowych.
+
+    Wszystkie dotknięte doby są pobierane jednym zapytaniem i zapisywane
+    przez bulk_create/bulk_update w jednej transakcji.
+    """
+    timestamps = np.asarray(timestamps, dtype="datetime64[s]")
+    values = np.asarray(values, dtype=np.float32)
+    keep = ~np.isnan(values) & ~np.isnat(timestamps)
+    timestamps, values = timestamps[keep], values[keep]
+    if not len(values):
+        return 0
+
+    days = timestamps.astype("datetime64[D]")
+    offsets = (timestamps - days).astype(np.uint32)
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    day_dates = unique_days.astype(datetime.date).tolist()
+
+    with transaction.atomic():
+        existing = {
+            chunk.day: chunk
+            for chunk in SensorChunk.objects.select_for_update().filter(
+                field_id=field_id, metric=metric, day__in=day_dates
+            )
+        }
+        to_create, to_update = [], []
+
+        for index, day in enumerate(day_dates):
+            mask = inverse == index
+            day_offsets, day_values = offsets[mask], values[mask]
+            chunk = existing.get(day)
+
+            if chunk is None:
+                chunk = SensorChunk(field_id=field_id, metric=metric, day=day)
+                day_offsets, day_values = _merge(
+                    day_offsets[:0], day_values[:0], day_offsets, day_values
+                )
+                to_create.append(encode_day(chunk, day_offsets, day_values))
+            else:
+                old_offsets, old_values = decode_day(chunk.timestamps, chunk.values)
+                day_offsets, day_values = _merge(
+                    old_offsets, old_values, day_offsets, day_values
+                )
+                chunk.updated = timezone.now()
+                to_update.append(encode_day(chunk, day_offsets, day_values))
+
+        SensorChunk.objects.bulk_create(to_create)
+        SensorChunk.objects.bulk_update(
+            to_update,
+            [
+                "count",
+                "timestamps",
+                "values",
+                "hourly",
+                "value_min",
+                "value_mean",
+                "value_max",
+                "updated",
+            ],
+        )
+
+    return int(len(values))
+
+
+def _parse_timestamps(raw):
+    raw = np.asarray(raw)
+    if raw.size and np.char.isdigit(raw).all():
+        return raw.astype(np.int64).astype("datetime64[s]")
+    # ISO 8601 w UTC; numpy nie przyjmuje sufiksu strefy
+    return np.char.rstrip(raw, "Z").astype("datetime64[s]")
+
+
+def ingest_csv(stream, field_id=None, metric=None, block_size=50000):
+    """Wczytuje CSV strumieniowo, po ``block_size`` wierszy naraz.
+
+    Oczekiwane kolumny: ``timestamp``, ``value`` oraz ``field`` i ``metric``,
+    jeśli nie podano ich jako argumentów.
+    """
+    reader = csv.DictReader(stream)
+    buffers = defaultdict(lambda: ([], []))
+    buffered = total = 0
+    known_fields = set()
+
+    def check_fields():
+        # Nieznane pole zgłaszamy jako błąd danych, zanim zapis trafi na
+        # ograniczenie klucza obcego; jedno zapytanie na blok wierszy
+        missing = {key[0] for key in buffers} - known_fields
+        if not missing:
+            return
+        known_fields.update(
+            Field.objects.filter(pk__in=missing).values_list("pk", flat=True)
+        )
+        unknown = sorted(missing - known_fields)
+        if unknown:
+            raise ValueError(f"Brak pól o id: {', '.join(map(str, unknown))}")
+
+    def flush():
+        check_fields()
+        stored = 0
+        for (buffer_field, buffer_metric), (stamps, vals) in buffers.items():
+            stored += ingest(
+                buffer_field,
+                buffer_metric,
+                _parse_timestamps(stamps),
+                np.asarray(vals, dtype=np.float32),
+            )
+        buffers.clear()
+        return stored
+
+    for row in reader:
+        key = (
+            field_id if field_id is not None else int(row["field"]),
+            metric or row["metric"],
+        )
+        if key[1] not in SensorChunk.Metric.values:
+            raise ValueError(f"Nieznana metryka: {key[1]}")
+        stamps, vals = buffers[key]
+        stamps.append(row["timestamp"].strip())
+        vals.append(row["value"] or "nan")
+        buffered += 1
+        if buffered >= block_size:
+            total += flush()
+            buffered = 0
+
+    return total + flush()
+
+
+def _day_range(start, end):
+    start_day = np.datetime64(start, "D").astype(datetime.date)
+    end_day = np.datetime64(end, "D").astype(datetime.date)
+    return start_day, end_day
+
+
+def read_range(field_id, metric, start, end):
+    """Zwraca (timestamps datetime64[s], values float32) z przedziału [start, end)."""
+    start = np.datetime64(start, "s")
+    end = np.datetime64(end, "s")
+    chunks = (
+        SensorChunk.objects.filter(
+            field_id=field_id, metric=metric, day__range=_day_range(start, end)
+        )
+        .order_by("day")
+        .values_list("day", "timestamps", "values")
+    )
+
+    stamps, vals = [], []
+    for day, timestamps, values in chunks:
+        offsets, day_values = decode_day(timestamps, values)
+        stamps.append(np.datetime64(day, "s") + offsets.astype("timedelta64[s]"))
+        vals.append(day_values)
+
+    if not stamps:
+        return np.array([], dtype="datetime64[s]"), np.array([], dtype=np.float32)
+
+    stamps = np.concatenate(stamps)
+    vals = np.concatenate(vals)
+    mask = (stamps >= start) & (stamps < end)
+    return stamps[mask], vals[mask]
+
+
+def read_rollup(field_id, metric, start, end, resolution="day"):
+    """Zwraca (początki przedziałów, tablica Nx4 [min, mean, max, count]).
+
+    Agregaty są liczone przy zapisie, więc odczyt nie dekoduje surowych danych.
+    Zwracane są przedziały nachodzące na [start, end), jak w read_range.
+    """
+    start = np.datetime64(start, "s")
+    end = np.datetime64(end, "s")
+    chunks = SensorChunk.objects.filter(
+        field_id=field_id, metric=metric, day__range=_day_range(start, end)
+    ).order_by("day")
+
+    if resolution == "day":
+        rows = list(
+            chunks.values_list("day", "value_min", "value_mean", "value_max", "count")
+        )
+        days = np.array([row[0] for row in rows], dtype="datetime64[D]")
+        values = np.array([row[1:] for row in rows], dtype=np.float32).reshape(-1, 4)
+        mask = (days >= start.astype("datetime64[D]")) & (days < end)
+        return days[mask], values[mask]
+
+    if resolution != "hour":
+        raise ValueError(f"Nieznana rozdzielczość: {resolution}")
+
+    rows = list(chunks.values_list("day", "hourly"))
+    if not rows:
+        return np.array([], dtype="datetime64[h]"), np.empty((0, 4), np.float32)
+    days = np.array([row[0] for row in rows], dtype="datetime64[h]")
+    hours = (days[:, None] + np.arange(24, dtype="timedelta64[h]")).ravel()
+    hourly = np.concatenate(
+        [_unpack(blob, np.float32).reshape(24, 4) for _, blob in rows]
+    )
+    mask = (hourly[:, 3] > 0) & (hours >= start.astype("datetime64[h]")) & (hours < end)
+    return hours[mask], hourly[mask]
@@ -15,11 +15,41 @@ urlpatterns = [
         views.TreatmentCreateView.as_view(),
         name="add_treatment",
     ),
+    path(
+        "fields/<int:pk>/fragments/<str:fragment>",
+        views.FieldFragmentView.as_view(),
+        name="field_fragment",
+    ),
+    path(
+        "fields/<int:pk>/events",
+        views.FieldEventsView.as_view(),
+        name="field_events",
+    ),
+    path(
+        "fields/<int:pk>/attachments",
+        views.AttachmentUploadView.as_view(),
+        name="add_attachments",
+    ),
+    path(
+        "attachments/<int:pk>/<str:rendition>/",
+        views.AttachmentFileView.as_view(),
+        name="attachment_file",
+    ),
     path(
         "cultivations/",
         views.CultivationsHistoryView.as_view(),
         name="cultivations",
     ),
+    path(
+        "cultivations/rollover/",
+        views.SeasonRolloverView.as_view(),
+        name="season_rollover",
+    ),
+    path(
+        "cultivations/rollover/rotations",
+        views.RotationTemplateCreateView.as_view(),
+        name="add_rotation",
+    ),
     path(
         "cultivations/<int:pk>/",
         views.CultivationDetailView.as_view(),
@@ -30,5 +60,21 @@ urlpatterns = [
         views.CultivationEditView.as_view(),
         name="update_cultivation",
     ),
+    path(
+        "history/<str:model>/<int:pk>/",
+        views.AuditHistoryView.as_view(),
+        name="audit_history",
+    ),
+    path("plans/", views.PlanListView.as_view(), name="plans"),
+    path("plans/<int:pk>/skip", views.PlanSkipView.as_view(), name="skip_plan"),
+    path("reports/inputs/", views.InputReportView.as_view(), name="input_report"),
+    path("api/sync/", views.SyncView.as_view(), name="sync"),
+    path("api/fields/<int:pk>/", views.FieldPatchView.as_view(), name="patch_field"),
+    path(
+        "api/cultivations/<int:pk>/",
+        views.CultivationPatchView.as_view(),
+        name="patch_cultivation",
+    ),
+    path("api/fields/bundle/", views.FieldBundleView.as_view(), name="field_bundle"),
     path("", views.WelcomePage.as_view(), name="dashboard"),
 ]
@@ -1,24 +1,104 @@
+import datetime
+
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse, reverse_lazy
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags, urlencode
+from django.views.decorators.gzip import gzip_page
+from django.views import View
 from django.views.generic import (
     CreateView,
     DetailView,
+    FormView,
     ListView,
     TemplateView,
     UpdateView,
 )
 from django.views.generic.edit import FormMixin
-
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .archive import cultivations_for
+from .attachments import (
+    IMAGE_TYPES,
+    RENDITIONS,
+    AttachmentError,
+    attach,
+    rendition_path,
+)
+from .bundles import bundle_etag, load_bundles
+from .dashboard import get_dashboard
 from .forms import (
     CultivationEditForm,
+    CultivationGridFormSet,
     CultivationNotesForm,
     FieldEditForm,
+    FieldListFilterForm,
     FieldNotesForm,
+    RotationTemplateForm,
+    SeasonRolloverForm,
     TreatmentAddForm,
+    TreatmentInputFormSet,
+)
+from . import (
+    allocation,
+    audit,
+    bulk_edit,
+    events,
+    last_treatments,
+    refdata,
+    replica,
+    rollover,
 )
-from .models import CropType, Cultivation, Field, Treatment
+from .inputs import available_seasons, refresh_rollups, season_report
+from .planning import due
+from .models import (
+    Attachment,
+    Cultivation,
+    Field,
+    PlannedTreatment,
+    Treatment,
+    TreatmentInput,
+)
+from .serializers import (
+    CultivationPatchSerializer,
+    FieldBundleQuerySerializer,
+    FieldPatchSerializer,
+    SyncUploadSerializer,
+)
+from .sync import InvalidToken, apply_offline_treatments, changes_since, decode_token
+
+ATTACHMENTS_ON_PAGE = 12
+FIELD_FRAGMENTS = {
+    "cultivations": "includes/_field_cultivations.html",
+    "history": "includes/_field_history.html",
+    "treatments": "includes/_field_treatments.html",
+}
+
+
+def _cultivation_context(field):
+    history = list(field.cultivations.for_list())
+    latest_year = max((c.year for c in history), default=None)
+    return {
+        "cultivation_history": history,
+        "current_year": latest_year,
+        "latest_cultivations": [c for c in history if c.year == latest_year],
+    }
 
 
 class UserObjectMixin(LoginRequiredMixin):
@@ -26,13 +106,52 @@ class UserObjectMixin(LoginRequiredMixin):
         return self.request.user
 
 
+class ReplicaReadMixin:
+    # Widoki tylko do odczytu, które mogą czytać z kopii bazy
+    def dispatch(self, request, *args, **kwargs):
+        with replica.reading_for(request):
+            response = super().dispatch(request, *args, **kwargs)
+            # Szablon renderujemy jeszcze w kontekście kopii (leniwe querysety)
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+        return response
+
+
 class WelcomePage(LoginRequiredMixin, TemplateView):
     template_name = "panels/dashboard.html"
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["dashboard"] = get_dashboard(self.request.user)
+        return context
+
 
 class FieldPage(UserObjectMixin, TemplateView):
     template_name = "panels/fields.html"
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        fields = (
+            Field.objects.for_owner(self.request.user)
+            .for_list()
+            .prefetch_related(
+                Prefetch(
+                    "cultivations",
+                    queryset=Cultivation.objects.for_list().latest_per_field(),
+                    to_attr="current_cultivations",
+                ),
+                "last_treatments",
+            )
+        )
+        form = FieldListFilterForm(self.request.GET or None)
+        treatment_type = None
+        if form.is_valid():
+            treatment_type = form.cleaned_data["treatment_type"]
+            fields = last_treatments.filter_fields(fields, **form.cleaned_data)
+        context["filter_form"] = form
+        context["fields"] = last_treatments.columns_for(list(fields), treatment_type)
+        return context
+
 
 class FieldDetailPage(LoginRequiredMixin, FormMixin, DetailView):
     model = Field
@@ -40,6 +159,9 @@ class FieldDetailPage(LoginRequiredMixin, FormMixin, DetailView):
     context_object_name = "field"
     form_class = FieldNotesForm
 
+    def get_queryset(self):
+        return Field.objects.for_owner(self.request.user).for_detail()
+
     def get_success_url(self):
         return self.request.path
 
@@ -52,9 +174,9 @@ class FieldDetailPage(LoginRequiredMixin, FormMixin, DetailView):
             return self.form_invalid(form)
 
     def form_valid(self, form):
-        field = self.get_object()
+        field = self.object
         field.notes = form.cleaned_data["notes"]
-        field.save()
+        field.save(update_fields=["notes", "updated"])
         return super().form_valid(form)
 
     def get_context_data(self, **kwargs):
@@ -62,14 +184,159 @@ class FieldDetailPage(LoginRequiredMixin, FormMixin, DetailView):
 
         if "treatment_form" not in context:
             context["treatment_form"] = TreatmentAddForm()
+        if "input_formset" not in context:
+            context["input_formset"] = TreatmentInputFormSet(prefix="inputs")
+
+        context.update(_cultivation_context(self.object))
+        context["treatments"] = self.object.treatments.for_list()
+        # Najnowsze miniatury i licznik z indeksu (field, created), więc
+        # strona nie zwalnia wraz z przybywaniem zdjęć
+        context["attachments"] = self.object.attachments.select_related("blob").only(
+            "id",
+            "name",
+            "caption",
+            "created",
+            "treatment_id",
+            "field_id",
+            "blob__renditions_ready",
+        )[:ATTACHMENTS_ON_PAGE]
+        context["attachment_count"] = self.object.attachments.count()
+        return context
 
+
+class FieldFragmentView(LoginRequiredMixin, DetailView):
+    # Pojedyncza tabela strony pola, pobierana po powiadomieniu o zmianie
+    context_object_name = "field"
+
+    def get_queryset(self):
+        return Field.objects.for_owner(self.request.user).only("id", "owner_id")
+
+    def get_template_names(self):
+        return [FIELD_FRAGMENTS[self.kwargs["fragment"]]]
+
+    def get(self, request, *args, **kwargs):
+        if kwargs["fragment"] not in FIELD_FRAGMENTS:
+            raise Http404
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.kwargs["fragment"] == "treatments":
+            context["treatments"] = self.object.treatments.for_list()
+        else:
+            context.update(_cultivation_context(self.object))
         return context
 
 
+class FieldEventsView(View):
+    """Strumień zdarzeń (SSE) o zmianach na polu.
+
+    Widok asynchroniczny: pod ASGI otwarte połączenie nie zajmuje wątku,
+    tylko czeka na wiadomość z brokera.
+    """
+
+    async def get(self, request, pk):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        if not await Field.objects.for_owner(user).filter(pk=pk).aexists():
+            raise Http404
+
+        subscription = events.broker.subscribe(events.channel(pk))
+        response = StreamingHttpResponse(
+            events.stream(subscription), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        # Nginx nie może buforować strumienia
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class AttachmentUploadView(LoginRequiredMixin, View):
+    def post(self, request, pk):
+        field = get_object_or_404(
+            Field.objects.for_owner(request.user).only("id", "owner_id"), pk=pk
+        )
+        treatment = None
+        if request.POST.get("treatment"):
+            treatment = get_object_or_404(
+                Treatment.objects.only("id", "field_id"),
+                pk=request.POST["treatment"],
+                field=field,
+            )
+        uploads = request.FILES.getlist("photos")
+        if not uploads:
+            messages.error(request, "Nie wybrano żadnego zdjęcia")
+            return redirect("field_detail", pk=pk)
+
+        try:
+            attach(
+                request.user,
+                field,
+                uploads,
+                treatment=treatment,
+                caption=request.POST.get("caption", "")[:255],
+            )
+        except AttachmentError as error:
+            messages.error(request, str(error))
+        else:
+            messages.success(request, f"Dodano zdjęć: {len(uploads)}")
+        return redirect("field_detail", pk=pk)
+
+
+class AttachmentFileView(LoginRequiredMixin, View):
+    # Treść załącznika nigdy się nie zmienia, więc po wygenerowaniu miniatur
+    # przeglądarka może trzymać plik w cache bez ponownego pytania
+    cache_forever = "private, max-age=31536000, immutable"
+
+    def get(self, request, pk, rendition):
+        if rendition != "original" and rendition not in RENDITIONS:
+            raise Http404
+        attachment = get_object_or_404(
+            Attachment.objects.select_related("blob").only(
+                "id", "blob__digest", "blob__content_type", "blob__renditions_ready"
+            ),
+            pk=pk,
+            owner=request.user,
+        )
+        blob = attachment.blob
+        final = rendition == "original" or blob.renditions_ready
+        etag = f'"{blob.digest[:16]}-{rendition if final else "pending"}"'
+        cache_control = self.cache_forever if final else "private, no-cache"
+
+        if request.headers.get("If-None-Match") == etag:
+            response = HttpResponseNotModified()
+        else:
+            path = rendition_path(blob, rendition)
+            try:
+                handle = open(path, "rb")
+            except FileNotFoundError:
+                raise Http404
+            content_type = (
+                blob.content_type if path.endswith(blob.digest) else "image/jpeg"
+            )
+            if content_type in IMAGE_TYPES.values():
+                response = FileResponse(handle, content_type=content_type)
+            else:
+                # Pliki sprzed sprawdzania treści oddajemy tylko do pobrania
+                response = FileResponse(
+                    handle,
+                    as_attachment=True,
+                    content_type="application/octet-stream",
+                )
+            response["X-Content-Type-Options"] = "nosniff"
+        response["ETag"] = etag
+        response["Cache-Control"] = cache_control
+        return response
+
+
 class FieldEditView(LoginRequiredMixin, UpdateView):
     model = Field
     form_class = FieldEditForm
 
+    def get_queryset(self):
+        return Field.objects.for_owner(self.request.user)
+
     def get_success_url(self):
         return reverse_lazy("field_detail", kwargs={"pk": self.object.pk})
 
@@ -92,37 +359,115 @@ class TreatmentCreateView(LoginRequiredMixin, CreateView):
     model = Treatment
     form_class = TreatmentAddForm
 
+    def get_field(self):
+        return get_object_or_404(
+            Field.objects.for_owner(self.request.user).only(
+                "id", "owner_id", "area_size"
+            ),
+            id=self.kwargs.get("pk"),
+        )
+
+    def get_formset(self):
+        return TreatmentInputFormSet(self.request.POST or None, prefix="inputs")
+
     def form_valid(self, form):
-        field_id = self.kwargs.get("pk")
-        field = get_object_or_404(Field, id=field_id, owner=self.request.user)
+        field = self.get_field()
+        formset = self.get_formset()
+        if not formset.is_valid():
+            return self.form_invalid(form, formset)
 
         form.instance.field = field
+        with transaction.atomic():
+            self.object = form.save()
+            inputs = [
+                input_form.save(commit=False).fill_total(field.area_size)
+                for input_form in formset.forms
+                if input_form.has_changed()
+            ]
+            for treatment_input in inputs:
+                treatment_input.treatment = self.object
+            # Jeden INSERT i jedno przeliczenie zestawienia zamiast sygnału na wiersz
+            TreatmentInput.objects.bulk_create(inputs)
+            if inputs:
+                refresh_rollups([(field.pk, self.object.date.year)])
+
         messages.success(self.request, "Zabieg został dodany pomyślnie")
-        return super().form_valid(form)
+        return redirect(self.get_success_url())
+
+    def form_invalid(self, form, formset=None):
+        errors = list(form.errors.values())
+        if formset is not None:
+            errors += [error for row in formset.errors for error in row.values()]
+            errors += formset.non_form_errors()
+        for error in errors:
+            messages.error(self.request, error)
+        return redirect("field_detail", pk=self.kwargs["pk"])
 
     def get_success_url(self):
         return reverse("field_detail", kwargs={"pk": self.kwargs.get("pk")})
 
 
-class CultivationsHistoryView(LoginRequiredMixin, ListView):
+class CultivationsHistoryView(ReplicaReadMixin, LoginRequiredMixin, ListView):
     model = Cultivation
     template_name = "panels/cultivation_history.html"
     context_object_name = "cultivations_list"
     paginate_by = 25
 
+    def include_archived(self):
+        return self.request.GET.get("archive") == "1"
+
     def get_queryset(self):
-        return (
-            Cultivation.objects.filter(owner=self.request.user)
-            .select_related("field", "crop_type")
-            .order_by("-year", "-created")
+        return cultivations_for(
+            self.request.user, include_archived=self.include_archived()
         )
 
+    def editing(self):
+        # Archiwalne sezony są tylko do odczytu
+        return self.request.GET.get("edit") == "1" and not self.include_archived()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["all_crops"] = CropType.objects.all()
-        context["user_fields"] = Field.objects.filter(owner=self.request.user)
+        context["include_archived"] = self.include_archived()
+        context["editing"] = self.editing()
+        context["all_crops"] = refdata.crop_types()
+        context["user_fields"] = Field.objects.for_owner(self.request.user).only(
+            "id", "name"
+        )
+        if context["editing"]:
+            cultivations = context["cultivations_list"]
+            formset = kwargs.get("formset") or CultivationGridFormSet(
+                initial=[
+                    {name: getattr(c, name) for name in ("id", *bulk_edit.EDITABLE)}
+                    for c in cultivations
+                ]
+            )
+            # Formularz każdego wiersza dopasowany po id, także po błędzie
+            forms = {str(form["id"].value()): form for form in formset}
+            for cultivation in cultivations:
+                cultivation.grid_form = forms.get(str(cultivation.pk))
+            context["formset"] = formset
         return context
 
+    def post(self, request, *args, **kwargs):
+        formset = CultivationGridFormSet(request.POST)
+        if formset.is_valid():
+            try:
+                updated = bulk_edit.update_cultivations(
+                    request.user, [form.cleaned_data for form in formset]
+                )
+            except ValidationError as error:
+                for message in error.messages:
+                    messages.error(request, message)
+            else:
+                messages.success(request, f"Zaktualizowano uprawy: {len(updated)}")
+                url = reverse("cultivations")
+                if request.GET.get("page"):
+                    url += "?" + urlencode({"page": request.GET["page"]})
+                return redirect(url)
+
+        self.object_list = self.get_queryset()
+        return self.render_to_response(self.get_context_data(formset=formset))
+
 
 class CultivationDetailView(LoginRequiredMixin, FormMixin, DetailView):
     model = Cultivation
@@ -130,6 +475,13 @@ class CultivationDetailView(LoginRequiredMixin, FormMixin, DetailView):
     context_object_name = "cultivation"
     form_class = CultivationNotesForm
 
+    def get_queryset(self):
+        return (
+            Cultivation.objects.for_owner(self.request.user)
+            .for_detail()
+            .select_related("forecast")
+        )
+
     def get_success_url(self):
         return self.request.path
 
@@ -142,14 +494,25 @@ class CultivationDetailView(LoginRequiredMixin, FormMixin, DetailView):
             return self.form_invalid(form)
 
     def form_valid(self, form):
-        cultivation = self.get_object()
+        cultivation = self.object
         cultivation.notes = form.cleaned_data["notes"]
-        cultivation.save()
+        cultivation.save(update_fields=["notes", "updated"])
         return super().form_valid(form)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["edit_form"] = CultivationEditForm(instance=self.get_object())
+        edit_form = CultivationEditForm(instance=self.object)
+        autosave_url = reverse("patch_cultivation", kwargs={"pk": self.object.pk})
+        for name, form_field in edit_form.fields.items():
+            form_field.widget.attrs.update(
+                {
+                    "data-autosave-url": autosave_url,
+                    "data-autosave-name": name,
+                    "data-autosave-status": "#cultivation-autosave",
+                }
+            )
+        context["edit_form"] = edit_form
+        context["forecast"] = getattr(self.object, "forecast", None)
         return context
 
 
@@ -157,6 +520,9 @@ class CultivationEditView(LoginRequiredMixin, UpdateView):
     model = Cultivation
     form_class = CultivationEditForm
 
+    def get_queryset(self):
+        return Cultivation.objects.for_owner(self.request.user).for_detail()
+
     def get_success_url(self):
         return reverse_lazy("cultivation_detail", kwargs={"pk": self.object.pk})
 
@@ -173,3 +539,305 @@ class CultivationEditView(LoginRequiredMixin, UpdateView):
         for error in form.errors.values():
             messages.error(self.request, error)
         return redirect("cultivation_detail", pk=self.kwargs["pk"])
+
+
+class SeasonRolloverView(LoginRequiredMixin, FormView):
+    template_name = "panels/season_rollover.html"
+    form_class = SeasonRolloverForm
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs["user"] = self.request.user
+        # Podgląd to GET z parametrami formularza; zatwierdzenie to POST
+        if self.request.method == "GET" and "source_year" in self.request.GET:
+            kwargs["data"] = self.request.GET
+        return kwargs
+
+    def plan(self, form):
+        source_year = form.cleaned_data["source_year"]
+        rotation = form.cleaned_data["rotation"]
+        if form.cleaned_data["optimize"]:
+            plan = allocation.allocate(
+                self.request.user, source_year + 1, None, rotation
+            )
+            return plan.proposals, plan
+        return rollover.propose(self.request.user, source_year, rotation), None
+
+    def get(self, request, *args, **kwargs):
+        form = self.get_form()
+        proposals = plan = None
+        if form.is_bound and form.is_valid():
+            proposals, plan = self.plan(form)
+        return self.render_to_response(
+            self.get_context_data(form=form, proposals=proposals, allocation=plan)
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        proposals = context.get("proposals")
+        if proposals is not None:
+            context["ready_count"] = sum(p.ready for p in proposals)
+            context["target_year"] = context["form"].cleaned_data["source_year"] + 1
+        context.setdefault(
+            "rotation_form", RotationTemplateForm(user=self.request.user)
+        )
+        return context
+
+    def form_valid(self, form):
+        source_year = form.cleaned_data["source_year"]
+        proposals, _ = self.plan(form)
+        created = rollover.commit(self.request.user, source_year + 1, proposals)
+        messages.success(
+            self.request,
+            f"Zaplanowano {len(created)} upraw na sezon {source_year + 1}",
+        )
+        return redirect("cultivations")
+
+    def form_invalid(self, form):
+        for error in form.errors.values():
+            messages.error(self.request, error)
+        return redirect("season_rollover")
+
+
+class RotationTemplateCreateView(LoginRequiredMixin, CreateView):
+    form_class = RotationTemplateForm
+
+    def get(self, request, *args, **kwargs):
+        return redirect("season_rollover")
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs["user"] = self.request.user
+        return kwargs
+
+    def form_valid(self, form):
+        self.object = form.save()
+        messages.success(self.request, f"Dodano płodozmian {self.object.name}")
+        url = reverse("season_rollover")
+        # Po dodaniu wracamy do podglądu z nowym płodozmianem
+        source_year = self.request.POST.get("source_year")
+        if source_year:
+            url += "?" + urlencode(
+                {"source_year": source_year, "rotation": self.object.pk}
+            )
+        return redirect(url)
+
+    def form_invalid(self, form):
+        for error in form.errors.values():
+            messages.error(self.request, error)
+        return redirect("season_rollover")
+
+
+class InputReportView(ReplicaReadMixin, LoginRequiredMixin, TemplateView):
+    template_name = "panels/input_report.html"
+
+    def get_season(self, seasons):
+        try:
+            return int(self.request.GET["year"])
+        except (KeyError, ValueError):
+            return seasons[0] if seasons else timezone.localdate().year
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        seasons = available_seasons(self.request.user)
+        season = self.get_season(seasons)
+        context["season"] = season
+        context["seasons"] = seasons
+        context["report"] = season_report(self.request.user, season)
+        return context
+
+
+class PlanListView(LoginRequiredMixin, TemplateView):
+    template_name = "panels/plans.html"
+    periods = {"7": "Ten tydzień", "30": "30 dni", "90": "90 dni"}
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        days = self.request.GET.get("days", "7")
+        if days not in self.periods:
+            days = "7"
+        today = timezone.localdate()
+        plans = list(
+            due(self.request.user, today, today + datetime.timedelta(days=int(days)))
+        )
+        context["days"] = days
+        context["periods"] = self.periods
+        context["overdue"] = [plan for plan in plans if plan.due_date < today]
+        context["upcoming"] = [plan for plan in plans if plan.due_date >= today]
+        return context
+
+
+class PlanSkipView(LoginRequiredMixin, View):
+    def post(self, request, pk):
+        updated = PlannedTreatment.objects.filter(
+            pk=pk, owner=request.user, status=PlannedTreatment.Status.PLANNED
+        ).update(status=PlannedTreatment.Status.SKIPPED)
+        if updated:
+            messages.success(request, "Zabieg oznaczono jako pominięty")
+        return redirect("plans")
+
+
+class AuditHistoryView(ReplicaReadMixin, LoginRequiredMixin, ListView):
+    template_name = "panels/audit_history.html"
+    context_object_name = "entries"
+    paginate_by = 50
+    models = {"field": Field, "cultivation": Cultivation, "treatment": Treatment}
+
+    def get_model(self):
+        try:
+            return self.models[self.kwargs["model"]]
+        except KeyError:
+            raise Http404
+
+    def get_queryset(self):
+        self.get_model()
+        return audit.history(self.kwargs["model"], self.kwargs["pk"], self.request.user)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        for entry in context["entries"]:
+            entry.rows = [
+                (audit.LABELS.get(name, name), before, after)
+                for name, (before, after) in entry.decoded_changes().items()
+            ]
+        context["model_name"] = self.kwargs["model"]
+        context["object_id"] = self.kwargs["pk"]
+        context["current"] = (
+            self.get_model()
+            .objects.for_owner(self.request.user)
+            .filter(pk=self.kwargs["pk"])
+            .first()
+        )
+        return context
+
+
+@method_decorator(gzip_page, name="dispatch")
+class SyncView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            since = decode_token(request.query_params.get("since"))
+        except InvalidToken:
+            return Response(
+                {"since": "Nieprawidłowy token synchronizacji"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(changes_since(request.user, since))
+
+    def post(self, request):
+        serializer = SyncUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            keys = apply_offline_treatments(
+                request.user, serializer.validated_data["treatments"]
+            )
+        except ValidationError as error:
+            return Response(error.message_dict, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"treatments": keys})
+
+
+def _split(value):
+    return [part for part in (value or "").split(",") if part]
+
+
+def _etag_matches(request, etag):
+    # If-None-Match to lista ETagów; gzip_page osłabia ETag ("W/"), a przy
+    # If-None-Match porównanie jest słabe, więc prefiks pomijamy
+    tags = parse_etags(request.headers.get("If-None-Match", ""))
+    return "*" in tags or etag in {tag.removeprefix("W/") for tag in tags}
+
+
+@method_decorator(gzip_page, name="dispatch")
+class FieldBundleView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        data = {
+            "ids": _split(params.get("ids")),
+            "known": dict(
+                item.split(":", 1)
+                for item in _split(params.get("known"))
+                if ":" in item
+            ),
+        }
+        if "treatments" in params:
+            data["treatments"] = params["treatments"]
+        serializer = FieldBundleQuerySerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        query = serializer.validated_data
+
+        bundles = load_bundles(request.user, query["ids"], query["treatments"])
+        etag = '"%s"' % bundle_etag(sorted(b["etag"] for b in bundles.values()))
+        if _etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        known = query.get("known", {})
+        payload = []
+        for field_id, bundle in bundles.items():
+            if known.get(str(field_id)) == bundle["etag"]:
+                bundle = {"etag": bundle["etag"], "unchanged": True}
+            payload.append({"id": field_id, **bundle})
+
+        missing = sorted(set(query["ids"]) - bundles.keys())
+        return Response({"fields": payload, "missing": missing}, headers={"ETag": etag})
+
+
+class PartialUpdateView(APIView):
+    """PATCH z JSON-em: zapisuje tylko przesłane kolumny i zwraca 204."""
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = None
+    # Kolumny wczytywane zawsze, niezależnie od zmienianych
+    base_columns = ["id", "owner_id"]
+    run_clean = True
+
+    def get_queryset(self):
+        return self.serializer_class.Meta.model.objects.for_owner(self.request.user)
+
+    def patch(self, request, pk):
+        serializer = self.serializer_class(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        changed = list(serializer.validated_data)
+
+        instance = get_object_or_404(
+            self.get_queryset().only(*self.base_columns, *changed), pk=pk
+        )
+        if not changed:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        for name, value in serializer.validated_data.items():
+            setattr(instance, name, value)
+        if self.run_clean:
+            try:
+                instance.clean()
+            except ValidationError as error:
+                return Response(error.message_dict, status=status.HTTP_400_BAD_REQUEST)
+
+        instance.save(update_fields=[*changed, "updated"])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class FieldPatchView(PartialUpdateView):
+    serializer_class = FieldPatchSerializer
+    # Field.clean sprawdza tylko unikalność nazwy, której tu nie zmieniamy
+    run_clean = False
+
+
+class CultivationPatchView(PartialUpdateView):
+    serializer_class = CultivationPatchSerializer
+    # Rok, pole i roślina pozwalają save() pominąć liczenie sluga,
+    # a rok i plon są potrzebne do clean()
+    base_columns = [
+        "id",
+        "owner_id",
+        "year",
+        "field_id",
+        "crop_type_id",
+        "slug",
+        "sowing_date",
+        "yield_amount",
+    ]
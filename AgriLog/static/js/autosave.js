@@ -0,0 +1,58 @@
+// Autozapis pól oznaczonych data-autosave-url / data-autosave-name przez PATCH (JSON).
+// Status zapisu pokazuje element wskazany w data-autosave-status.
+(function () {
+    function csrfToken() {
+        const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+        return match ? decodeURIComponent(match[1]) : "";
+    }
+
+    function setStatus(input, text, className) {
+        const target = document.querySelector(input.dataset.autosaveStatus || "");
+        if (target) {
+            target.textContent = text;
+            target.className = "small " + className;
+        }
+    }
+
+    function save(input) {
+        // Puste pole daty lub liczby to null; pusta notatka to pusty tekst
+        const value = input.value === "" && input.tagName !== "TEXTAREA" ? null : input.value;
+        if (input.dataset.autosaveSaved === input.value) {
+            return;
+        }
+        setStatus(input, "Zapisywanie...", "text-muted");
+        fetch(input.dataset.autosaveUrl, {
+            method: "PATCH",
+            headers: {"Content-Type": "application/json", "X-CSRFToken": csrfToken()},
+            credentials: "same-origin",
+            body: JSON.stringify({[input.dataset.autosaveName]: value}),
+        }).then(function (response) {
+            if (response.status === 204) {
+                input.dataset.autosaveSaved = input.value;
+                input.classList.remove("is-invalid");
+                setStatus(input, "Zapisano", "text-success");
+                return;
+            }
+            return response.json().then(function (errors) {
+                input.classList.add("is-invalid");
+                const messages = errors[input.dataset.autosaveName] || Object.values(errors);
+                setStatus(input, [].concat(messages).join(" "), "text-danger");
+            });
+        }).catch(function () {
+            setStatus(input, "Brak połączenia - zmiany nie zostały zapisane", "text-danger");
+        });
+    }
+
+    document.querySelectorAll("[data-autosave-url]").forEach(function (input) {
+        let timer = null;
+        input.dataset.autosaveSaved = input.value;
+        input.addEventListener("input", function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () { save(input); }, 800);
+        });
+        input.addEventListener("change", function () {
+            clearTimeout(timer);
+            save(input);
+        });
+    });
+})();
@@ -0,0 +1,61 @@
+// Odświeża tabele strony pola po powiadomieniach z kanału SSE (data-events-url).
+// Kilka zdarzeń w krótkim czasie daje jedno pobranie każdego fragmentu.
+(function () {
+    const root = document.querySelector("[data-events-url]");
+    if (!root || !window.EventSource) {
+        return;
+    }
+    const pending = new Set();
+    let timer = null;
+    let connected = false;
+
+    function allFragments() {
+        return Array.from(document.querySelectorAll("[data-fragment]"), function (element) {
+            return element.dataset.fragment;
+        });
+    }
+
+    function refresh() {
+        timer = null;
+        pending.forEach(function (name) {
+            const target = document.querySelector('[data-fragment="' + name + '"]');
+            if (!target) {
+                return;
+            }
+            fetch(target.dataset.fragmentUrl, {credentials: "same-origin"})
+                .then(function (response) {
+                    return response.ok ? response.text() : null;
+                })
+                .then(function (html) {
+                    if (html !== null) {
+                        target.innerHTML = html;
+                    }
+                });
+        });
+        pending.clear();
+    }
+
+    function schedule(names) {
+        names.forEach(function (name) {
+            pending.add(name);
+        });
+        if (!timer) {
+            timer = setTimeout(refresh, 300);
+        }
+    }
+
+    const source = new EventSource(root.dataset.eventsUrl);
+    source.addEventListener("open", function () {
+        // Po ponownym połączeniu mogliśmy przegapić zmiany
+        if (connected) {
+            schedule(allFragments());
+        }
+        connected = true;
+    });
+    source.addEventListener("change", function (event) {
+        schedule(JSON.parse(event.data).fragments);
+    });
+    source.addEventListener("reset", function () {
+        schedule(allFragments());
+    });
+})();